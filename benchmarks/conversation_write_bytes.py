@@ -0,0 +1,78 @@
+"""
+Per-turn bytes written/read for conversation history storage.
+
+Compares the legacy approach (rewrite the whole conversations.messages JSONB
+array every turn, read it all back) with the append-only
+conversation_messages table (insert two rows, read the last N).
+
+Run: python benchmarks/conversation_write_bytes.py
+"""
+import json
+import random
+
+HISTORY_WINDOW = 20
+CONVO_ID = "3f2b8c1e-7a4d-4e2b-9c6f-1d2e3f4a5b6c"
+
+USER_LINES = [
+    "Hi, dinner set chahiye",
+    "Steel thali kitne ka hai?",
+    "6 plates aur 12 spoons bhej do, address 221B MG Road Jaipur",
+    "Is the ceramic set microwave safe?",
+]
+BOT_LINES = [
+    "Namaste! 🙏 Humare paas ceramic aur steel dono dinner sets hain. Kaunsa dekhna chahenge?",
+    "Embassy French Dinner Plate (Pack of 2) ₹499 mein available hai 😊",
+    "Bilkul! Aapka order note kar liya hai. Naam bata dijiye please?",
+    "Yes! The Freakway stoneware set is microwave safe and hand painted ✨",
+]
+
+
+def make_history(n: int) -> list:
+    rng = random.Random(n)
+    history = []
+    for i in range(n):
+        if i % 2 == 0:
+            history.append({"role": "user", "content": rng.choice(USER_LINES)})
+        else:
+            history.append({"role": "assistant", "content": rng.choice(BOT_LINES)})
+    return history
+
+
+def legacy_turn_bytes(history: list, turn: list) -> tuple:
+    read = len(json.dumps({"id": CONVO_ID, "messages": history, "language": "Hinglish"}))
+    written = len(json.dumps({
+        "messages": history + turn,
+        "language": "Hinglish",
+        "last_message_at": "now()",
+    }))
+    return written, read
+
+
+def append_only_turn_bytes(history: list, turn: list) -> tuple:
+    window = [
+        {"role": m["role"], "content": m["content"], "id": i}
+        for i, m in enumerate(history[-HISTORY_WINDOW:])
+    ]
+    read = len(json.dumps({"id": CONVO_ID, "language": "Hinglish", "conversation_messages": window}))
+    written = len(json.dumps([
+        {"conversation_id": CONVO_ID, "role": m["role"], "content": m["content"]} for m in turn
+    ])) + len(json.dumps({"language": "Hinglish", "last_message_at": "now()"}))
+    return written, read
+
+
+def main():
+    turn = [
+        {"role": "user", "content": USER_LINES[1]},
+        {"role": "assistant", "content": BOT_LINES[1]},
+    ]
+    print(f"{'messages':>9} | {'legacy write':>12} | {'append write':>12} | {'legacy read':>11} | {'window read':>11}")
+    print("-" * 68)
+    for n in (10, 100, 1000):
+        history = make_history(n)
+        lw, lr = legacy_turn_bytes(history, turn)
+        aw, ar = append_only_turn_bytes(history, turn)
+        print(f"{n:>9} | {lw:>10} B | {aw:>10} B | {lr:>9} B | {ar:>9} B")
+
+
+if __name__ == "__main__":
+    main()
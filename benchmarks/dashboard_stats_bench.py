@@ -0,0 +1,134 @@
+"""
+Dashboard statistics: the old fetch-everything Python aggregation vs one
+aggregate query, on 100k orders in SQLite.
+
+"legacy" reproduces the previous get_dashboard_stats: four row fetches
+(orders, orders again for customer_phone, conversation ids, product ids),
+each serialized to JSON as PostgREST would ship it, then counted in Python
+with a datetime.fromisoformat per order. "aggregate" runs the SQLite
+equivalent of the dashboard_stats RPC and ships one small JSON object. Both
+results are checked to be identical.
+
+Run from the repo root: python benchmarks/dashboard_stats_bench.py
+"""
+import json
+import random
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+ORDERS = 100_000
+STATUSES = ["pending", "confirmed", "preparing", "delivered", "cancelled"]
+
+
+def build_db() -> sqlite3.Connection:
+    rng = random.Random(7)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE orders (id TEXT, business_id TEXT, customer_phone TEXT, total REAL, status TEXT, created_at TEXT)")
+    conn.execute("CREATE TABLE conversations (id TEXT, business_id TEXT)")
+    conn.execute("CREATE TABLE products (id TEXT, business_id TEXT)")
+    conn.execute("CREATE INDEX idx_orders_business_created ON orders(business_id, created_at)")
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(ORDERS):
+        created = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+        rows.append((
+            str(uuid.UUID(int=rng.getrandbits(128))), "biz", f"91{rng.randint(0, 19_999):010d}",
+            round(rng.uniform(100, 5000), 2), rng.choice(STATUSES), created.isoformat(),
+        ))
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.executemany("INSERT INTO conversations VALUES (?, 'biz')", [(str(i),) for i in range(20_000)])
+    conn.executemany("INSERT INTO products VALUES (?, 'biz')", [(str(i),) for i in range(2_000)])
+    return conn
+
+
+def fetch(conn, sql: str, columns: list) -> tuple:
+    """Rows as dicts after a JSON round trip, and the payload size."""
+    payload = json.dumps([dict(zip(columns, r)) for r in conn.execute(sql, ("biz",))])
+    return json.loads(payload), len(payload)
+
+
+def legacy_stats(conn) -> tuple:
+    orders, b1 = fetch(conn, "SELECT id, status, total, created_at FROM orders WHERE business_id = ?", ["id", "status", "total", "created_at"])
+    phones, b2 = fetch(conn, "SELECT customer_phone FROM orders WHERE business_id = ?", ["customer_phone"])
+    convos, b3 = fetch(conn, "SELECT id FROM conversations WHERE business_id = ?", ["id"])
+    products, b4 = fetch(conn, "SELECT id FROM products WHERE business_id = ?", ["id"])
+
+    unique_phones = set(c["customer_phone"] for c in phones)
+    today = datetime.utcnow().date()
+    today_orders = [o for o in orders if datetime.fromisoformat(o["created_at"].replace("Z", "+00:00")).date() == today]
+    status_counts = {}
+    for o in orders:
+        s = o.get("status", "unknown")
+        status_counts[s] = status_counts.get(s, 0) + 1
+    return {
+        "total_orders": len(orders),
+        "total_customers": len(unique_phones),
+        "total_conversations": len(convos),
+        "total_products": len(products),
+        "total_revenue": round(sum(float(o.get("total") or 0) for o in orders), 2),
+        "order_status_breakdown": status_counts,
+        "today_orders": len(today_orders),
+        "today_revenue": round(sum(float(o.get("total") or 0) for o in today_orders), 2),
+    }, b1 + b2 + b3 + b4
+
+
+AGGREGATE_SQL = """
+WITH totals AS (
+    SELECT COUNT(*) AS total_orders,
+           COUNT(DISTINCT customer_phone) AS total_customers,
+           COALESCE(SUM(total), 0) AS total_revenue,
+           COUNT(*) FILTER (WHERE created_at >= :today) AS today_orders,
+           COALESCE(SUM(total) FILTER (WHERE created_at >= :today), 0) AS today_revenue
+    FROM orders WHERE business_id = :biz
+),
+statuses AS (
+    SELECT json_group_object(status, n) AS breakdown
+    FROM (SELECT COALESCE(status, 'unknown') AS status, COUNT(*) AS n FROM orders WHERE business_id = :biz GROUP BY 1)
+)
+SELECT json_object(
+    'total_orders', total_orders,
+    'total_customers', total_customers,
+    'total_conversations', (SELECT COUNT(*) FROM conversations WHERE business_id = :biz),
+    'total_products', (SELECT COUNT(*) FROM products WHERE business_id = :biz),
+    'total_revenue', total_revenue,
+    'order_status_breakdown', json(breakdown),
+    'today_orders', today_orders,
+    'today_revenue', today_revenue
+) FROM totals, statuses
+"""
+
+
+def aggregate_stats(conn) -> tuple:
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+    payload = conn.execute(AGGREGATE_SQL, {"biz": "biz", "today": today}).fetchone()[0]
+    stats = json.loads(payload)
+    stats["total_revenue"] = round(float(stats["total_revenue"]), 2)
+    stats["today_revenue"] = round(float(stats["today_revenue"]), 2)
+    return stats, len(payload)
+
+
+def timed(fn, conn, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(conn)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    conn = build_db()
+    legacy_ms, (legacy, legacy_bytes) = timed(legacy_stats, conn, 3)
+    aggregate_ms, (aggregate, aggregate_bytes) = timed(aggregate_stats, conn, 10)
+    assert legacy == aggregate, (legacy, aggregate)
+
+    print(f"{ORDERS:,} orders, {legacy['total_customers']:,} customers")
+    print(f"{'method':>10} | {'time':>9} | {'payload':>10}")
+    print("-" * 36)
+    print(f"{'legacy':>10} | {legacy_ms:>7.1f}ms | {legacy_bytes / 1024:>8.0f}KB")
+    print(f"{'aggregate':>10} | {aggregate_ms:>7.1f}ms | {aggregate_bytes:>9}B")
+    print(f"speedup {legacy_ms / aggregate_ms:.1f}x, payload {legacy_bytes / aggregate_bytes:,.0f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
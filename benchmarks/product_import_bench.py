@@ -0,0 +1,171 @@
+"""
+Bulk product import throughput against a local database stand-in.
+
+A small SQLite-backed imitation of the Supabase table API (select/eq,
+insert, update, upsert on a unique key) stands in for PostgREST, with an
+optional simulated round-trip per request. It compares:
+
+  per-row  the seed-script pattern: select category, select product, then
+           insert or update, one request each, per row
+  import   services.product_import.import_products: one category read, one
+           category insert per batch with new names, one upsert per batch
+
+Run from the repo root: python benchmarks/product_import_bench.py
+"""
+import io
+import os
+import random
+import sqlite3
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import product_import
+
+COLUMNS = {
+    "categories": ["id", "business_id", "name"],
+    "products": ["id", "business_id", "category_id", "name", "description", "price", "image_urls", "in_stock", "stock_quantity"],
+}
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db, self.table, self.filters, self.op, self.payload, self.on_conflict = db, table, [], "select", None, None
+
+    def select(self, columns="*"):
+        self.op = "select"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, data):
+        self.op, self.payload = "update", data
+        return self
+
+    def upsert(self, rows, on_conflict="", returning=None):
+        self.op, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def execute(self):
+        time.sleep(self.db.rtt)
+        self.db.requests += 1
+        conn = self.db.conn
+        where = " AND ".join(f"{c} = ?" for c, _ in self.filters) or "1"
+        params = [v for _, v in self.filters]
+        if self.op == "select":
+            cols = COLUMNS[self.table]
+            rows = conn.execute(f"SELECT {', '.join(cols)} FROM {self.table} WHERE {where}", params).fetchall()
+            return FakeResult([dict(zip(cols, r)) for r in rows])
+        if self.op == "update":
+            sets = ", ".join(f"{c} = ?" for c in self.payload)
+            conn.execute(f"UPDATE {self.table} SET {sets} WHERE {where}", [*map(_sql, self.payload.values()), *params])
+            return FakeResult([])
+
+        rows = [dict(r, id=r.get("id") or str(uuid.uuid4())) for r in self.payload]
+        cols = list(rows[0])
+        sql = f"INSERT INTO {self.table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        if self.op == "upsert":
+            updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c not in ("id", *self.on_conflict.split(",")))
+            sql += f" ON CONFLICT({self.on_conflict}) DO UPDATE SET {updates}"
+        with conn:
+            conn.executemany(sql, [[_sql(r[c]) for c in cols] for r in rows])
+        return FakeResult(rows)
+
+
+def _sql(value):
+    return "|".join(value) if isinstance(value, list) else value
+
+
+class FakeSupabase:
+    def __init__(self, rtt: float):
+        self.rtt, self.requests = rtt, 0
+        self.conn = sqlite3.connect(":memory:", isolation_level=None)
+        self.conn.execute("CREATE TABLE categories (id TEXT PRIMARY KEY, business_id TEXT, name TEXT)")
+        self.conn.execute(
+            "CREATE TABLE products (id TEXT PRIMARY KEY, business_id TEXT, category_id TEXT, name TEXT, "
+            "description TEXT, price REAL, image_urls TEXT, in_stock INTEGER DEFAULT 1, "
+            "stock_quantity INTEGER DEFAULT 0, UNIQUE(business_id, name))"
+        )
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+
+def make_csv(n: int) -> bytes:
+    rng = random.Random(n)
+    lines = ["name,category,description,price,stock_quantity,in_stock,image_urls"]
+    categories = [f"Category {i}" for i in range(20)]
+    for i in range(n):
+        lines.append(
+            f"Product {i},{rng.choice(categories)},\"Steel, dishwasher safe {i}\",{rng.randint(50, 5000)},"
+            f"{rng.randint(0, 100)},yes,https://img.example/{i}.jpg|https://img.example/{i}b.jpg"
+        )
+    lines.append(",Cutlery,missing name,10,1,yes,")
+    lines.append("Bad Price,Cutlery,,abc,1,yes,")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def per_row_import(sb, business_id: str, data: bytes) -> int:
+    imported = 0
+    for _, row in product_import.iter_rows(io.BytesIO(data), "csv"):
+        try:
+            category, product = product_import.parse_product_row(row)
+        except ValueError:
+            continue
+        found = sb.table("categories").select("*").eq("business_id", business_id).eq("name", category).execute()
+        category_id = found.data[0]["id"] if found.data else (
+            sb.table("categories").insert({"business_id": business_id, "name": category}).execute().data[0]["id"]
+        )
+        product = dict(product, business_id=business_id, category_id=category_id)
+        existing = sb.table("products").select("*").eq("business_id", business_id).eq("name", product["name"]).execute()
+        if existing.data:
+            sb.table("products").update(product).eq("id", existing.data[0]["id"]).execute()
+        else:
+            sb.table("products").insert(product).execute()
+        imported += 1
+    return imported
+
+
+def run(label: str, rows: int, rtt_ms: float, fn):
+    data = make_csv(rows)
+    sb = FakeSupabase(rtt_ms / 1000)
+    start = time.perf_counter()
+    imported = fn(sb, data)
+    elapsed = time.perf_counter() - start
+    assert sb.count() == rows and imported == rows, (sb.count(), imported)
+    print(f"{label:>8} | {rows:>7} | {rtt_ms:>5.1f}ms | {sb.requests:>8} | {elapsed:>7.2f}s | {rows / elapsed:>9,.0f}")
+
+
+def main():
+    def bulk(sb, data):
+        product_import.get_supabase = lambda: sb
+        report = product_import.import_products("biz", io.BytesIO(data), "csv", 500)
+        # The two bad rows are the last two lines (line 1 is the header)
+        assert [e["row"] for e in report["errors"]] == [report["rows"], report["rows"] + 1]
+        return report["imported"]
+
+    print(f"{'method':>8} | {'rows':>7} | {'rtt':>7} | {'requests':>8} | {'time':>8} | {'rows/s':>9}")
+    print("-" * 62)
+    for rtt_ms in (0.0, 5.0):
+        run("per-row", 2_000 if rtt_ms else 20_000, rtt_ms, lambda sb, data: per_row_import(sb, "biz", data))
+        run("import", 100_000, rtt_ms, bulk)
+
+
+if __name__ == "__main__":
+    main()
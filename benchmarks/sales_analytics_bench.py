@@ -0,0 +1,209 @@
+"""
+Sales analytics over 1M synthetic orders: per-row Python loop vs columnar
+NumPy vs one SQL aggregate (SQLite standing in for the sales_analytics RPC).
+
+"loop" is what the endpoint would cost without database aggregation: every
+order in range shipped as JSON, then bucketed in Python with a
+datetime.fromisoformat and a json.loads of the items per order. "numpy" does
+the same bucketing on column arrays (np.unique + np.bincount) after flattening
+the items once. "sql" runs the SQLite equivalent of sales_analytics and ships
+one row per bucket. All three results are checked to be identical.
+
+Run from the repo root: python benchmarks/sales_analytics_bench.py [orders]
+"""
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+ORDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+PRODUCTS = 500
+TOP = 5
+DAY = 86400
+START = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+SPAN_DAYS = 365
+
+
+def build_db() -> sqlite3.Connection:
+    rng = np.random.default_rng(7)
+    names = [f"Product {i:03d}" for i in range(PRODUCTS)]
+    prices = rng.integers(50, 5000, PRODUCTS)
+    created = START + rng.integers(0, SPAN_DAYS * DAY, ORDERS)
+    line_counts = rng.integers(1, 4, ORDERS)
+    line_products = rng.integers(0, PRODUCTS, int(line_counts.sum()))
+    line_qty = rng.integers(1, 5, len(line_products))
+
+    rows = []
+    line = 0
+    for i in range(ORDERS):
+        items = []
+        total = 0
+        for _ in range(line_counts[i]):
+            p = line_products[line]
+            q = int(line_qty[line])
+            items.append({"product": names[p], "quantity": q, "price": int(prices[p])})
+            total += q * int(prices[p])
+            line += 1
+        stamp = datetime.fromtimestamp(int(created[i]), timezone.utc).isoformat()
+        rows.append(("biz", total, json.dumps(items), stamp))
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE orders (business_id TEXT, total REAL, items TEXT, created_at TEXT)")
+    conn.execute("CREATE INDEX idx_orders_business_created ON orders(business_id, created_at)")
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)", rows)
+    return conn
+
+
+def top_products(per_product: dict) -> list:
+    ranked = sorted(per_product.items(), key=lambda kv: (-kv[1][1], -kv[1][0], kv[0]))
+    return [(name, qty, round(revenue, 2)) for name, (qty, revenue) in ranked[:TOP]]
+
+
+def loop_analytics(conn) -> tuple:
+    payload = json.dumps([
+        {"total": total, "items": json.loads(items), "created_at": created}
+        for total, items, created in conn.execute(
+            "SELECT total, items, created_at FROM orders WHERE business_id = ?", ("biz",)
+        )
+    ])
+    orders = json.loads(payload)
+
+    start = time.perf_counter()
+    buckets = {}
+    for order in orders:
+        day = datetime.fromisoformat(order["created_at"]).date().isoformat()
+        bucket = buckets.setdefault(day, [0, 0.0, {}])
+        bucket[0] += 1
+        bucket[1] += order["total"]
+        for item in order["items"]:
+            entry = bucket[2].setdefault(item["product"], [0, 0.0])
+            entry[0] += item["quantity"]
+            entry[1] += item["quantity"] * item["price"]
+    series = [
+        (day, b[0], round(b[1], 2), top_products(b[2]))
+        for day, b in sorted(buckets.items())
+    ]
+    return series, len(payload), time.perf_counter() - start
+
+
+def numpy_analytics(conn) -> tuple:
+    """Columnar bucketing; the one-off flattening of items is timed separately."""
+    flatten_start = time.perf_counter()
+    totals, created, line_order, line_product, line_qty, line_price = [], [], [], [], [], []
+    names = {}
+    for i, (total, items, stamp) in enumerate(conn.execute(
+        "SELECT total, items, created_at FROM orders WHERE business_id = ?", ("biz",)
+    )):
+        totals.append(total)
+        created.append(stamp[:19])  # UTC; datetime64 takes no offset
+        for item in json.loads(items):
+            line_order.append(i)
+            line_product.append(names.setdefault(item["product"], len(names)))
+            line_qty.append(item["quantity"])
+            line_price.append(item["price"])
+    totals = np.array(totals)
+    created = np.array(created, dtype="datetime64[s]")
+    line_order = np.array(line_order)
+    line_product = np.array(line_product)
+    line_qty = np.array(line_qty, dtype=np.float64)
+    line_revenue = line_qty * np.array(line_price)
+    flatten_time = time.perf_counter() - flatten_start
+
+    start = time.perf_counter()
+    days, order_bucket = np.unique(created.astype("datetime64[D]"), return_inverse=True)
+    counts = np.bincount(order_bucket, minlength=len(days))
+    revenue = np.bincount(order_bucket, weights=totals, minlength=len(days))
+
+    # One (bucket, product) cell per line, summed in a single pass
+    cell = order_bucket[line_order] * len(names) + line_product
+    cell_qty = np.bincount(cell, weights=line_qty, minlength=len(days) * len(names)).reshape(len(days), -1)
+    cell_rev = np.bincount(cell, weights=line_revenue, minlength=len(days) * len(names)).reshape(len(days), -1)
+
+    by_code = sorted(names, key=names.get)
+    series = []
+    for b, day in enumerate(days):
+        present = np.nonzero(cell_qty[b])[0]
+        per_product = {by_code[p]: (cell_qty[b, p], cell_rev[b, p]) for p in present}
+        series.append((str(day), int(counts[b]), round(float(revenue[b]), 2), top_products(per_product)))
+    return series, flatten_time, time.perf_counter() - start
+
+
+SQL = """
+WITH scoped AS MATERIALIZED (
+    SELECT rowid AS id, total, items, substr(created_at, 1, 10) AS period
+    FROM orders WHERE business_id = ?
+),
+periods AS MATERIALIZED (
+    SELECT period, COUNT(*) AS orders, SUM(total) AS revenue FROM scoped GROUP BY period
+),
+product_periods AS (
+    SELECT s.period, json_extract(i.value, '$.product') AS product,
+           SUM(json_extract(i.value, '$.quantity')) AS quantity,
+           SUM(json_extract(i.value, '$.quantity') * json_extract(i.value, '$.price')) AS revenue
+    FROM scoped s, json_each(s.items) i
+    GROUP BY s.period, product
+),
+ranked AS MATERIALIZED (
+    SELECT * FROM (
+        SELECT *, row_number() OVER (
+            PARTITION BY period ORDER BY revenue DESC, quantity DESC, product
+        ) AS rank
+        FROM product_periods
+    ) WHERE rank <= ?
+)
+SELECT p.period, p.orders, p.revenue, r.product, r.quantity, r.revenue
+FROM periods p LEFT JOIN ranked r ON r.period = p.period
+ORDER BY p.period, r.rank
+"""
+
+
+def sql_analytics(conn) -> tuple:
+    rows = conn.execute(SQL, ("biz", TOP)).fetchall()
+    payload = json.dumps(rows)
+    series = {}
+    for period, orders, revenue, product, quantity, product_revenue in json.loads(payload):
+        entry = series.setdefault(period, (period, orders, round(revenue, 2), []))
+        if product is not None:
+            entry[3].append((product, quantity, round(product_revenue, 2)))
+    return list(series.values()), len(payload)
+
+
+def normalize(series: list) -> list:
+    return [
+        (day, orders, revenue, [(name, float(qty), rev) for name, qty, rev in tops])
+        for day, orders, revenue, tops in series
+    ]
+
+
+def main():
+    print(f"Building {ORDERS:,} orders...")
+    build_start = time.perf_counter()
+    conn = build_db()
+    print(f"  built in {time.perf_counter() - build_start:.1f}s\n")
+
+    start = time.perf_counter()
+    loop_series, loop_bytes, loop_compute = loop_analytics(conn)
+    loop_total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    np_series, np_flatten, np_compute = numpy_analytics(conn)
+    np_total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sql_series, sql_bytes = sql_analytics(conn)
+    sql_total = time.perf_counter() - start
+
+    assert normalize(loop_series) == normalize(np_series) == normalize(sql_series), "results differ"
+
+    print(f"{'':8} {'total':>9} {'aggregate':>10} {'shipped':>12}")
+    print(f"{'loop':8} {loop_total:>8.2f}s {loop_compute:>9.2f}s {loop_bytes / 1e6:>10.1f}MB")
+    print(f"{'numpy':8} {np_total:>8.2f}s {np_compute:>9.2f}s {'(flatten ' + format(np_flatten, '.1f') + 's)':>12}")
+    print(f"{'sql':8} {sql_total:>8.2f}s {'-':>10} {sql_bytes / 1e3:>10.1f}KB")
+    print(f"\n{len(sql_series)} daily buckets, results identical")
+
+
+if __name__ == "__main__":
+    main()
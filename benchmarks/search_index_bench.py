@@ -0,0 +1,87 @@
+"""
+search_products: full catalog scan vs the in-memory ProductIndex.
+
+The scan reproduces the previous implementation (score every product for
+every query, network fetch excluded); the index scores only candidates found
+through its token postings. Keyword results are checked to be identical;
+the "index+fuzzy" column is the full search including the transliterated /
+phonetic trigram pass that appends fuzzy-only matches.
+
+Run from the repo root: python benchmarks/search_index_bench.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.search_index import ProductIndex, score_product, searchable_fields
+
+ADJECTIVES = ["steel", "ceramic", "glass", "copper", "brass", "wooden", "melamine", "bone", "china", "hammered", "gold", "silver"]
+NOUNS = ["plate", "thali", "bowl", "katori", "spoon", "glass", "tumbler", "jug", "kadai", "tawa", "cup", "saucer", "tray", "dinner", "set"]
+CATEGORIES = ["Dinnerware", "Cutlery", "Drinkware", "Cookware", "Serveware"]
+QUERIES = [
+    "steel thali", "plate", "ceramic dinner set", "spoons", "copper jug kitne ka", "sp", "xyzzy",
+    "gold hammered serving spoon", "थाली", "स्टील कटोरी", "chammach", "thaali kitne ki hai",
+]
+
+
+def make_products(n: int) -> list:
+    rng = random.Random(n)
+    products = []
+    for i in range(n):
+        words = rng.sample(ADJECTIVES, 2) + rng.sample(NOUNS, 2)
+        products.append({
+            "id": f"p{i}",
+            "name": f"{' '.join(words).title()} {rng.randint(1, 12)}pc Model{i}",
+            "description": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}, dishwasher safe, size {rng.randint(10, 40)} cm",
+            "categories": {"name": rng.choice(CATEGORIES)},
+        })
+    return products
+
+
+def scan_search(products: list, query: str) -> list:
+    query_lower = query.lower().strip()
+    query_words = query_lower.split()
+    scored = []
+    for product in products:
+        name_lower, desc_lower, searchable = searchable_fields(product)
+        score = score_product(query_lower, query_words, name_lower, desc_lower, searchable)
+        if score > 0:
+            scored.append((score, product))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [item[1] for item in scored]
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    print(f"{'products':>9} | {'build':>9} | {'scan/query':>11} | {'index/query':>11} | speedup | {'index+fuzzy':>11}")
+    print("-" * 76)
+    for n in (100, 10_000, 100_000):
+        products = make_products(n)
+        start = time.perf_counter()
+        index = ProductIndex(products)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for query in QUERIES:
+            assert [p["id"] for p in scan_search(products, query)] == [p["id"] for p in index.keyword_search(query)], query
+
+        repeat = max(1, 2000 // max(1, n // 100))
+        scan_ms = sum(timed(lambda q=q: scan_search(products, q), repeat) for q in QUERIES) / len(QUERIES)
+        index_ms = sum(timed(lambda q=q: index.keyword_search(q), repeat) for q in QUERIES) / len(QUERIES)
+        full_ms = sum(timed(lambda q=q: index.search(q), repeat) for q in QUERIES) / len(QUERIES)
+        print(
+            f"{n:>9} | {build_ms:>7.0f}ms | {scan_ms:>9.2f}ms | {index_ms:>9.2f}ms | "
+            f"{scan_ms / index_ms:>6.1f}x | {full_ms:>9.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Concurrent orders against one product: read-modify-write vs conditional decrement.
+
+Many threads, each with its own SQLite connection (WAL, like separate
+PostgREST requests), keep ordering 1-3 units of a product with limited stock.
+
+  read-modify-write  SELECT stock, then UPDATE stock = <value read> - qty
+  conditional        UPDATE ... SET stock = stock - qty WHERE stock >= qty,
+                     the statement decrement_stock runs per item
+
+SQLite serializes writers where Postgres takes a row lock and re-checks the
+WHERE clause, but both make the conditional UPDATE atomic. The
+read-modify-write version loses updates and oversells.
+
+A second table covers multi-item orders naming the same products in random
+order. SQLite has no row locks, so Postgres's are modelled with one lock per
+product held until the order commits; a lock wait longer than DEADLOCK_TIMEOUT
+counts as a deadlock (Postgres aborts one of the transactions).
+
+  item order   lock each row as its item is reached (decrement_stock before)
+  sorted       lock all of the order's rows by id first (decrement_stock now)
+
+Run from the repo root: python benchmarks/stock_contention_bench.py
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+STOCK = 2000
+THREADS = 32
+ORDERS_PER_THREAD = 150
+PRODUCTS = 6
+ITEMS_PER_ORDER = (2, 4)
+MULTI_ORDERS_PER_THREAD = 60
+DEADLOCK_TIMEOUT = 0.5
+
+
+def setup(path: str):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("DROP TABLE IF EXISTS products")
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, stock_quantity INTEGER, in_stock INTEGER)")
+    conn.execute("INSERT INTO products VALUES (1, ?, 1)", (STOCK,))
+    conn.close()
+
+
+def read_modify_write(conn, qty: int) -> bool:
+    stock = conn.execute("SELECT stock_quantity FROM products WHERE id = 1").fetchone()[0]
+    if stock < qty:
+        return False
+    time.sleep(0)  # the app round trip between the read and the write
+    conn.execute(
+        "UPDATE products SET stock_quantity = ?, in_stock = ? WHERE id = 1",
+        (stock - qty, stock - qty > 0),
+    )
+    return True
+
+
+def conditional(conn, qty: int) -> bool:
+    cur = conn.execute(
+        "UPDATE products SET stock_quantity = stock_quantity - ?, in_stock = stock_quantity - ? > 0 "
+        "WHERE id = 1 AND stock_quantity >= ? AND stock_quantity > 0",
+        (qty, qty, qty),
+    )
+    return cur.rowcount == 1
+
+
+def run(label: str, path: str, order_fn):
+    setup(path)
+    sold = [0] * THREADS
+    barrier = threading.Barrier(THREADS)
+
+    def worker(n: int):
+        rng = random.Random(n)
+        conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        barrier.wait()
+        for _ in range(ORDERS_PER_THREAD):
+            qty = rng.randint(1, 3)
+            if order_fn(conn, qty):
+                sold[n] += qty
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    conn = sqlite3.connect(path)
+    final, in_stock = conn.execute("SELECT stock_quantity, in_stock FROM products WHERE id = 1").fetchone()
+    conn.close()
+    total_sold = sum(sold)
+    orders = THREADS * ORDERS_PER_THREAD
+    print(
+        f"{label:>18} | {orders / elapsed:>8,.0f} | {total_sold:>5} | {max(0, total_sold - STOCK):>8} | "
+        f"{final:>5} | {STOCK - total_sold - final:>+11} | {bool(in_stock)!s:>8}"
+    )
+
+
+def setup_catalog(path: str):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("DROP TABLE IF EXISTS products")
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, stock_quantity INTEGER, in_stock INTEGER)")
+    conn.executemany("INSERT INTO products VALUES (?, ?, 1)", [(i, STOCK) for i in range(PRODUCTS)])
+    conn.close()
+
+
+def run_multi(label: str, path: str, sort_locks: bool):
+    setup_catalog(path)
+    row_locks = [threading.Lock() for _ in range(PRODUCTS)]
+    sold = [0] * THREADS
+    deadlocks = [0] * THREADS
+    barrier = threading.Barrier(THREADS)
+
+    def place(conn, items) -> bool:
+        """One order's transaction; False if it deadlocked and was rolled back."""
+        held = []
+        try:
+            order = sorted({pid for pid, _ in items}) if sort_locks else [pid for pid, _ in items]
+            for pid in order:
+                if pid in held:
+                    continue
+                if not row_locks[pid].acquire(timeout=DEADLOCK_TIMEOUT):
+                    return False
+                held.append(pid)
+                time.sleep(0)  # the statement round trip while holding earlier rows
+            for pid, qty in items:
+                conn.execute(
+                    "UPDATE products SET stock_quantity = stock_quantity - ?, in_stock = stock_quantity - ? > 0 "
+                    "WHERE id = ? AND stock_quantity >= ?",
+                    (qty, qty, pid, qty),
+                )
+            return True
+        finally:
+            for pid in held:
+                row_locks[pid].release()
+
+    def worker(n: int):
+        rng = random.Random(n)
+        conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        barrier.wait()
+        for _ in range(MULTI_ORDERS_PER_THREAD):
+            pids = rng.sample(range(PRODUCTS), rng.randint(*ITEMS_PER_ORDER))
+            items = [(pid, rng.randint(1, 3)) for pid in pids]
+            if place(conn, items):
+                sold[n] += sum(qty for _, qty in items)
+            else:
+                deadlocks[n] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    orders = THREADS * MULTI_ORDERS_PER_THREAD
+    print(
+        f"{label:>18} | {orders / elapsed:>8,.0f} | {orders - sum(deadlocks):>6} | {sum(deadlocks):>9} | {sum(sold):>5}"
+    )
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "stock.db")
+    print(f"stock={STOCK} threads={THREADS} orders={THREADS * ORDERS_PER_THREAD} (1-3 units each)")
+    print(f"{'method':>18} | {'orders/s':>8} | {'sold':>5} | {'oversold':>8} | {'final':>5} | {'units drift':>11} | {'in_stock':>8}")
+    print("-" * 84)
+    run("read-modify-write", path, read_modify_write)
+    run("conditional", path, conditional)
+
+    print(f"\nmulti-item orders: {PRODUCTS} products, {ITEMS_PER_ORDER[0]}-{ITEMS_PER_ORDER[1]} items each in random order, "
+          f"orders={THREADS * MULTI_ORDERS_PER_THREAD}")
+    print(f"{'locking':>18} | {'orders/s':>8} | {'placed':>6} | {'deadlocks':>9} | {'sold':>5}")
+    print("-" * 60)
+    run_multi("item order", path, sort_locks=False)
+    run_multi("sorted", path, sort_locks=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+VectorIndex: build time, top-k cosine query latency and memory per 10k products,
+with and without the embedding cache a cold build fills.
+
+Uses the offline HashingEmbedder (EMBEDDING_PROVIDER=hashing), so it needs no
+API key. Query latency excludes embedding the query; the argpartition top-k is
+checked against a full argsort.
+
+Run from the repo root: python benchmarks/vector_index_bench.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from search_index_bench import make_products
+from services import embeddings
+from services.vector_index import VectorIndex
+
+QUERIES = ["steel ki katori", "gift for wedding", "थाली", "copper jug", "chammach set", "ceramic dinner plate"]
+K = 15
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    query_vectors = [embeddings.embed_query(q) for q in QUERIES]
+    dim = query_vectors[0].shape[0]
+    print(f"embedder={embeddings.get_embedder().name} dim={dim} k={K}")
+    print(
+        f"{'products':>9} | {'build':>9} | {'rebuild':>9} | {'query':>9} | {'matrix':>9} | "
+        f"{'per 10k':>9} | {'index/10k':>9} | {'cold/10k':>9}"
+    )
+    print("-" * 94)
+    for n in (1_000, 10_000, 100_000):
+        products = make_products(n)
+
+        # Cold build: every product embedded and added to the embedding cache.
+        # Timed untraced, then repeated under tracemalloc for its memory
+        embeddings._cache.clear()
+        start = time.perf_counter()
+        VectorIndex(products, dim=dim)
+        build_ms = (time.perf_counter() - start) * 1000
+        embeddings._cache.clear()
+        tracemalloc.start()
+        cold = VectorIndex(products, dim=dim)
+        cold_traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del cold
+
+        # Rebuild from the embedding cache, as after a SEARCH_INDEX_TTL expiry
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = VectorIndex(products, dim=dim)
+        rebuild_ms = (time.perf_counter() - start) * 1000
+        traced, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        matrix = index._matrix[:len(index)]
+        for vector in query_vectors:
+            scores = matrix @ vector
+            expected = set(np.argsort(-scores)[:K].tolist())
+            got = {index._rows[p["id"]] for p, _ in index.search(vector, K)}
+            assert len(got) == K and {scores[r] for r in got} == {scores[r] for r in expected}
+
+        repeat = max(5, 200_000 // n)
+        query_ms = sum(timed(lambda v=v: index.search(v, K), repeat) for v in query_vectors) / len(query_vectors)
+        per_10k = 10_000 / n
+        print(
+            f"{n:>9} | {build_ms:>7.0f}ms | {rebuild_ms:>7.0f}ms | {query_ms:>7.3f}ms | {index.nbytes / 2**20:>7.1f}MB | "
+            f"{matrix.nbytes * per_10k / 2**20:>7.2f}MB | {traced * per_10k / 2**20:>7.2f}MB | "
+            f"{cold_traced * per_10k / 2**20:>7.2f}MB"
+        )
+    print("\nper 10k = dense float32 rows only; index/10k = everything the index allocates")
+    print("(matrix with spare capacity and id maps), measured with tracemalloc on a rebuild;")
+    print("cold/10k = a cold build, which also fills the embedding cache (a second copy of")
+    print(f"every vector, up to EMBEDDING_CACHE_MAX={Config.EMBEDDING_CACHE_MAX:,} per worker).")
+
+
+if __name__ == "__main__":
+    main()
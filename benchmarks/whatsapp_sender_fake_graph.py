@@ -0,0 +1,88 @@
+"""
+Exercise the outbound WhatsApp sender against a local fake Graph API.
+
+The fake endpoint answers every 5th request with 429 and every 13th with 503,
+so retries, per-number rate limiting and keep-alive reuse are all visible.
+
+Run from the repo root: python benchmarks/whatsapp_sender_fake_graph.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MESSAGES = 200
+# Replies to one customer go out strictly in order, so spread them over several
+RECIPIENTS = 50
+SENDER_NUMBERS = ["1001", "1002"]
+
+stats = {"requests": 0, "connections": set(), "per_number": {}}
+stats_lock = threading.Lock()
+
+
+class FakeGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        phone_number_id = self.path.strip("/").split("/")[0]
+        with stats_lock:
+            stats["requests"] += 1
+            stats["connections"].add(self.client_address)
+            stats["per_number"][phone_number_id] = stats["per_number"].get(phone_number_id, 0) + 1
+            n = stats["requests"]
+
+        if n % 5 == 0:
+            self._reply(429, b'{"error": {"message": "rate limited"}}', {"Retry-After": "0"})
+        elif n % 13 == 0:
+            self._reply(503, b'{"error": {"message": "unavailable"}}')
+        else:
+            self._reply(200, b'{"messages": [{"id": "wamid.fake"}]}')
+
+    def _reply(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGraphHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["META_GRAPH_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    # The outbox is durable; keep its rows out of the real queue database
+    os.environ["WEBHOOK_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(), "outbox.db")
+
+    from services import metrics, whatsapp_sender
+
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        whatsapp_sender.enqueue_message(
+            to=f"+9100000{i % RECIPIENTS:05d}",
+            body=f"message {i}",
+            phone_number_id=SENDER_NUMBERS[i % len(SENDER_NUMBERS)],
+            access_token="fake-token",
+        )
+    whatsapp_sender.join()
+    elapsed = time.perf_counter() - start
+
+    counters = metrics.snapshot()["counters"]
+    print(f"sent {counters.get('whatsapp_send.sent', 0)}/{MESSAGES} in {elapsed:.2f}s")
+    print(f"HTTP requests: {stats['requests']} over {len(stats['connections'])} TCP connections")
+    print(f"retried: {counters.get('whatsapp_send.retried', 0)}, throttled waits: {counters.get('whatsapp_send.throttled', 0)}")
+    print(f"requests per sender number: {stats['per_number']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,8 +16,88 @@ class Config:
 
     # Google Gemini
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL_CACHE_MAX = int(os.getenv("GEMINI_MODEL_CACHE_MAX", "256"))
+    GEMINI_MODEL_CACHE_TTL = int(os.getenv("GEMINI_MODEL_CACHE_TTL", "3000"))
+    # Explicit context caching of large stored system prompts
+    GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "true").lower() == "true"
+    GEMINI_CACHE_MODEL = os.getenv("GEMINI_CACHE_MODEL", "models/gemini-2.0-flash-001")
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096"))
 
     # Meta WhatsApp Cloud API
     META_APP_ID = os.getenv("META_APP_ID", "")
     META_APP_SECRET = os.getenv("META_APP_SECRET", "")
     META_WEBHOOK_VERIFY_TOKEN = os.getenv("META_WEBHOOK_VERIFY_TOKEN", "")
+    # Override to point outbound sends at a local fake Graph endpoint
+    META_GRAPH_URL = os.getenv("META_GRAPH_URL", "https://graph.facebook.com/v19.0")
+
+    # Outbound WhatsApp sender
+    WHATSAPP_SEND_RATE = float(os.getenv("WHATSAPP_SEND_RATE", "20"))
+    WHATSAPP_SEND_BURST = float(os.getenv("WHATSAPP_SEND_BURST", "40"))
+    WHATSAPP_SEND_RETRIES = int(os.getenv("WHATSAPP_SEND_RETRIES", "4"))
+    WHATSAPP_SEND_POOL_SIZE = int(os.getenv("WHATSAPP_SEND_POOL_SIZE", "16"))
+    WHATSAPP_SENDER_THREADS = int(os.getenv("WHATSAPP_SENDER_THREADS", "4"))
+    WHATSAPP_OUTBOX_SIZE = int(os.getenv("WHATSAPP_OUTBOX_SIZE", "1000"))
+    WHATSAPP_OUTBOX_TIMEOUT = float(os.getenv("WHATSAPP_OUTBOX_TIMEOUT", "5"))
+
+    # Business row cache used on the WhatsApp message path
+    BUSINESS_CACHE_TTL = int(os.getenv("BUSINESS_CACHE_TTL", "300"))
+    BUSINESS_CACHE_NEGATIVE_TTL = int(os.getenv("BUSINESS_CACHE_NEGATIVE_TTL", "60"))
+    BUSINESS_CACHE_MAX = int(os.getenv("BUSINESS_CACHE_MAX", "10000"))
+
+    # Dashboard stats cache; order writes in the same process invalidate it
+    DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+    DASHBOARD_CACHE_MAX = int(os.getenv("DASHBOARD_CACHE_MAX", "1000"))
+
+    # Live order stream (SSE): events kept per business for Last-Event-ID resume
+    ORDER_EVENTS_BUFFER = int(os.getenv("ORDER_EVENTS_BUFFER", "500"))
+    # Seconds between checks for events published by other processes
+    ORDER_EVENTS_POLL_INTERVAL = float(os.getenv("ORDER_EVENTS_POLL_INTERVAL", "0.5"))
+    ORDER_STREAM_HEARTBEAT = float(os.getenv("ORDER_STREAM_HEARTBEAT", "15"))
+    # Rows fetched per query by the order export; keep below PostgREST's max-rows (1000)
+    ORDER_EXPORT_PAGE_SIZE = int(os.getenv("ORDER_EXPORT_PAGE_SIZE", "500"))
+
+    # Bot conversation history sent to Gemini
+    HISTORY_FETCH_LIMIT = int(os.getenv("HISTORY_FETCH_LIMIT", "50"))
+    HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+
+    # Seconds before a business's in-memory search index is rebuilt (in the background) from the database
+    SEARCH_INDEX_TTL = int(os.getenv("SEARCH_INDEX_TTL", "300"))
+    # Businesses whose indexes each worker process keeps in memory (least recently used are dropped)
+    SEARCH_INDEX_MAX_BUSINESSES = int(os.getenv("SEARCH_INDEX_MAX_BUSINESSES", "500"))
+
+    # Products retrieved and attached to each bot turn
+    CATALOG_TOP_K = int(os.getenv("CATALOG_TOP_K", "15"))
+
+    # Semantic product retrieval ("hashing" works offline; "gemini" calls the embedding API)
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "hashing")
+    EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+    GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004")
+    EMBEDDING_CACHE_MAX = int(os.getenv("EMBEDDING_CACHE_MAX", "200000"))
+    # Cosine similarity below which semantic matches are not attached to a turn
+    SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE", "0.25"))
+
+    # Bulk product import: rows per upsert request, and per-row errors kept in the response
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+    # Product image processing: resize threads, and seconds an upload request waits for them
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+    IMAGE_PROCESS_WAIT = float(os.getenv("IMAGE_PROCESS_WAIT", "15"))
+
+    # Product image uploads: largest accepted file, and where partial uploads are spooled
+    UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+    UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "storeo-uploads"))
+    UPLOAD_SPOOL_TTL = int(os.getenv("UPLOAD_SPOOL_TTL", "86400"))
+
+    # Webhook processing queue
+    WEBHOOK_QUEUE_PATH = os.getenv("WEBHOOK_QUEUE_PATH", "webhook_queue.db")
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "3"))
+    # Messages from one customer closer together than this are answered as one turn
+    WEBHOOK_COALESCE_WINDOW = float(os.getenv("WEBHOOK_COALESCE_WINDOW", "2.0"))
+    WEBHOOK_COALESCE_MAX_WAIT = float(os.getenv("WEBHOOK_COALESCE_MAX_WAIT", "8.0"))
+
+    # Redelivered webhook deduplication (set WEBHOOK_DEDUP_PATH empty for memory only)
+    WEBHOOK_DEDUP_PATH = os.getenv("WEBHOOK_DEDUP_PATH", WEBHOOK_QUEUE_PATH)
+    WEBHOOK_DEDUP_TTL = int(os.getenv("WEBHOOK_DEDUP_TTL", "86400"))
+    WEBHOOK_DEDUP_MAX_IDS = int(os.getenv("WEBHOOK_DEDUP_MAX_IDS", "100000"))
@@ -4,6 +4,7 @@ import {
     getDashboardStats,
     getOrders,
     updateOrderStatus,
+    subscribeToOrders,
     getWhatsAppStatus,
     testWhatsAppMessage,
     launchBot,
@@ -38,6 +39,25 @@ export default function Dashboard({ business }) {
         }
     }, [business?.id])
 
+    useEffect(() => {
+        if (!business?.id) return
+        const refreshStats = () => getDashboardStats(business.id).then(setStats).catch(() => {})
+        return subscribeToOrders(business.id, {
+            'order.created': order => {
+                setOrders(prev => [order, ...prev.filter(o => o.id !== order.id)].slice(0, 50))
+                refreshStats()
+            },
+            'order.updated': order => {
+                setOrders(prev => prev.map(o => o.id === order.id ? order : o))
+                refreshStats()
+            },
+            reset: () => {
+                getOrders(business.id).then(data => setOrders(data.orders || [])).catch(() => {})
+                refreshStats()
+            },
+        })
+    }, [business?.id])
+
     const fetchAll = async () => {
         setLoading(true)
         try {
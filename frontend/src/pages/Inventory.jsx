@@ -8,6 +8,7 @@ import {
     updateProduct,
     deleteProduct,
     uploadImage,
+    imageVariant,
 } from '../services/api'
 import { useLanguage } from '../contexts/LanguageContext'
 
@@ -310,7 +311,7 @@ export default function Inventory({ business }) {
                                 <div key={product.id} className="product-card">
                                     <div className="product-card-image">
                                         {product.image_urls?.length > 0 ? (
-                                            <img src={product.image_urls[0]} alt={product.name} />
+                                            <img src={imageVariant(product.image_urls[0], 'display')} alt={product.name} />
                                         ) : (
                                             <span className="no-image">📷</span>
                                         )}
@@ -368,7 +369,7 @@ export default function Inventory({ business }) {
                                     <div className="image-preview-grid" style={{ marginBottom: '8px' }}>
                                         {productForm.image_urls.map((url, i) => (
                                             <div key={i} className="image-preview">
-                                                <img src={url} alt="" />
+                                                <img src={imageVariant(url, 'thumb')} alt="" />
                                                 <button className="remove-btn" onClick={() => removeImage(i)}>✕</button>
                                             </div>
                                         ))}
@@ -77,10 +77,16 @@ export function deleteCategory(categoryId) {
 
 // ============ Products ============
 
-export function getProducts(businessId, categoryId) {
-  let url = `/inventory/products/${businessId}`;
-  if (categoryId) url += `?category_id=${categoryId}`;
-  return request(url);
+// Pass { limit, cursor } for a page ({ products, next_cursor }) and
+// { fields: ['id', 'name', ...] } for a column subset; neither returns everything.
+export function getProducts(businessId, categoryId, { limit, cursor, fields } = {}) {
+  const params = new URLSearchParams();
+  if (categoryId) params.set('category_id', categoryId);
+  if (limit) params.set('limit', limit);
+  if (cursor) params.set('cursor', cursor);
+  if (fields) params.set('fields', fields.join(','));
+  const query = params.toString();
+  return request(`/inventory/products/${businessId}${query ? `?${query}` : ''}`);
 }
 
 export function createProduct(data) {
@@ -109,22 +115,94 @@ export function searchProducts(businessId, query) {
 
 // ============ Image Upload ============
 
-export function uploadImage(businessId, file) {
-  const formData = new FormData();
-  formData.append('business_id', businessId);
-  formData.append('file', file);
-  return request('/inventory/upload-image', {
+const UPLOAD_CHUNK_SIZE = 1024 * 1024;
+const UPLOAD_CHUNK_RETRIES = 5;
+
+// Upload straight to storage through a signed URL, then let the backend
+// build the variants. Falls back to a resumable chunked upload through the
+// backend if the direct upload fails (e.g. storage unreachable from the client).
+export async function uploadImage(businessId, file) {
+  try {
+    const target = await request('/inventory/uploads/sign', {
+      method: 'POST',
+      body: { business_id: businessId, filename: file.name },
+    });
+    const response = await fetch(target.signed_url, {
+      method: 'PUT',
+      headers: { 'Content-Type': file.type || 'application/octet-stream' },
+      body: file,
+    });
+    if (!response.ok) throw new Error(`Direct upload failed (${response.status})`);
+    return await request('/inventory/uploads/complete', {
+      method: 'POST',
+      body: { business_id: businessId, path: target.path },
+    });
+  } catch (err) {
+    console.warn('Direct upload unavailable, using chunked upload:', err);
+    return uploadImageChunked(businessId, file);
+  }
+}
+
+async function uploadImageChunked(businessId, file) {
+  const upload = await request('/inventory/uploads/chunked', {
     method: 'POST',
-    body: formData,
+    body: { business_id: businessId, size: file.size },
   });
+  let offset = 0;
+  let failures = 0;
+  while (offset < file.size) {
+    const end = Math.min(offset + UPLOAD_CHUNK_SIZE, file.size);
+    try {
+      const response = await fetch(`${API_BASE}/inventory/uploads/chunked/${upload.upload_id}`, {
+        method: 'PUT',
+        headers: { 'Content-Range': `bytes ${offset}-${end - 1}/${file.size}` },
+        body: file.slice(offset, end),
+      });
+      const result = await response.json();
+      if (!response.ok && response.status !== 409) throw new Error(result.error || 'Chunk upload failed');
+      // On 409 the server tells us how much it already has
+      offset = result.offset;
+      failures = 0;
+      if (result.image) return { success: true, ...result.image };
+    } catch (err) {
+      if (++failures > UPLOAD_CHUNK_RETRIES) throw err;
+      await new Promise(resolve => setTimeout(resolve, 500 * 2 ** failures));
+      // Resume from whatever the server actually received
+      offset = (await request(`/inventory/uploads/chunked/${upload.upload_id}`)).offset;
+    }
+  }
+  throw new Error('Upload ended without a result');
+}
+
+// Uploaded images are stored as <hash>/whatsapp.jpg next to thumb.webp and
+// display.webp; other URLs (older uploads, external links) are returned as-is.
+export function imageVariant(url, variant) {
+  if (!url || !url.endsWith('/whatsapp.jpg')) return url;
+  const file = { thumb: 'thumb.webp', display: 'display.webp', whatsapp: 'whatsapp.jpg' }[variant];
+  return file ? url.slice(0, -'whatsapp.jpg'.length) + file : url;
 }
 
 // ============ Orders ============
 
-export function getOrders(businessId, status) {
-  let url = `/orders/${businessId}`;
-  if (status) url += `?status=${status}`;
-  return request(url);
+// Newest first; pass the returned next_cursor as cursor for the following page
+export function getOrders(businessId, status, { limit, cursor, from, to } = {}) {
+  const params = new URLSearchParams();
+  if (status) params.set('status', status);
+  if (limit) params.set('limit', limit);
+  if (cursor) params.set('cursor', cursor);
+  if (from) params.set('from', from);
+  if (to) params.set('to', to);
+  const query = params.toString();
+  return request(`/orders/${businessId}${query ? `?${query}` : ''}`);
+}
+
+// Download link for a streamed export (format: 'csv' or 'ndjson')
+export function ordersExportUrl(businessId, { format = 'csv', status, from, to } = {}) {
+  const params = new URLSearchParams({ format });
+  if (status) params.set('status', status);
+  if (from) params.set('from', from);
+  if (to) params.set('to', to);
+  return `${API_BASE}/orders/export/${businessId}?${params}`;
 }
 
 export function updateOrderStatus(orderId, status) {
@@ -138,6 +216,27 @@ export function getDashboardStats(businessId) {
   return request(`/orders/dashboard/${businessId}`);
 }
 
+// Live order events; EventSource reconnects by itself and resumes from the
+// last event it saw. 'reset' means events were missed: refetch the list.
+export function subscribeToOrders(businessId, handlers) {
+  const source = new EventSource(`${API_BASE}/orders/stream/${businessId}`);
+  for (const type of ['order.created', 'order.updated', 'reset']) {
+    source.addEventListener(type, event => handlers[type]?.(JSON.parse(event.data)));
+  }
+  return () => source.close();
+}
+
+// Defaults to the last 30 days bucketed by day
+export function getSalesAnalytics(businessId, { bucket, from, to, top } = {}) {
+  const params = new URLSearchParams();
+  if (bucket) params.set('bucket', bucket);
+  if (from) params.set('from', from);
+  if (to) params.set('to', to);
+  if (top) params.set('top', top);
+  const query = params.toString();
+  return request(`/orders/analytics/${businessId}${query ? `?${query}` : ''}`);
+}
+
 // ============ WhatsApp ============
 
 export function getWhatsAppStatus(businessId) {
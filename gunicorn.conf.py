@@ -0,0 +1,15 @@
+# Production server: gunicorn "main:create_app()"
+#
+# Threaded workers: the image, history-summary and context pools need real
+# threads (PIL work would stall a gevent loop) and the Gemini gRPC client
+# needs no event-loop integration. The long-lived /api/orders/stream
+# connections are served by a separate gevent server instead; see
+# gunicorn.stream.conf.py.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = 120
+keepalive = 75
@@ -0,0 +1,16 @@
+# Live order stream server: gunicorn -c gunicorn.stream.conf.py "main:create_stream_app()"
+#
+# gevent workers run each stream in a greenlet, so an open connection costs a
+# few KB instead of a thread. The app is only the stream (no Gemini, image
+# or queue work), so monkeypatching touches nothing CPU-bound. Route
+# /api/orders/stream/ here from the reverse proxy. Events arrive through the
+# webhook queue database, so this must run on the same host as the app.
+import os
+
+bind = f"0.0.0.0:{os.getenv('STREAM_PORT', '5001')}"
+worker_class = "gevent"
+workers = int(os.getenv("STREAM_CONCURRENCY", "1"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "5000"))
+# Restarts a worker whose event loop stops responding; open streams do not count against it
+timeout = 120
+keepalive = 75
@@ -9,6 +9,10 @@ from routes.business import business_bp
 from routes.inventory import inventory_bp
 from routes.whatsapp import whatsapp_bp
 from routes.orders import orders_bp
+from routes.order_stream import order_stream_bp
+from routes.metrics import metrics_bp
+from services import message_queue, whatsapp_sender
+from services.whatsapp_service import handle_queued_messages
 
 
 def create_app():
@@ -23,6 +27,13 @@ def create_app():
     app.register_blueprint(inventory_bp, url_prefix="/api/inventory")
     app.register_blueprint(whatsapp_bp, url_prefix="/api/whatsapp")
     app.register_blueprint(orders_bp, url_prefix="/api/orders")
+    app.register_blueprint(order_stream_bp, url_prefix="/api/orders")
+    app.register_blueprint(metrics_bp, url_prefix="/api/metrics")
+
+    # Background workers that drain the WhatsApp webhook queue
+    message_queue.start_workers(handle_queued_messages)
+    # Reply senders; also re-send replies a crashed process left in the outbox
+    whatsapp_sender.start_senders()
 
     @app.route("/", defaults={"path": ""})
     @app.route("/<path:path>")
@@ -34,6 +45,18 @@ def create_app():
     return app
 
 
+def create_stream_app():
+    """Just the live order stream, for the gevent server in gunicorn.stream.conf.py.
+
+    Starts no queue workers or pools, so nothing CPU-bound shares its event loop.
+    """
+    app = Flask(__name__)
+    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    app.register_blueprint(order_stream_bp, url_prefix="/api/orders")
+    app.register_blueprint(metrics_bp, url_prefix="/api/metrics")
+    return app
+
+
 if __name__ == "__main__":
     app = create_app()
     app.run(host="0.0.0.0", port=5000, debug=True)
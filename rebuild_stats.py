@@ -0,0 +1,19 @@
+import sys
+from supabase_client import get_supabase
+
+
+def rebuild(business_id: str = None):
+    """Recompute the dashboard rollups from the orders table.
+
+    Orders written outside place_order / set_order_status (seed scripts,
+    manual SQL) are not counted until this runs.
+    """
+    sb = get_supabase()
+    target = business_id or "all businesses"
+    print(f"Rebuilding dashboard stats for {target}...")
+    result = sb.rpc("rebuild_business_stats", {"p_business_id": business_id}).execute()
+    print(f"Rebuilt stats for {result.data} business(es).")
+
+
+if __name__ == "__main__":
+    rebuild(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -9,6 +9,7 @@ from services.business_service import (
     exchange_meta_code,
 )
 from services.inventory_service import get_products
+from services import gemini_models
 
 business_bp = Blueprint("business", __name__)
 
@@ -112,5 +113,6 @@ def launch(business_id):
         "bot_active": True,
     })
     if updated:
+        gemini_models.invalidate(business.get("system_prompt"))
         return jsonify({"success": True, "system_prompt": system_prompt})
     return jsonify({"error": "Failed to activate bot"}), 500
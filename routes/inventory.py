@@ -1,14 +1,19 @@
+import re
 from flask import Blueprint, request, jsonify
+from services import pagination, upload_service
+from services.product_import import import_products
 from services.inventory_service import (
+    DuplicateProductError,
     create_category,
     get_categories,
     delete_category,
     create_product,
     get_products,
+    get_products_page,
     get_product,
     update_product,
+    bulk_update_products,
     delete_product,
-    upload_image,
     search_products,
 )
 
@@ -48,7 +53,17 @@ def remove_category(category_id):
 @inventory_bp.route("/products/<business_id>", methods=["GET"])
 def list_products(business_id):
     category_id = request.args.get("category_id")
-    products = get_products(business_id, category_id)
+    fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()] or None
+
+    # Without limit/cursor the full list is returned, as before
+    try:
+        if "limit" in request.args or "cursor" in request.args:
+            limit = pagination.parse_limit(request.args.get("limit"))
+            page = get_products_page(business_id, category_id, fields, limit, request.args.get("cursor"))
+            return jsonify(page)
+        products = get_products(business_id, category_id, fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"products": products})
 
 
@@ -60,7 +75,10 @@ def add_product():
         if not data.get(field):
             return jsonify({"error": f"{field} is required"}), 400
 
-    product = create_product(data)
+    try:
+        product = create_product(data)
+    except DuplicateProductError as e:
+        return jsonify({"error": str(e)}), 409
     if product:
         return jsonify({"success": True, "product": product}), 201
     return jsonify({"error": "Failed to create product"}), 500
@@ -77,18 +95,61 @@ def get_one_product(product_id):
 @inventory_bp.route("/products/<product_id>", methods=["PUT"])
 def edit_product(product_id):
     data = request.get_json()
-    product = update_product(product_id, data)
+    try:
+        product = update_product(product_id, data)
+    except DuplicateProductError as e:
+        return jsonify({"error": str(e)}), 409
     if product:
         return jsonify({"success": True, "product": product})
     return jsonify({"error": "Product not found"}), 404
 
 
+@inventory_bp.route("/products/bulk-update", methods=["POST"])
+def bulk_edit_products():
+    """Patch many products in one request: {"business_id", "updates": [{"id", ...fields}]}."""
+    data = request.get_json() or {}
+    business_id = data.get("business_id")
+    updates = data.get("updates")
+    if not business_id or not isinstance(updates, list):
+        return jsonify({"error": "business_id and updates list required"}), 400
+
+    result = bulk_update_products(business_id, updates)
+    return jsonify({"success": not result["errors"] and not result["not_found"], **result})
+
+
 @inventory_bp.route("/products/<product_id>", methods=["DELETE"])
 def remove_product(product_id):
     delete_product(product_id)
     return jsonify({"success": True})
 
 
+@inventory_bp.route("/products/import", methods=["POST"])
+def bulk_import_products():
+    """Import a CSV/JSONL catalog, either as a multipart "file" or as the raw request body."""
+    business_id = request.form.get("business_id") or request.args.get("business_id")
+    if not business_id:
+        return jsonify({"error": "business_id required"}), 400
+
+    fmt = request.form.get("format") or request.args.get("format")
+    if "file" in request.files:
+        file = request.files["file"]
+        stream = file.stream
+        if not fmt and file.filename:
+            fmt = file.filename.rsplit(".", 1)[-1].lower()
+    else:
+        stream = request.stream
+        if not fmt and request.mimetype in ("application/x-ndjson", "application/jsonl"):
+            fmt = "jsonl"
+    fmt = {"ndjson": "jsonl", "json": "jsonl"}.get(fmt, fmt or "csv")
+
+    try:
+        batch_size = int(request.args.get("batch_size") or request.form.get("batch_size") or 0) or None
+        report = import_products(business_id, stream, fmt, batch_size)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": report["failed"] == 0, **report})
+
+
 # ---- Image Upload ----
 
 @inventory_bp.route("/upload-image", methods=["POST"])
@@ -104,9 +165,77 @@ def upload():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
 
-    file_data = file.read()
-    url = upload_image(business_id, file_data, file.filename, file.content_type)
-    return jsonify({"success": True, "url": url})
+    try:
+        image = upload_service.store_uploaded_file(business_id, file)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, **image})
+
+
+@inventory_bp.route("/uploads/sign", methods=["POST"])
+def sign_upload():
+    """Signed URL for uploading an image straight to storage."""
+    data = request.get_json() or {}
+    business_id = data.get("business_id")
+    if not business_id:
+        return jsonify({"error": "business_id required"}), 400
+    target = upload_service.create_signed_upload(business_id, data.get("filename") or "image.jpg")
+    return jsonify({"success": True, **target})
+
+
+@inventory_bp.route("/uploads/complete", methods=["POST"])
+def complete_upload():
+    """Called by the client after a signed upload finishes; returns the image URLs."""
+    data = request.get_json() or {}
+    business_id = data.get("business_id")
+    path = data.get("path")
+    if not business_id or not path:
+        return jsonify({"error": "business_id and path required"}), 400
+    try:
+        image = upload_service.complete_signed_upload(business_id, path)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, **image})
+
+
+@inventory_bp.route("/uploads/chunked", methods=["POST"])
+def start_chunked_upload():
+    """Open a resumable upload: {"business_id", "size"}."""
+    data = request.get_json() or {}
+    business_id = data.get("business_id")
+    if not business_id:
+        return jsonify({"error": "business_id required"}), 400
+    try:
+        upload = upload_service.start_chunked_upload(business_id, int(data.get("size") or 0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, **upload}), 201
+
+
+@inventory_bp.route("/uploads/chunked/<upload_id>", methods=["GET"])
+def chunked_upload_status(upload_id):
+    try:
+        return jsonify(upload_service.chunked_upload_status(upload_id))
+    except KeyError:
+        return jsonify({"error": "Upload not found"}), 404
+
+
+@inventory_bp.route("/uploads/chunked/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
+    """Send bytes start-end with "Content-Range: bytes start-end/total" as the raw body."""
+    match = re.match(r"bytes (\d+)-(\d+)/(\d+)$", request.headers.get("Content-Range", ""))
+    if not match:
+        return jsonify({"error": "Content-Range: bytes start-end/total required"}), 400
+    start, end = int(match.group(1)), int(match.group(2))
+    try:
+        result = upload_service.write_chunk(upload_id, start, request.stream, end - start + 1)
+    except KeyError:
+        return jsonify({"error": "Upload not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if result["conflict"]:
+        return jsonify(result), 409
+    return jsonify({"success": True, **result})
 
 
 # ---- Search ----
@@ -0,0 +1,12 @@
+from flask import Blueprint, jsonify
+from services import metrics, message_queue
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("", methods=["GET"])
+def get_metrics():
+    """Counters, gauges and latency percentiles for this worker process."""
+    snapshot = metrics.snapshot()
+    snapshot["queue"] = message_queue.stats()
+    return jsonify(snapshot)
@@ -0,0 +1,37 @@
+import json
+from flask import Blueprint, Response, request
+from services import order_events
+
+# Served by the gevent stream server (gunicorn.stream.conf.py) in production,
+# where each open stream is a greenlet; the app workers keep plain threads
+order_stream_bp = Blueprint("order_stream", __name__)
+
+
+@order_stream_bp.route("/stream/<business_id>", methods=["GET"])
+def stream(business_id):
+    """Server-Sent Events for new orders and status changes.
+
+    Browsers resume with the Last-Event-ID header after a reconnect;
+    ?last_event_id= does the same for a fresh EventSource.
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    events = order_events.subscribe(business_id, last_event_id)
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            for event in events:
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                event_id, event_type, data = event
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+        finally:
+            # Client went away: unregister now rather than when garbage collected
+            events.close()
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,21 +1,113 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, Response, request, jsonify
+from services import pagination
 from services.order_service import (
-    get_orders,
+    get_orders_page,
+    iter_orders,
     get_order,
     update_order_status,
     get_dashboard_stats,
+    get_sales_analytics,
 )
 
 orders_bp = Blueprint("orders", __name__)
 
+EXPORT_COLUMNS = [
+    "id", "created_at", "status", "customer_name", "customer_phone",
+    "customer_address", "items", "total", "notes",
+]
+# Phone numbers and amounts like "+9198..." are left as they are
+_NUMERIC_TEXT = re.compile(r"^[+-]?[\d\s().-]+$")
+
+
+def _parse_time(value: str, end_of_day: bool = False) -> datetime:
+    """ISO date or datetime; a bare date used as an end bound includes that whole day."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _range_args() -> tuple:
+    """Optional (from, to) query args as datetimes; raises ValueError if malformed."""
+    try:
+        start = _parse_time(request.args["from"]) if request.args.get("from") else None
+        end = _parse_time(request.args["to"], end_of_day=True) if request.args.get("to") else None
+    except ValueError:
+        raise ValueError("'from' and 'to' must be ISO dates or datetimes")
+    return start, end
+
 
 @orders_bp.route("/<business_id>", methods=["GET"])
 def list_orders(business_id):
-    """List orders for a business."""
-    status_filter = request.args.get("status")
-    limit = request.args.get("limit", 50, type=int)
-    orders = get_orders(business_id, status=status_filter, limit=limit)
-    return jsonify({"orders": orders})
+    """List orders for a business, newest first: ?status=&from=&to=&limit=&cursor="""
+    try:
+        start, end = _range_args()
+        limit = pagination.parse_limit(request.args.get("limit"))
+        page = get_orders_page(
+            business_id,
+            status=request.args.get("status"),
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=request.args.get("cursor"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+
+def _csv_cell(value) -> str:
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    text = "" if value is None else str(value)
+    # Customer-typed text must not run as a formula in a spreadsheet
+    if text[:1] in ("=", "@", "\t", "\r") or (text[:1] in ("+", "-") and not _NUMERIC_TEXT.match(text)):
+        return "'" + text
+    return text
+
+
+@orders_bp.route("/export/<business_id>", methods=["GET"])
+def export_orders(business_id):
+    """Stream every matching order as CSV or NDJSON: ?format=csv|ndjson&status=&from=&to="""
+    export_format = request.args.get("format", "csv")
+    if export_format not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        start, end = _range_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    orders = iter_orders(business_id, status=request.args.get("status"), start=start, end=end)
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for i, order in enumerate(orders, 1):
+            writer.writerow([_csv_cell(order.get(column)) for column in EXPORT_COLUMNS])
+            # Flush in chunks rather than per row
+            if i % 100 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_ndjson():
+        for order in orders:
+            yield json.dumps(order, ensure_ascii=False, default=str) + "\n"
+
+    filename = f"orders-{business_id}.{export_format}"
+    return Response(
+        generate_csv() if export_format == "csv" else generate_ndjson(),
+        mimetype="text/csv" if export_format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
 
 
 @orders_bp.route("/detail/<order_id>", methods=["GET"])
@@ -47,3 +139,25 @@ def dashboard(business_id):
     """Get dashboard analytics."""
     stats = get_dashboard_stats(business_id)
     return jsonify(stats)
+
+
+@orders_bp.route("/analytics/<business_id>", methods=["GET"])
+def analytics(business_id):
+    """Sales time series: ?bucket=day|week|month&from=...&to=...&top=N (default: last 30 days)."""
+    try:
+        end = _parse_time(request.args["to"], end_of_day=True) if request.args.get("to") else datetime.now(timezone.utc)
+        start = _parse_time(request.args["from"]) if request.args.get("from") else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({"error": "'from' and 'to' must be ISO dates or datetimes"}), 400
+
+    try:
+        stats = get_sales_analytics(
+            business_id,
+            start,
+            end,
+            bucket=request.args.get("bucket", "day"),
+            top=request.args.get("top", 5, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(stats)
@@ -1,10 +1,7 @@
 from flask import Blueprint, request, jsonify
 from config import Config
-from services.whatsapp_service import (
-    process_incoming_message,
-    get_business_for_whatsapp,
-    send_whatsapp_message,
-)
+from services import message_queue, message_dedup
+from services.whatsapp_service import process_incoming_message
 
 whatsapp_bp = Blueprint("whatsapp", __name__)
 
@@ -52,26 +49,25 @@ def webhook():
                 if not message_text or not from_number:
                     continue
 
-                business = get_business_for_whatsapp(phone_number_id)
-                if not business:
-                    print(f"[Webhook] No business found for phone_number_id: {phone_number_id}")
+                # Meta delivers at-least-once; drop retries of a wamid we already queued
+                if message_dedup.is_duplicate(message.get("id", "")):
                     continue
 
-                reply, _ = process_incoming_message(
-                    business_id=business["id"],
-                    customer_phone=from_number,
-                    message_text=message_text,
-                )
-
+                # Reply generation happens on the queue workers so Meta gets
+                # its 200 before the LLM round trip starts. Keying by
+                # (business number, customer) serializes each conversation and
+                # lets quick bursts of messages be answered as one turn.
                 try:
-                    send_whatsapp_message(
-                        to=from_number,
-                        body=reply,
-                        phone_number_id=phone_number_id,
-                        access_token=business.get("meta_access_token", ""),
-                    )
-                except Exception as e:
-                    print(f"[Meta API Error] Failed to send message: {e}")
+                    message_queue.enqueue({
+                        "phone_number_id": phone_number_id,
+                        "from": from_number,
+                        "text": message_text,
+                        "message_id": message.get("id", ""),
+                    }, conversation_key=f"{phone_number_id}:{from_number}")
+                except Exception:
+                    # Not queued: let the redelivery through, and fail so Meta retries
+                    message_dedup.forget(message.get("id", ""))
+                    raise
 
     return jsonify({"status": "ok"}), 200
 
@@ -38,6 +38,8 @@ def seed_fake_stats():
     
     sb.table("orders").insert(orders).execute()
     print(f"Inserted {len(orders)} dummy orders.")
+    # Direct inserts bypass place_order, so recount the dashboard rollups
+    sb.rpc("rebuild_business_stats", {"p_business_id": bid}).execute()
 
     # 2. Create Dummy Conversations (Interactions)
     convos = []
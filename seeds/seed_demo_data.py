@@ -139,10 +139,8 @@ def seed():
         }
     ]
     
+    rows = []
     for p in products:
-        # Check if product exists
-        res = supabase.table("products").select("*").eq("business_id", business_id).eq("name", p["name"]).execute()
-        
         # Upload Image
         image_url = None
         if os.path.exists(p["image_file"]):
@@ -150,8 +148,7 @@ def seed():
         else:
             print(f"Warning: Image file not found: {p['image_file']}")
             
-        # Upsert Product
-        prod_data = {
+        rows.append({
             "business_id": business_id,
             "category_id": p["category_id"],
             "name": p["name"],
@@ -159,14 +156,11 @@ def seed():
             "price": p["price"],
             "image_urls": [image_url] if image_url else [],
             "in_stock": True
-        }
-        
-        if res.data:
-             print(f"Updating product: {p['name']}")
-             supabase.table("products").update(prod_data).eq("id", res.data[0]["id"]).execute()
-        else:
-             print(f"Inserting product: {p['name']}")
-             supabase.table("products").insert(prod_data).execute()
+        })
+
+    # One upsert on the (business_id, name) unique index instead of a select + write per product
+    print(f"Upserting {len(rows)} products...")
+    supabase.table("products").upsert(rows, on_conflict="business_id,name").execute()
 
     print("\n--- Seeding Complete ---")
     print(f"Demo User: {DEMO_EMAIL}")
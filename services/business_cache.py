@@ -0,0 +1,77 @@
+from config import Config
+from supabase_client import get_supabase
+from services import metrics
+from services.cache import TTLCache
+
+# Per-process cache; other worker processes pick up changes when the TTL expires
+_by_id = TTLCache(maxsize=Config.BUSINESS_CACHE_MAX, ttl=Config.BUSINESS_CACHE_TTL)
+# phone_number_id -> business id, or None for numbers with no business
+_phone_to_id = TTLCache(maxsize=Config.BUSINESS_CACHE_MAX, ttl=Config.BUSINESS_CACHE_TTL)
+
+
+def _store(business: dict):
+    _by_id.set(business["id"], business)
+    if business.get("whatsapp_phone_number_id"):
+        _phone_to_id.set(business["whatsapp_phone_number_id"], business["id"])
+
+
+def get_business_by_id(business_id: str) -> dict:
+    """Get a business row by id, served from the cache when fresh."""
+    business = _by_id.get(business_id)
+    if business is not None:
+        metrics.incr("business_cache.hit")
+        return business
+
+    metrics.incr("business_cache.miss")
+    sb = get_supabase()
+    result = sb.table("businesses").select("*").eq("id", business_id).execute()
+    business = result.data[0] if result.data else None
+    if business:
+        _store(business)
+    return business
+
+
+def get_business_by_phone_number_id(phone_number_id: str) -> dict:
+    """Get the business owning a Meta phone_number_id, caching misses too."""
+    if not phone_number_id:
+        return None
+
+    if phone_number_id in _phone_to_id:
+        business_id = _phone_to_id.get(phone_number_id)
+        if business_id is None:
+            metrics.incr("business_cache.negative_hit")
+            return None
+        business = _by_id.get(business_id)
+        # The number may have been moved to another business since it was cached
+        if business is not None and business.get("whatsapp_phone_number_id") == phone_number_id:
+            metrics.incr("business_cache.hit")
+            return business
+
+    metrics.incr("business_cache.miss")
+    sb = get_supabase()
+    result = (
+        sb.table("businesses")
+        .select("*")
+        .eq("whatsapp_phone_number_id", phone_number_id)
+        .execute()
+    )
+    if not result.data:
+        _phone_to_id.set(phone_number_id, None, ttl=Config.BUSINESS_CACHE_NEGATIVE_TTL)
+        return None
+
+    business = result.data[0]
+    _store(business)
+    return business
+
+
+def invalidate(business_id: str, updated: dict = None):
+    """Drop a business from the cache, or replace it with a freshly written row."""
+    previous = _by_id.pop(business_id)
+    if previous and previous.get("whatsapp_phone_number_id"):
+        _phone_to_id.pop(previous["whatsapp_phone_number_id"])
+
+    if updated:
+        # Clears any negative entry for a newly connected number as well
+        if updated.get("whatsapp_phone_number_id"):
+            _phone_to_id.pop(updated["whatsapp_phone_number_id"])
+        _store(updated)
@@ -1,11 +1,11 @@
 import json
 import re
 import requests
-import google.generativeai as genai
 from config import Config
 from supabase_client import get_supabase
-
-genai.configure(api_key=Config.GEMINI_API_KEY)
+from services import business_cache
+from services.gemini_models import get_model
+from services.inventory_service import summarize_categories
 
 ONBOARDING_SYSTEM_PROMPT = """You are a friendly business setup assistant for Storeo — an Indian SME WhatsApp Bot Builder platform.
 Your job is to help small business owners set up their business profile through a natural conversation.
@@ -40,10 +40,7 @@ IMPORTANT RULES:
 
 def chat_with_ai(messages: list) -> dict:
     """Process a chat message for business onboarding using Gemini."""
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        system_instruction=ONBOARDING_SYSTEM_PROMPT,
-    )
+    model = get_model(ONBOARDING_SYSTEM_PROMPT)
 
     # Build history for Gemini (all messages except the last user message)
     history = []
@@ -87,24 +84,13 @@ def chat_with_ai(messages: list) -> dict:
 
 
 def generate_system_prompt(business: dict, products: list) -> str:
-    """Use Gemini to generate a rich, personalised WhatsApp bot system prompt."""
-    catalog_lines = []
-    for p in products[:80]:
-        cat = ""
-        if p.get("categories"):
-            cat = f" [{p['categories'].get('name', '')}]"
-        price = f"₹{p['price']}" if p.get("price") else "Price on request"
-        qty = p.get("stock_quantity", 0)
-        stock = f"qty:{qty}" if qty else ("in stock" if p.get("in_stock", True) else "out of stock")
-        line = f"- {p['name']}{cat} | {price} | {stock}"
-        if p.get("description"):
-            line += f" | {p['description']}"
-        img = p.get("image_urls", [])
-        if img:
-            line += f" | image:{img[0]}"
-        catalog_lines.append(line)
-
-    catalog_text = "\n".join(catalog_lines) if catalog_lines else "No products yet."
+    """Use Gemini to generate a rich, personalised WhatsApp bot system prompt.
+
+    The prompt carries a per-category overview rather than the product list, so
+    its size does not grow with the catalog; relevant products are attached to
+    each customer message at reply time.
+    """
+    catalog_text = summarize_categories(products)
     languages = ", ".join(business.get("languages", ["English", "Hindi", "Hinglish"]))
 
     meta_prompt = f"""You are building a WhatsApp bot for a real Indian business. Write a complete system prompt for an AI assistant that will act as this shop's WhatsApp customer service agent.
@@ -117,12 +103,12 @@ BUSINESS DETAILS:
 - Languages supported: {languages}
 - Bot tone: {business.get('bot_tone', 'friendly')}
 
-PRODUCT CATALOG:
+CATALOG OVERVIEW ({len(products)} products):
 {catalog_text}
 
 Write a system prompt that:
 1. Establishes the bot's identity as the shop's WhatsApp assistant
-2. Lists all products with prices clearly so the bot can answer queries accurately
+2. Includes the catalog overview above, and explains that every customer message is followed by a "CATALOG MATCHES" block with the most relevant products, prices and stock — the bot must quote products and prices only from those blocks
 3. Defines the order flow: collect product name, quantity, customer name, and delivery address before confirming
 4. When ready to place an order, output exactly this JSON block (and nothing else in that message):
    ```json
@@ -130,13 +116,13 @@ Write a system prompt that:
    ```
 5. Instructs the bot to detect the customer's language (English / Hindi Devanagari / Hinglish Roman script) and always reply in the same language/script
 6. Keeps replies short and conversational (under 200 words), uses emojis naturally
-7. Never invents products not in the catalog
+7. Never invents products not in the catalog matches
 8. Handles out-of-stock queries graciously, suggests alternatives
 
 Output only the system prompt text. No preamble.
 """
 
-    model = genai.GenerativeModel("gemini-2.0-flash")
+    model = get_model()
     response = model.generate_content(meta_prompt)
     return response.text
 
@@ -242,4 +228,6 @@ def update_business(business_id: str, data: dict) -> dict:
     """Update a business profile."""
     sb = get_supabase()
     result = sb.table("businesses").update(data).eq("id", str(business_id)).execute()
-    return result.data[0] if result.data else None
+    updated = result.data[0] if result.data else None
+    business_cache.invalidate(str(business_id), updated)
+    return updated
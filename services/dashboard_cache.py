@@ -0,0 +1,84 @@
+import threading
+from config import Config
+from services import metrics
+from services.cache import TTLCache
+
+# Per-process cache; order writes in this process invalidate it, the TTL
+# bounds how long writes from other worker processes (and product or
+# conversation counts) take to show up
+_stats = TTLCache(maxsize=Config.DASHBOARD_CACHE_MAX, ttl=Config.DASHBOARD_CACHE_TTL)
+
+_lock = threading.Lock()
+# business_id -> computation in progress, shared by concurrent misses
+_in_flight = {}
+# business_id -> invalidation count, so a result computed before an
+# invalidation is not cached after it
+_versions = {}
+_lookups = {"hit": 0, "total": 0}
+
+
+class _Flight:
+    def __init__(self, version: int):
+        self.version = version
+        self.done = threading.Event()
+        self.stats = None
+        self.error = None
+
+
+def _record(hit: bool):
+    with _lock:
+        _lookups["total"] += 1
+        _lookups["hit"] += hit
+        ratio = _lookups["hit"] / _lookups["total"]
+    metrics.incr("dashboard.cache_hit" if hit else "dashboard.cache_miss")
+    metrics.set_gauge("dashboard.cache_hit_ratio", round(ratio, 3))
+
+
+def get_stats(business_id: str, compute) -> dict:
+    """The business's dashboard stats, from the cache or from compute(business_id).
+
+    Concurrent misses for one business wait for a single compute call and
+    share its result (or its exception).
+    """
+    stats = _stats.get(business_id)
+    if stats is not None:
+        _record(True)
+        return stats
+
+    with _lock:
+        flight = _in_flight.get(business_id)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[business_id] = _Flight(_versions.get(business_id, 0))
+
+    if not leader:
+        _record(True)
+        metrics.incr("dashboard.cache_coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.stats
+
+    _record(False)
+    try:
+        flight.stats = compute(business_id)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            if _in_flight.get(business_id) is flight:
+                del _in_flight[business_id]
+            if flight.error is None and _versions.get(business_id, 0) == flight.version:
+                _stats.set(business_id, flight.stats)
+        flight.done.set()
+    return flight.stats
+
+
+def invalidate(business_id: str):
+    """Drop a business's cached stats after one of its orders changed."""
+    with _lock:
+        _versions[business_id] = _versions.get(business_id, 0) + 1
+        # Later callers start a fresh computation instead of joining a stale one
+        _in_flight.pop(business_id, None)
+        _stats.pop(business_id)
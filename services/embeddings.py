@@ -0,0 +1,129 @@
+import hashlib
+import numpy as np
+from config import Config
+from services import metrics
+from services.cache import TTLCache
+from services.language_service import char_trigrams, normalize_search_text, search_synonyms
+
+# Embeddings are pure functions of (provider, text); keep them across index rebuilds
+_cache = TTLCache(maxsize=Config.EMBEDDING_CACHE_MAX, ttl=86400)
+_embedder = None
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder: feature-hashed words, synonyms and trigrams.
+
+    Words go through language_service.normalize_search_text, so Devanagari,
+    Hinglish and English spellings of a product land on the same features,
+    and character trigrams give partial credit for typos and inflections.
+    """
+
+    name = "hashing"
+
+    # Relative weight of whole-word, synonym and trigram features
+    WORD_WEIGHT = 1.0
+    SYNONYM_WEIGHT = 0.8
+    TRIGRAM_WEIGHT = 0.3
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._word_cache = TTLCache(maxsize=100000, ttl=86400)
+
+    def _slot(self, feature: str) -> tuple:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def _word_features(self, word: str) -> tuple:
+        """(slots, signed weights) contributed by one normalized word, memoized."""
+        features = self._word_cache.get(word)
+        if features is None:
+            slots, weights = [], []
+            for variant in search_synonyms(word):
+                slot, sign = self._slot(f"w:{variant}")
+                slots.append(slot)
+                weights.append(sign * (self.WORD_WEIGHT if variant == word else self.SYNONYM_WEIGHT))
+            for gram in char_trigrams(word):
+                slot, sign = self._slot(f"g:{gram}")
+                slots.append(slot)
+                weights.append(sign * self.TRIGRAM_WEIGHT)
+            features = (np.array(slots, dtype=np.intp), np.array(weights, dtype=np.float32))
+            self._word_cache.set(word, features)
+        return features
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in normalize_search_text(text):
+            slots, weights = self._word_features(word)
+            np.add.at(vector, slots, weights)
+        return vector
+
+    def embed(self, texts: list, task: str = "document") -> np.ndarray:
+        return _normalize_rows(np.stack([self._embed_one(t) for t in texts]))
+
+
+class GeminiEmbedder:
+    """Gemini text embeddings (needs GEMINI_API_KEY and network access)."""
+
+    name = "gemini"
+    BATCH_SIZE = 100
+
+    def __init__(self, model: str, dim: int = None):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts: list, task: str = "document") -> np.ndarray:
+        from services.gemini_models import genai
+
+        task_type = "retrieval_query" if task == "query" else "retrieval_document"
+        rows = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            result = genai.embed_content(
+                model=self.model,
+                content=texts[start:start + self.BATCH_SIZE],
+                task_type=task_type,
+                output_dimensionality=self.dim,
+            )
+            rows.extend(result["embedding"])
+        return _normalize_rows(np.asarray(rows, dtype=np.float32))
+
+
+def get_embedder():
+    """The embedding provider selected by EMBEDDING_PROVIDER ("hashing" or "gemini")."""
+    global _embedder
+    if _embedder is None:
+        if Config.EMBEDDING_PROVIDER == "gemini":
+            _embedder = GeminiEmbedder(Config.GEMINI_EMBEDDING_MODEL, Config.EMBEDDING_DIM)
+        else:
+            _embedder = HashingEmbedder(Config.EMBEDDING_DIM)
+    return _embedder
+
+
+def embed_documents(texts: list) -> np.ndarray:
+    """Unit-length float32 rows for texts, computing only the ones not seen before."""
+    embedder = get_embedder()
+    keys = [(embedder.name, hashlib.sha1(t.encode("utf-8")).hexdigest()) for t in texts]
+    vectors = [_cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    metrics.incr("embeddings.cached", len(texts) - len(missing))
+    if missing:
+        with metrics.timer("embeddings.compute"):
+            computed = embedder.embed([texts[i] for i in missing])
+        metrics.incr("embeddings.computed", len(missing))
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+            _cache.set(keys[i], vector)
+    if not vectors:
+        return np.zeros((0, Config.EMBEDDING_DIM), dtype=np.float32)
+    return np.stack(vectors)
+
+
+def embed_query(text: str) -> np.ndarray:
+    """Unit-length float32 vector for a customer query."""
+    return get_embedder().embed([text], task="query")[0]
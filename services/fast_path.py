@@ -0,0 +1,141 @@
+import re
+from services import metrics
+from services.cache import TTLCache
+from services.inventory_service import search_products
+from services.language_service import get_fast_path_reply, normalize_search_text, search_synonyms
+
+# Intent phrases, with the language they imply when detect_language says English
+PRICE_PHRASES = {
+    "English": ["how much", "price", "cost", "rate"],
+    "Hinglish": ["kitna", "kitne", "kitni", "kitne ka", "kitne ki", "daam", "kimat", "keemat", "rate kya"],
+    "Hindi": ["कितना", "कितने", "कितनी", "कीमत", "दाम", "रेट"],
+}
+AVAILABILITY_PHRASES = {
+    "English": ["available", "in stock", "do you have", "do you sell", "you have"],
+    "Hinglish": ["milega", "milegi", "milenge", "hai kya", "mil jayega", "stock mein"],
+    "Hindi": ["मिलेगा", "मिलेगी", "मिलेंगे", "उपलब्ध", "है क्या"],
+}
+
+# Greetings, orders, complaints... anything with these words needs the LLM
+LLM_ONLY_WORDS = {"order", "buy", "deliver", "delivery", "address", "cancel", "chahiye", "bhejo", "lena", "ऑर्डर", "चाहिए"}
+
+_TOKEN_RE = re.compile(r"[^\s?!.,;:()\"'।|/+-]+")
+
+# Normalized name tokens by product name; products themselves are read from
+# the search index on every lookup so prices and stock are never stale
+_name_tokens = TTLCache(maxsize=100000, ttl=3600)
+
+
+def _tokens(text: str) -> list:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("es"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def _match_phrase(text: str, tokens: list, phrases: dict):
+    padded = f" {' '.join(tokens)} "
+    for language, options in phrases.items():
+        for phrase in options:
+            if f" {phrase} " in padded:
+                return language
+    return None
+
+
+def detect_intent(text: str) -> tuple:
+    """Return (intent, language_hint, product_terms) for a price/availability question, else None."""
+    tokens = _tokens(text)
+    if not tokens or len(tokens) > 12 or LLM_ONLY_WORDS.intersection(tokens):
+        return None
+
+    language = _match_phrase(text, tokens, PRICE_PHRASES)
+    intent = "price"
+    if language is None:
+        language = _match_phrase(text, tokens, AVAILABILITY_PHRASES)
+        intent = "available"
+    if language is None:
+        return None
+
+    terms = [_stem(t) for t in normalize_search_text(text)]
+    if not terms:
+        return None
+    return intent, language, terms
+
+
+def _tokens_for_name(name: str) -> set:
+    tokens = _name_tokens.get(name)
+    if tokens is None:
+        tokens = {_stem(t) for t in normalize_search_text(name)}
+        _name_tokens.set(name, tokens)
+    return tokens
+
+
+def _catalog_index(business_id: str) -> list:
+    return [
+        (product, _tokens_for_name(product.get("name") or ""))
+        for product in search_products(business_id, "")
+    ]
+
+
+def find_product(business_id: str, terms: list) -> dict:
+    """The single product whose name contains every term, or None if zero or several do.
+
+    Terms and names are compared in normalized form, so a term also matches
+    its transliterations and synonyms (थाली, thaali, plate).
+    """
+    variants = [search_synonyms(term) | {_stem(v) for v in search_synonyms(term)} for term in terms]
+    matches = []
+    for product, name_tokens in _catalog_index(business_id):
+        if all(options & name_tokens for options in variants):
+            matches.append(product)
+            if len(matches) > 1:
+                return None
+    return matches[0] if matches else None
+
+
+def _format_price(price) -> str:
+    price = float(price)
+    return f"{price:,.0f}" if price.is_integer() else f"{price:,.2f}"
+
+
+def _stock_note(language: str, product: dict) -> str:
+    qty = product.get("stock_quantity") or 0
+    if qty:
+        return get_fast_path_reply(language, "qty_note", qty=qty)
+    return get_fast_path_reply(language, "in_stock_note")
+
+
+def try_fast_reply(business_id: str, message_text: str, language: str) -> str:
+    """Answer simple price/availability questions from the catalog, or return None."""
+    with metrics.timer("fast_path.match"):
+        match = detect_intent(message_text)
+        if match is None:
+            metrics.incr("fast_path.miss")
+            return None
+
+        intent, language_hint, terms = match
+        if language == "English" and language_hint != "English":
+            language = language_hint
+        if get_fast_path_reply(language, "in_stock_note") is None:
+            metrics.incr("fast_path.miss")
+            return None
+
+        product = find_product(business_id, terms)
+        if product is None:
+            metrics.incr("fast_path.miss")
+            return None
+
+    metrics.incr("fast_path.hit")
+    name = product["name"]
+    if not product.get("in_stock", True):
+        return get_fast_path_reply(language, "out_of_stock", name=name)
+
+    stock_note = _stock_note(language, product)
+    if not product.get("price"):
+        return get_fast_path_reply(language, "no_price", name=name, stock_note=stock_note)
+    return get_fast_path_reply(language, intent, name=name, price=_format_price(product["price"]), stock_note=stock_note)
@@ -0,0 +1,86 @@
+import hashlib
+import datetime
+import google.generativeai as genai
+from config import Config
+from services import metrics
+from services.cache import TTLCache
+
+genai.configure(api_key=Config.GEMINI_API_KEY)
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+# Local handles expire before the server-side context cache they may point at
+_models = TTLCache(maxsize=Config.GEMINI_MODEL_CACHE_MAX, ttl=Config.GEMINI_MODEL_CACHE_TTL)
+_cached_contents = {}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate: ~4 chars/token for Latin text, ~2 for Indic scripts."""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_count = len(text) - non_ascii
+    return ascii_count // 4 + non_ascii // 2 + 1
+
+
+def _prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()
+
+
+def _create_cached_model(system_prompt: str):
+    """Upload a large system prompt once as explicit context cache and bind a model to it."""
+    from google.generativeai import caching
+
+    cached = caching.CachedContent.create(
+        model=Config.GEMINI_CACHE_MODEL,
+        system_instruction=system_prompt,
+        ttl=datetime.timedelta(seconds=Config.GEMINI_MODEL_CACHE_TTL + 600),
+    )
+    return cached, genai.GenerativeModel.from_cached_content(cached_content=cached)
+
+
+def get_model(system_prompt: str = None, model_name: str = DEFAULT_MODEL):
+    """Return a configured GenerativeModel, reusing one per (model, system prompt)."""
+    key = (model_name, _prompt_hash(system_prompt))
+    model = _models.get(key)
+    if model is not None:
+        metrics.incr("gemini_models.hit")
+        return model
+
+    metrics.incr("gemini_models.miss")
+    if (
+        system_prompt
+        and Config.GEMINI_CONTEXT_CACHE
+        and estimate_tokens(system_prompt) >= Config.GEMINI_CONTEXT_CACHE_MIN_TOKENS
+    ):
+        try:
+            cached, model = _create_cached_model(system_prompt)
+            _cached_contents[key] = cached
+            metrics.incr("gemini_models.context_cached")
+        except Exception as e:
+            # Prompt too small for the model's minimum, unsupported model, quota...
+            print(f"[Gemini] Context caching unavailable, sending prompt inline: {e}")
+            model = None
+
+    if model is None:
+        if system_prompt:
+            model = genai.GenerativeModel(model_name=model_name, system_instruction=system_prompt)
+        else:
+            model = genai.GenerativeModel(model_name=model_name)
+
+    _models.set(key, model)
+    return model
+
+
+def invalidate(system_prompt: str, model_name: str = DEFAULT_MODEL):
+    """Forget the handle (and server-side cache) for a prompt that was replaced."""
+    if not system_prompt:
+        return
+    key = (model_name, _prompt_hash(system_prompt))
+    _models.pop(key)
+    cached = _cached_contents.pop(key, None)
+    if cached is not None:
+        try:
+            cached.delete()
+        except Exception as e:
+            print(f"[Gemini] Failed to delete cached content: {e}")
@@ -0,0 +1,114 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from supabase_client import get_supabase
+from services import metrics
+from services.gemini_models import get_model, estimate_tokens
+
+SUMMARY_PROMPT = """You maintain a running summary of a WhatsApp chat between a shop's assistant and a customer.
+Merge the previous summary with the new messages into ONE updated summary.
+
+Keep: customer name, delivery address, products asked about, quantities, prices quoted, orders placed or pending, and any open questions.
+Drop: greetings, small talk and anything already resolved that does not affect future replies.
+Write at most 120 words in English, as plain notes. No preamble.
+
+PREVIOUS SUMMARY:
+{summary}
+
+NEW MESSAGES:
+{messages}
+"""
+
+# Summaries are refreshed off the reply path
+_summary_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def build_history(messages: list, summary: str = None, budget: int = None) -> tuple:
+    """Build Gemini history from the newest messages that fit in the token budget.
+
+    Returns (history, oldest_kept_index). Messages before oldest_kept_index did
+    not fit and are expected to be covered by the rolling summary.
+    """
+    budget = Config.HISTORY_TOKEN_BUDGET if budget is None else budget
+    summary_tokens = estimate_tokens(summary) if summary else 0
+    remaining = budget - summary_tokens
+
+    oldest_kept = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        cost = estimate_tokens(messages[i]["content"])
+        # Always keep the latest message so the model has some context
+        if cost > remaining and oldest_kept < len(messages):
+            break
+        remaining -= cost
+        oldest_kept = i
+
+    history = []
+    if summary:
+        history.append({"role": "user", "parts": [f"(Summary of our earlier conversation: {summary})"]})
+        history.append({"role": "model", "parts": ["Noted, I'll keep that in mind."]})
+
+    for msg in messages[oldest_kept:]:
+        role = "user" if msg["role"] == "user" else "model"
+        history.append({"role": role, "parts": [msg["content"]]})
+
+    return history, oldest_kept
+
+
+def history_tokens(history: list) -> int:
+    return sum(estimate_tokens(part) for turn in history for part in turn["parts"])
+
+
+def schedule_summary_refresh(convo: dict, oldest_kept_id):
+    """Fold messages that fell out of the budget into the stored summary, in the background."""
+    if oldest_kept_id is None:
+        return
+    summarized_through = convo.get("summary_message_id") or 0
+    if summarized_through >= oldest_kept_id:
+        return
+
+    convo_id = convo["id"]
+    with _in_flight_lock:
+        if convo_id in _in_flight:
+            return
+        _in_flight.add(convo_id)
+
+    _summary_pool.submit(_refresh_summary, convo_id, convo.get("summary") or "", summarized_through, oldest_kept_id)
+
+
+def _refresh_summary(convo_id: str, summary: str, summarized_through: int, before_id: int):
+    try:
+        sb = get_supabase()
+        rows = (
+            sb.table("conversation_messages")
+            .select("id, role, content")
+            .eq("conversation_id", convo_id)
+            .gt("id", summarized_through)
+            .lt("id", before_id)
+            .order("id")
+            .limit(200)
+            .execute()
+        ).data or []
+        if not rows:
+            return
+
+        transcript = "\n".join(
+            f"{'Customer' if r['role'] == 'user' else 'Shop'}: {r['content']}" for r in rows
+        )
+        model = get_model()
+        with metrics.timer("history.summarize"):
+            response = model.generate_content(
+                SUMMARY_PROMPT.format(summary=summary or "(none)", messages=transcript)
+            )
+
+        sb.table("conversations").update({
+            "summary": response.text.strip(),
+            "summary_message_id": rows[-1]["id"],
+        }).eq("id", convo_id).execute()
+        metrics.incr("history.summaries")
+    except Exception as e:
+        print(f"[History] Summary refresh failed for {convo_id}: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(convo_id)
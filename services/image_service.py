@@ -0,0 +1,166 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from PIL import Image, ImageOps
+from config import Config
+from supabase_client import get_supabase
+from services import metrics
+
+BUCKET = "product-images"
+
+# name -> (longest side in px, format, quality, file name)
+VARIANTS = {
+    "thumb": (256, "WEBP", 75, "thumb.webp"),
+    "display": (1024, "WEBP", 80, "display.webp"),
+    # WhatsApp media must be JPEG/PNG and at most 5 MB
+    "whatsapp": (1600, "JPEG", 85, "whatsapp.jpg"),
+}
+CONTENT_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg"}
+WHATSAPP_MAX_BYTES = 5 * 1024 * 1024
+# The stored product image URL; the other variants sit next to it
+PRIMARY_VARIANT = "whatsapp"
+
+_executor = ThreadPoolExecutor(max_workers=Config.IMAGE_WORKERS, thread_name_prefix="image")
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def content_key(business_id: str, source) -> str:
+    """Storage folder for an image (bytes or file path): identical content maps to the same folder."""
+    digest = hashlib.sha256()
+    if isinstance(source, bytes):
+        digest.update(source)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return f"{business_id}/{digest.hexdigest()[:32]}"
+
+
+def _open(source):
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def variant_path(key: str, variant: str) -> str:
+    return f"{key}/{VARIANTS[variant][3]}"
+
+
+def render_variants(source) -> dict:
+    """Resize an image (bytes or file path) into every variant. Returns {variant: encoded bytes}."""
+    with _open(source) as original:
+        # Decode at a reduced size when the format allows it (JPEG draft mode)
+        original.draft("RGB", (VARIANTS["whatsapp"][0], VARIANTS["whatsapp"][0]))
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    rendered = {}
+    for name, (size, fmt, quality, _) in VARIANTS.items():
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        if fmt == "JPEG" or not has_alpha:
+            if has_alpha:
+                # JPEG has no alpha channel: flatten onto white like WhatsApp would show it
+                background = Image.new("RGB", variant.size, (255, 255, 255))
+                background.paste(variant, mask=variant.convert("RGBA").getchannel("A"))
+                variant = background
+            else:
+                variant = variant.convert("RGB")
+        else:
+            variant = variant.convert("RGBA")
+
+        out = io.BytesIO()
+        variant.save(out, fmt, quality=quality, optimize=fmt == "JPEG", progressive=fmt == "JPEG")
+        while fmt == "JPEG" and out.tell() > WHATSAPP_MAX_BYTES and quality > 40:
+            quality -= 10
+            out = io.BytesIO()
+            variant.save(out, fmt, quality=quality, optimize=True, progressive=True)
+        rendered[name] = out.getvalue()
+    return rendered
+
+
+def _variant_urls(storage, key: str) -> dict:
+    return {name: storage.get_public_url(variant_path(key, name)) for name in VARIANTS}
+
+
+def _process_and_store(key: str, source):
+    storage = get_supabase().storage.from_(BUCKET)
+    with metrics.timer("images.render"):
+        rendered = render_variants(source)
+    # The primary variant goes last: once it exists the whole set is complete
+    for name in sorted(rendered, key=lambda n: n == PRIMARY_VARIANT):
+        fmt = VARIANTS[name][1]
+        storage.upload(
+            path=variant_path(key, name),
+            file=rendered[name],
+            file_options={"content-type": CONTENT_TYPES[fmt], "cache-control": "31536000", "upsert": "true"},
+        )
+    metrics.incr("images.stored")
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _forget_in_flight(key: str):
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
+
+
+def store_image(business_id: str, source, delete_after: bool = False) -> dict:
+    """Resize an image into its variants and store them under a content-hash key.
+
+    source is the image bytes or a file path; with delete_after the file is
+    removed once it is no longer needed. Re-uploads of identical content
+    reuse the stored variants. Resizing runs on the image pool; the call
+    waits up to IMAGE_PROCESS_WAIT seconds and then returns the
+    (deterministic) URLs with processing=True while the pool finishes.
+    Raises ValueError if the source is not a readable image.
+    """
+    cleanup = (lambda *_: _remove_file(source)) if delete_after and not isinstance(source, bytes) else (lambda *_: None)
+    try:
+        with _open(source) as probe:
+            probe.verify()
+    except Exception:
+        cleanup()
+        raise ValueError("File is not a supported image")
+
+    key = content_key(business_id, source)
+    storage = get_supabase().storage.from_(BUCKET)
+    urls = _variant_urls(storage, key)
+    result = {"url": urls[PRIMARY_VARIANT], "variants": urls, "deduplicated": False, "processing": False}
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+    submitted = False
+    if future is None:
+        # Checked outside the lock so uploads of other images are not held up by storage
+        if storage.exists(variant_path(key, PRIMARY_VARIANT)):
+            cleanup()
+            metrics.incr("images.deduplicated")
+            result["deduplicated"] = True
+            return result
+        with _in_flight_lock:
+            # Another upload of the same content may have been submitted meanwhile
+            future = _in_flight.get(key)
+            if future is None:
+                future = _in_flight[key] = _executor.submit(_process_and_store, key, source)
+                submitted = True
+    if submitted:
+        # Outside the lock: a callback runs right here if the future is already done
+        future.add_done_callback(lambda _: _forget_in_flight(key))
+        future.add_done_callback(cleanup)
+    else:
+        # The same content is already being processed from another source
+        cleanup()
+
+    try:
+        future.result(timeout=Config.IMAGE_PROCESS_WAIT)
+    except FutureTimeout:
+        result["processing"] = True
+    return result
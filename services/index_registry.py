@@ -0,0 +1,133 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services import metrics
+
+# Rebuilds of stale indexes run here, off the request path
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="index-refresh")
+
+
+def journaled(method):
+    """Decorator for an index's write methods (add, patch, remove).
+
+    While a replacement is being built the write is also logged so it can be
+    replayed onto the replacement; once handed over, writes go straight to it.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        with self._lock:
+            successor = self._successor
+            if successor is None and self._journal is not None:
+                self._journal.append((method.__name__, args))
+        if successor is not None:
+            return getattr(successor, method.__name__)(*args)
+        return method(self, *args)
+    return wrapper
+
+
+class RebuildableIndex:
+    """Mixin for indexes served by IndexRegistry; subclasses provide _lock and loaded_at."""
+
+    _journal = None
+    _successor = None
+
+    def begin_journal(self):
+        with self._lock:
+            self._journal = []
+
+    def abort_journal(self):
+        with self._lock:
+            self._journal = None
+
+    def hand_over(self, fresh):
+        """Replay writes made during the rebuild onto fresh, then forward later ones to it."""
+        with self._lock:
+            for name, args in self._journal or ():
+                getattr(fresh, name)(*args)
+            self._journal = None
+            self._successor = fresh
+
+
+class IndexRegistry:
+    """Per-business indexes for one process, bounded to the most recently used businesses.
+
+    A missing index is built on the caller's thread, under a lock per
+    business so other businesses are never blocked. Once older than
+    SEARCH_INDEX_TTL it keeps being served while a background thread
+    rebuilds it (stale-while-revalidate); writes made meanwhile are
+    replayed onto the new index before it is swapped in.
+    """
+
+    def __init__(self, name: str, build, max_size: int):
+        self.name = name
+        self.build = build
+        self.max_size = max_size
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._refreshing = set()
+
+    def get(self, business_id: str, loader):
+        with self._lock:
+            index = self._indexes.get(business_id)
+            if index is not None:
+                self._indexes.move_to_end(business_id)
+                stale = time.monotonic() - index.loaded_at >= Config.SEARCH_INDEX_TTL
+                if stale and business_id not in self._refreshing:
+                    self._refreshing.add(business_id)
+                    _refresh_pool.submit(self._refresh, business_id, loader, index)
+                return index
+            build_lock = self._build_locks.setdefault(business_id, threading.Lock())
+
+        with build_lock:
+            index = self.loaded(business_id)
+            if index is None:
+                with metrics.timer(f"{self.name}.build"):
+                    index = self.build(loader())
+                self._store(business_id, index)
+        return index
+
+    def _store(self, business_id: str, index):
+        with self._lock:
+            self._indexes[business_id] = index
+            self._indexes.move_to_end(business_id)
+            while len(self._indexes) > self.max_size:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._build_locks.pop(evicted, None)
+                metrics.incr(f"{self.name}.evicted")
+
+    def _refresh(self, business_id: str, loader, old):
+        try:
+            old.begin_journal()
+            with metrics.timer(f"{self.name}.build"):
+                fresh = self.build(loader())
+            old.hand_over(fresh)
+            with self._lock:
+                # Unless it was forgotten or evicted meanwhile
+                if self._indexes.get(business_id) is old:
+                    self._indexes[business_id] = fresh
+            metrics.incr(f"{self.name}.refreshed")
+        except Exception as e:
+            old.abort_journal()
+            # Keep serving the old index; try again after another TTL
+            old.loaded_at = time.monotonic()
+            metrics.incr(f"{self.name}.refresh_failed")
+            print(f"[Index] Refreshing {self.name} for {business_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(business_id)
+
+    def loaded(self, business_id: str):
+        """The business's index if this process has one, without loading it."""
+        return self._indexes.get(business_id)
+
+    def all(self) -> list:
+        with self._lock:
+            return list(self._indexes.values())
+
+    def forget(self, business_id: str):
+        with self._lock:
+            self._indexes.pop(business_id, None)
@@ -1,6 +1,17 @@
+import re
 import uuid
-import base64
+from postgrest.exceptions import APIError
 from supabase_client import get_supabase
+from config import Config
+from services import embeddings, metrics, pagination, search_index, vector_index
+from services.language_service import SEARCH_STOPWORDS
+
+# Postgres unique_violation, raised by idx_products_business_name
+UNIQUE_VIOLATION = "23505"
+
+
+class DuplicateProductError(ValueError):
+    """The business already has a product with this name."""
 
 
 def create_category(business_id: str, name: str) -> dict:
@@ -30,6 +41,8 @@ def delete_category(category_id: str) -> bool:
     """Delete a category (cascades to products)."""
     sb = get_supabase()
     sb.table("categories").delete().eq("id", category_id).execute()
+    for index in search_index.loaded_indexes() + vector_index.loaded_indexes():
+        index.remove_where(lambda p: p.get("category_id") == category_id)
     return True
 
 
@@ -46,20 +59,57 @@ def create_product(data: dict) -> dict:
         "in_stock": data.get("in_stock", True),
         "stock_quantity": data.get("stock_quantity", 0),
     }
-    result = sb.table("products").insert(product).execute()
-    return result.data[0] if result.data else None
+    try:
+        result = sb.table("products").insert(product).execute()
+    except APIError as e:
+        if e.code == UNIQUE_VIOLATION:
+            raise DuplicateProductError(f"A product named {data['name']!r} already exists")
+        raise
+    created = result.data[0] if result.data else None
+    _reindex_product(created)
+    return created
+
+
+# Columns callers may request; id and created_at are always returned (cursor keys)
+PRODUCT_FIELDS = {
+    "id", "business_id", "category_id", "name", "description", "price", "image_urls",
+    "in_stock", "stock_quantity", "created_at", "updated_at", "categories",
+}
+
+
+def product_select(fields: list = None) -> str:
+    """PostgREST select clause for a subset of PRODUCT_FIELDS (all fields by default)."""
+    if not fields:
+        return "*, categories(name)"
+    unknown = set(fields) - PRODUCT_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    columns = ["id", "created_at"] + [f for f in fields if f not in ("id", "created_at")]
+    return ", ".join("categories(name)" if c == "categories" else c for c in dict.fromkeys(columns))
 
 
-def get_products(business_id: str, category_id: str = None) -> list:
+def get_products(business_id: str, category_id: str = None, fields: list = None) -> list:
     """Get products, optionally filtered by category."""
     sb = get_supabase()
-    query = sb.table("products").select("*, categories(name)").eq("business_id", business_id)
+    query = sb.table("products").select(product_select(fields)).eq("business_id", business_id)
     if category_id:
         query = query.eq("category_id", category_id)
     result = query.order("created_at", desc=True).execute()
     return result.data or []
 
 
+def get_products_page(business_id: str, category_id: str = None, fields: list = None,
+                      limit: int = pagination.DEFAULT_PAGE_SIZE, cursor: str = None) -> dict:
+    """One newest-first page of products plus the cursor for the next page (None at the end)."""
+    sb = get_supabase()
+    query = sb.table("products").select(product_select(fields)).eq("business_id", business_id)
+    if category_id:
+        query = query.eq("category_id", category_id)
+    result = pagination.keyset_page(query, limit, cursor).execute()
+    products, next_cursor = pagination.page_result(result.data or [], limit)
+    return {"products": products, "next_cursor": next_cursor}
+
+
 def get_product(product_id: str) -> dict:
     """Get a single product."""
     sb = get_supabase()
@@ -74,78 +124,298 @@ def update_product(product_id: str, data: dict) -> dict:
     for key in ["name", "description", "price", "image_urls", "in_stock", "stock_quantity", "category_id"]:
         if key in data:
             update_data[key] = data[key]
-    result = sb.table("products").update(update_data).eq("id", product_id).execute()
-    return result.data[0] if result.data else None
+    try:
+        result = sb.table("products").update(update_data).eq("id", product_id).execute()
+    except APIError as e:
+        if e.code == UNIQUE_VIOLATION:
+            raise DuplicateProductError(f"A product named {data['name']!r} already exists")
+        raise
+    updated = result.data[0] if result.data else None
+    _reindex_product(updated)
+    return updated
+
+
+# Patch keys accepted by bulk_update_products (stock_delta adjusts stock relative to its current value)
+BULK_UPDATE_FIELDS = {"name", "description", "price", "image_urls", "in_stock", "stock_quantity", "stock_delta", "category_id"}
+# Fields that are not part of any index's searchable text
+UNINDEXED_FIELDS = {"price", "image_urls", "in_stock", "stock_quantity", "stock_delta"}
+# Range of a Postgres INTEGER column
+PG_INT_MIN, PG_INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def _is_uuid(value) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and PG_INT_MIN <= value <= PG_INT_MAX
+
+
+def _patch_error(update: dict):
+    """Why a bulk patch would fail the RPC's casts, or None if its values are well typed."""
+    if not _is_uuid(update["id"]):
+        return "id must be a UUID"
+    if "name" in update and (not isinstance(update["name"], str) or not update["name"].strip()):
+        return "name must be a non-empty string"
+    if "description" in update and not isinstance(update["description"], (str, type(None))):
+        return "description must be a string"
+    if "price" in update and update["price"] is not None and (
+        isinstance(update["price"], bool) or not isinstance(update["price"], (int, float))
+    ):
+        return "price must be a number"
+    if "image_urls" in update and (
+        not isinstance(update["image_urls"], list) or not all(isinstance(u, str) for u in update["image_urls"])
+    ):
+        return "image_urls must be a list of strings"
+    if "in_stock" in update and not isinstance(update["in_stock"], bool):
+        return "in_stock must be true or false"
+    if "stock_quantity" in update and not (_is_int(update["stock_quantity"]) and update["stock_quantity"] >= 0):
+        return "stock_quantity must be a non-negative integer"
+    if "stock_delta" in update and not _is_int(update["stock_delta"]):
+        return "stock_delta must be an integer"
+    if "category_id" in update and not _is_uuid(update["category_id"]):
+        return "category_id must be a UUID"
+    return None
+
+
+def bulk_update_products(business_id: str, updates: list) -> dict:
+    """Apply many product patches in one round trip via the bulk_update_products RPC.
+
+    Each update is {"id": ..., <field>: value}; invalid entries are reported
+    in errors, and ids that matched no product of the business in not_found.
+    """
+    patches = []
+    errors = []
+    for position, update in enumerate(updates):
+        if not isinstance(update, dict) or not update.get("id"):
+            errors.append({"index": position, "error": "id is required"})
+            continue
+        unknown = set(update) - BULK_UPDATE_FIELDS - {"id"}
+        if unknown:
+            errors.append({"index": position, "id": update["id"], "error": f"Unknown fields: {', '.join(sorted(unknown))}"})
+            continue
+        if "stock_quantity" in update and "stock_delta" in update:
+            errors.append({"index": position, "id": update["id"], "error": "Use stock_quantity or stock_delta, not both"})
+            continue
+        # Checked here so one bad value is reported for its entry instead of failing the whole RPC
+        error = _patch_error(update)
+        if error:
+            errors.append({"index": position, "id": update["id"], "error": error})
+            continue
+        patches.append(update)
+
+    updated = []
+    if patches:
+        sb = get_supabase()
+        with metrics.timer("inventory.bulk_update"):
+            result = sb.rpc("bulk_update_products", {"p_business_id": business_id, "p_updates": patches}).execute()
+        updated = result.data or []
+
+    if any(set(p) - UNINDEXED_FIELDS - {"id"} for p in patches):
+        # Searchable text changed: rebuild from the database on next search
+        search_index.forget(business_id)
+        vector_index.forget(business_id)
+    else:
+        for product in updated:
+            _patch_indexed(business_id, product["id"], {k: product.get(k) for k in ("price", "image_urls", "in_stock", "stock_quantity")})
+
+    updated_ids = {str(p["id"]) for p in updated}
+    return {
+        "updated": updated,
+        "not_found": [p["id"] for p in patches if str(p["id"]) not in updated_ids],
+        "errors": errors,
+    }
+
+
+def stock_items(items: list) -> list:
+    """Order items as decrement_stock items ({"product": name, "quantity": n >= 1})."""
+    clean = []
+    for item in items:
+        name = (item.get("product") or item.get("name") or "").strip()
+        if not name:
+            continue
+        try:
+            quantity = max(int(float(item.get("quantity") or 1)), 1)
+        except (TypeError, ValueError, OverflowError):
+            quantity = 1
+        clean.append({"product": name, "quantity": quantity})
+    return clean
+
+
+def decrement_stock(business_id: str, items: list) -> list:
+    """Atomically take ordered quantities out of stock (decrement_stock RPC).
+
+    items are order items ({"product": name, "quantity": n}); returns one
+    {"id", "product", "quantity", "status", "remaining"} per item, where status is
+    decremented, insufficient, untracked or not_found. Products are never
+    taken below zero, and in_stock flips to false when one reaches it.
+    """
+    clean = stock_items(items)
+    if not clean:
+        return []
+
+    sb = get_supabase()
+    with metrics.timer("inventory.decrement_stock"):
+        result = sb.rpc("decrement_stock", {"p_business_id": business_id, "p_items": clean}).execute()
+    outcomes = result.data or []
+    record_stock_outcomes(business_id, outcomes)
+    return outcomes
+
+
+def record_stock_outcomes(business_id: str, outcomes: list):
+    """Count decrement_stock outcomes and apply the new stock to loaded indexes."""
+    for outcome in outcomes:
+        metrics.incr(f"inventory.stock_{outcome['status']}")
+        if outcome["status"] == "decremented":
+            remaining = outcome["remaining"]
+            _patch_indexed(business_id, outcome["id"], {"stock_quantity": remaining, "in_stock": remaining > 0})
+
+
+def _patch_indexed(business_id: str, product_id, fields: dict):
+    for index in (search_index.loaded_index(business_id), vector_index.loaded_index(business_id)):
+        if index is not None:
+            index.patch(product_id, fields)
 
 
 def delete_product(product_id: str) -> bool:
     """Delete a product."""
     sb = get_supabase()
     sb.table("products").delete().eq("id", product_id).execute()
+    for index in search_index.loaded_indexes() + vector_index.loaded_indexes():
+        index.remove(product_id)
     return True
 
 
-def upload_image(business_id: str, file_data: bytes, filename: str, content_type: str) -> str:
-    """Upload an image to Supabase Storage and return the public URL."""
+CATALOG_PAGE_SIZE = 1000
+
+
+def _load_catalog(business_id: str) -> list:
+    """Fetch every product of a business, paging past PostgREST's row cap."""
     sb = get_supabase()
-    ext = filename.rsplit(".", 1)[-1] if "." in filename else "jpg"
-    storage_path = f"{business_id}/{uuid.uuid4().hex}.{ext}"
+    products = []
+    start = 0
+    while True:
+        page = (
+            sb.table("products")
+            .select("*, categories(name)")
+            .eq("business_id", business_id)
+            .order("created_at", desc=True)
+            .order("id")
+            .range(start, start + CATALOG_PAGE_SIZE - 1)
+            .execute()
+        ).data or []
+        products.extend(page)
+        if len(page) < CATALOG_PAGE_SIZE:
+            return products
+        start += CATALOG_PAGE_SIZE
 
-    sb.storage.from_("product-images").upload(
-        path=storage_path,
-        file=file_data,
-        file_options={"content-type": content_type},
-    )
 
-    public_url = sb.storage.from_("product-images").get_public_url(storage_path)
-    return public_url
+def _reindex_product(product: dict):
+    """Refresh a written product in its business's index, if one is loaded."""
+    if not product:
+        return
+    index = search_index.loaded_index(product["business_id"])
+    vectors = vector_index.loaded_index(product["business_id"])
+    if index is None and vectors is None:
+        return
+    # Re-read with the category name, which is part of the searchable text
+    product = get_product(product["id"]) or product
+    if index is not None:
+        index.add(product)
+    if vectors is not None:
+        vectors.add(product)
 
 
 def search_products(business_id: str, query: str) -> list:
     """Search products by name/description with basic fuzzy matching."""
-    sb = get_supabase()
-    all_products = (
-        sb.table("products")
-        .select("*, categories(name)")
-        .eq("business_id", business_id)
-        .execute()
-    ).data or []
-
-    if not query:
-        return all_products
-
-    query_lower = query.lower().strip()
-    query_words = query_lower.split()
-
-    scored = []
-    for product in all_products:
-        name_lower = (product.get("name") or "").lower()
-        desc_lower = (product.get("description") or "").lower()
-        cat_name = ""
-        if product.get("categories"):
-            cat_name = (product["categories"].get("name") or "").lower()
-
-        searchable = f"{name_lower} {desc_lower} {cat_name}"
-        score = 0
-
-        # Exact match in name
-        if query_lower in name_lower:
-            score += 10
-        # Exact match in description
-        if query_lower in desc_lower:
-            score += 5
-        # Word matches
-        for word in query_words:
-            if word in searchable:
-                score += 3
-            # Partial match (at least 3 chars)
-            elif len(word) >= 3:
-                for s_word in searchable.split():
-                    if word in s_word or s_word in word:
-                        score += 1
-
-        if score > 0:
-            scored.append((score, product))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [item[1] for item in scored]
+    index = search_index.get_index(business_id, lambda: _load_catalog(business_id))
+    with metrics.timer("search.query"):
+        return index.search(query)
+
+
+def semantic_search_products(business_id: str, query: str, k: int = 10) -> list:
+    """Products most similar in meaning to the query (embedding cosine), best first."""
+    if not query.strip():
+        return []
+    # Built from the keyword index's catalog copy rather than a second fetch
+    index = vector_index.get_index(
+        business_id, lambda: search_index.get_index(business_id, lambda: _load_catalog(business_id)).all_products()
+    )
+    with metrics.timer("search.semantic"):
+        query_vector = embeddings.embed_query(query)
+        return [product for product, _ in index.search(query_vector, k, Config.SEMANTIC_MIN_SCORE)]
+
+
+def _query_terms(text: str) -> str:
+    words = re.findall(r"[^\s?!.,;:()\"'।|/+-]+", (text or "").lower())
+    return " ".join(w for w in words if w not in SEARCH_STOPWORDS and not w.isdigit())
+
+
+def retrieve_relevant_products(business_id: str, message_text: str, history_texts: list = None, k: int = 15) -> list:
+    """Top-k products for a customer message, topped up from recent history if needed.
+
+    Keyword matches come first; semantic matches fill the remaining slots.
+    """
+    results = []
+    seen = set()
+
+    def collect(products) -> bool:
+        for product in products:
+            if product["id"] not in seen:
+                seen.add(product["id"])
+                results.append(product)
+            if len(results) >= k:
+                return True
+        return False
+
+    for text in [message_text] + list(history_texts or []):
+        query = _query_terms(text)
+        if not query:
+            continue
+        if collect(search_products(business_id, query)):
+            return results
+        if collect(semantic_search_products(business_id, query, k)):
+            return results
+    return results
+
+
+def summarize_categories(products: list) -> str:
+    """One line per category with item count and price range, for bounded prompts."""
+    categories = {}
+    for p in products:
+        name = (p.get("categories") or {}).get("name") or "General"
+        entry = categories.setdefault(name, {"count": 0, "in_stock": 0, "prices": []})
+        entry["count"] += 1
+        if p.get("in_stock", True):
+            entry["in_stock"] += 1
+        if p.get("price"):
+            entry["prices"].append(float(p["price"]))
+
+    lines = []
+    for name, entry in sorted(categories.items(), key=lambda item: -item[1]["count"]):
+        line = f"- {name}: {entry['count']} items ({entry['in_stock']} in stock)"
+        if entry["prices"]:
+            line += f", ₹{min(entry['prices']):,.0f}–₹{max(entry['prices']):,.0f}"
+        lines.append(line)
+    return "\n".join(lines) if lines else "No products in inventory yet."
+
+
+def format_product_line(p: dict, max_description: int = 120) -> str:
+    """Compact single-line product description used in bot prompts."""
+    cat = (p.get("categories") or {}).get("name") or "General"
+    price = f"₹{p['price']}" if p.get("price") else "Price not set"
+    qty = p.get("stock_quantity", 0)
+    stock = f"qty:{qty}" if qty else ("In stock" if p.get("in_stock", True) else "Out of stock")
+    line = f"- {p['name']} [{cat}] — {price} ({stock})"
+    if p.get("image_urls"):
+        line += f" [Image: {p['image_urls'][0]}]"
+    description = (p.get("description") or "").strip()
+    if description:
+        if len(description) > max_description:
+            description = description[:max_description].rstrip() + "…"
+        line += f": {description}"
+    return line
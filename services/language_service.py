@@ -49,6 +49,159 @@ def detect_language(text: str) -> str:
     return "English"
 
 
+# Filler words that carry no product information in a customer query
+SEARCH_STOPWORDS = {
+    "is", "are", "the", "a", "an", "of", "for", "what", "whats", "what's", "please", "pls",
+    "tell", "me", "your", "you", "do", "have", "sell", "how", "much", "price", "cost", "rate",
+    "available", "stock", "in", "one", "any", "this", "that", "it", "there", "hi", "hello",
+    "bhai", "ji", "kya", "hai", "hain", "ka", "ki", "ke", "ko", "mein", "me", "aap", "aapke",
+    "paas", "kitna", "kitne", "kitni", "milega", "milegi", "milenge", "mil", "jayega", "batao",
+    "bataiye", "bata", "daam", "kimat", "keemat", "ek", "wala", "wali", "sir", "madam",
+    "है", "हैं", "क्या", "का", "की", "के", "को", "में", "कितना", "कितने", "कितनी", "कीमत",
+    "दाम", "रेट", "मिलेगा", "मिलेगी", "मिलेंगे", "उपलब्ध", "आपके", "पास", "जी", "भाई",
+    "i", "my", "want", "need", "and", "or", "to", "with", "can", "show", "send", "order",
+    "ok", "okay", "yes", "no", "thanks", "aur", "ya", "chahiye", "bhejo", "dikhao", "dikha",
+    "haan", "nahi", "mujhe", "और", "चाहिए", "मुझे",
+}
+
+
+# Devanagari → Roman transliteration tables (simplified, tuned for product names)
+DEVANAGARI_VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "ee", "उ": "u", "ऊ": "oo", "ऋ": "ri",
+    "ए": "e", "ऐ": "ai", "ओ": "o", "औ": "au", "ऑ": "o", "ऍ": "e",
+}
+DEVANAGARI_MATRAS = {
+    "ा": "aa", "ि": "i", "ी": "ee", "ु": "u", "ू": "oo", "ृ": "ri",
+    "े": "e", "ै": "ai", "ो": "o", "ौ": "au", "ॉ": "o", "ॅ": "e",
+}
+DEVANAGARI_CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ल": "l", "व": "v",
+    "श": "sh", "ष": "sh", "स": "s", "ह": "h",
+    "क़": "q", "ख़": "kh", "ग़": "g", "ज़": "z", "ड़": "r", "ढ़": "rh", "फ़": "f", "य़": "y",
+}
+DEVANAGARI_SIGNS = {"ं": "n", "ँ": "n", "ः": "h"}
+DEVANAGARI_VIRAMA = "्"
+DEVANAGARI_NUKTA = "़"
+DEVANAGARI_DIGITS = {chr(0x0966 + i): str(i) for i in range(10)}
+
+# Spelling variants that sound alike, applied in order after lowercasing
+PHONETIC_FOLDS = [
+    ("chh", "c"), ("ch", "c"), ("sh", "s"), ("ph", "f"), ("kh", "k"), ("gh", "g"),
+    ("jh", "j"), ("th", "t"), ("dh", "d"), ("bh", "b"), ("ck", "k"),
+    ("aa", "a"), ("ee", "i"), ("ii", "i"), ("oo", "u"), ("uu", "u"),
+    ("w", "v"), ("z", "j"), ("q", "k"),
+]
+
+# Words customers use interchangeably for the same item; every word in a
+# group matches products named with any other
+PRODUCT_SYNONYMS = [
+    ["thali", "थाली", "plate"],
+    ["katori", "कटोरी", "bowl"],
+    ["chammach", "चम्मच", "spoon"],
+    ["gilas", "गिलास", "glass", "tumbler"],
+    ["kadhai", "कढ़ाई", "kadai", "wok"],
+    ["tawa", "तवा", "griddle"],
+    ["lota", "लोटा", "jug"],
+    ["pyala", "प्याला", "cup", "mug"],
+    ["balti", "बाल्टी", "bucket"],
+    ["bartan", "बर्तन", "utensil", "utensils"],
+    ["chai", "चाय", "tea"],
+    ["chawal", "चावल", "rice"],
+    ["atta", "आटा", "flour"],
+    ["cheeni", "चीनी", "sugar"],
+    ["namak", "नमक", "salt"],
+    ["tel", "तेल", "oil"],
+    ["doodh", "दूध", "milk"],
+    ["sabun", "साबुन", "soap"],
+    ["kapda", "कपड़ा", "cloth"],
+    ["joota", "जूता", "shoe", "shoes"],
+]
+
+_SEARCH_TOKEN_RE = re.compile(r"[^\s?!.,;:()\"'।|/+\-]+")
+
+
+def transliterate_devanagari(text: str) -> str:
+    """Romanize Devanagari text the way Hinglish speakers spell it (थाली → thaali).
+
+    Consonants carry an inherent "a" unless followed by a vowel sign or virama;
+    the word-final inherent "a" is dropped (दाम → daam). Other characters pass
+    through unchanged.
+    """
+    out = []
+    pending_a = False
+    for ch in text or "":
+        if ch == DEVANAGARI_NUKTA:
+            continue
+        if ch in DEVANAGARI_MATRAS:
+            out.append(DEVANAGARI_MATRAS[ch])
+            pending_a = False
+            continue
+        if ch == DEVANAGARI_VIRAMA:
+            pending_a = False
+            continue
+        if ch in DEVANAGARI_SIGNS:
+            if pending_a:
+                out.append("a")
+                pending_a = False
+            out.append(DEVANAGARI_SIGNS[ch])
+            continue
+
+        if pending_a and ch in DEVANAGARI_CONSONANTS:
+            out.append("a")
+        pending_a = False
+        if ch in DEVANAGARI_CONSONANTS:
+            out.append(DEVANAGARI_CONSONANTS[ch])
+            pending_a = True
+        elif ch in DEVANAGARI_VOWELS:
+            out.append(DEVANAGARI_VOWELS[ch])
+        elif ch in DEVANAGARI_DIGITS:
+            out.append(DEVANAGARI_DIGITS[ch])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def phonetic_fold(word: str) -> str:
+    """Collapse spelling variants of a Roman word: thaali, thali, taali → tali."""
+    word = word.lower()
+    for variant, folded in PHONETIC_FOLDS:
+        word = word.replace(variant, folded)
+    return re.sub(r"(.)\1+", r"\1", word)
+
+
+def normalize_search_text(text: str) -> list:
+    """Transliterated, phonetically folded tokens of text, without stopwords."""
+    tokens = _SEARCH_TOKEN_RE.findall((text or "").lower())
+    return [
+        phonetic_fold(transliterate_devanagari(t))
+        for t in tokens
+        if t not in SEARCH_STOPWORDS and not t.isdigit()
+    ]
+
+
+def char_trigrams(word: str) -> set:
+    """Character trigrams of a word padded with spaces, so short words still have several."""
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+_SYNONYM_GROUPS = {}
+for _group in PRODUCT_SYNONYMS:
+    _forms = {phonetic_fold(transliterate_devanagari(w)) for w in _group}
+    for _form in _forms:
+        _SYNONYM_GROUPS.setdefault(_form, set()).update(_forms)
+
+
+def search_synonyms(normalized_word: str) -> set:
+    """Normalized forms interchangeable with a normalized word, including itself."""
+    return _SYNONYM_GROUPS.get(normalized_word, {normalized_word})
+
+
 LANGUAGE_PROMPTS = {
     "English": "Respond in clear, simple English.",
     "Hindi": "Respond in Hindi (Devanagari script). Use simple everyday Hindi.",
@@ -61,3 +214,40 @@ LANGUAGE_PROMPTS = {
 def get_language_instruction(language: str) -> str:
     """Get the language instruction for AI prompts."""
     return LANGUAGE_PROMPTS.get(language, LANGUAGE_PROMPTS["English"])
+
+
+# Canned replies for the LLM-free fast path (price / availability lookups)
+FAST_PATH_REPLIES = {
+    "English": {
+        "price": "{name} is ₹{price} {stock_note} 😊 Would you like to order?",
+        "no_price": "{name} is available {stock_note}. Please ask us for the latest price 🙏",
+        "available": "Yes, {name} is available {stock_note} ✅ It costs ₹{price}. Shall I place an order?",
+        "out_of_stock": "Sorry, {name} is currently out of stock 🙏 Can I suggest something similar?",
+        "in_stock_note": "(in stock)",
+        "qty_note": "({qty} in stock)",
+    },
+    "Hindi": {
+        "price": "{name} की कीमत ₹{price} है {stock_note} 😊 क्या आप ऑर्डर करना चाहेंगे?",
+        "no_price": "{name} उपलब्ध है {stock_note}। कीमत के लिए कृपया हमसे पूछें 🙏",
+        "available": "जी हाँ, {name} उपलब्ध है {stock_note} ✅ कीमत ₹{price} है। क्या ऑर्डर कर दूँ?",
+        "out_of_stock": "माफ़ कीजिए, {name} अभी स्टॉक में नहीं है 🙏 क्या मैं कुछ मिलता-जुलता सुझाऊँ?",
+        "in_stock_note": "(स्टॉक में है)",
+        "qty_note": "({qty} स्टॉक में)",
+    },
+    "Hinglish": {
+        "price": "{name} ₹{price} ka hai {stock_note} 😊 Order karna chahenge?",
+        "no_price": "{name} available hai {stock_note}. Price ke liye please humse puchiye 🙏",
+        "available": "Haan ji, {name} available hai {stock_note} ✅ Price ₹{price} hai. Order kar doon?",
+        "out_of_stock": "Sorry, {name} abhi stock mein nahi hai 🙏 Kuch similar dikhaun?",
+        "in_stock_note": "(stock mein hai)",
+        "qty_note": "({qty} stock mein)",
+    },
+}
+
+
+def get_fast_path_reply(language: str, key: str, **values) -> str:
+    """Render a fast-path reply template, or None for languages without templates."""
+    templates = FAST_PATH_REPLIES.get(language)
+    if not templates:
+        return None
+    return " ".join(templates[key].format(**values).split())
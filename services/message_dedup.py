@@ -0,0 +1,88 @@
+import sqlite3
+import threading
+import time
+from config import Config
+from services import metrics
+from services.cache import TTLCache
+
+# Meta redelivers for up to a day, but nearly all retries land within minutes
+_seen = TTLCache(maxsize=Config.WEBHOOK_DEDUP_MAX_IDS, ttl=Config.WEBHOOK_DEDUP_TTL)
+
+_local = threading.local()
+_last_prune = 0.0
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(Config.WEBHOOK_DEDUP_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen_messages (
+                message_id TEXT PRIMARY KEY,
+                seen_at REAL NOT NULL
+            )
+        """)
+        _local.conn = conn
+    return conn
+
+
+def _mark_persistent(message_id: str) -> bool:
+    """Record the id in the shared SQLite store. Returns True if it was new."""
+    global _last_prune
+    now = time.time()
+    conn = _connect()
+    cutoff = now - Config.WEBHOOK_DEDUP_TTL
+
+    if now - _last_prune > 60:
+        _last_prune = now
+        conn.execute("DELETE FROM seen_messages WHERE seen_at < ?", (cutoff,))
+
+    cur = conn.execute(
+        "INSERT OR IGNORE INTO seen_messages (message_id, seen_at) VALUES (?, ?)",
+        (message_id, now),
+    )
+    if cur.rowcount:
+        return True
+
+    # Row exists; it only counts as a duplicate if it is still within the TTL
+    cur = conn.execute(
+        "UPDATE seen_messages SET seen_at = ? WHERE message_id = ? AND seen_at < ?",
+        (now, message_id, cutoff),
+    )
+    return cur.rowcount > 0
+
+
+def is_duplicate(message_id: str) -> bool:
+    """Check-and-mark a WhatsApp message id (wamid). True if it was already seen."""
+    if not message_id:
+        return False
+
+    if not _seen.add(message_id):
+        metrics.incr("dedup.hit")
+        return True
+
+    # The persistent store catches retries that land on another worker process
+    # or arrive after a restart
+    if Config.WEBHOOK_DEDUP_PATH:
+        try:
+            if not _mark_persistent(message_id):
+                metrics.incr("dedup.hit")
+                return True
+        except sqlite3.Error as e:
+            print(f"[Dedup] Persistent store unavailable: {e}")
+
+    metrics.incr("dedup.miss")
+    return False
+
+
+def forget(message_id: str):
+    """Unmark an id whose processing could not be queued, so Meta's redelivery is accepted."""
+    if not message_id:
+        return
+    _seen.pop(message_id)
+    if Config.WEBHOOK_DEDUP_PATH:
+        try:
+            _connect().execute("DELETE FROM seen_messages WHERE message_id = ?", (message_id,))
+        except sqlite3.Error as e:
+            print(f"[Dedup] Persistent store unavailable: {e}")
@@ -0,0 +1,302 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from config import Config
+from services import metrics
+
+# Jobs claimed longer ago than this are assumed to belong to a crashed worker
+VISIBILITY_TIMEOUT = 300
+POLL_INTERVAL = 0.5
+
+_local = threading.local()
+_wakeup = threading.Event()
+_workers = []
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's connection to the queue database."""
+    global _schema_ready
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(Config.WEBHOOK_QUEUE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        payload TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'pending',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        enqueued_at REAL NOT NULL,
+                        available_at REAL NOT NULL,
+                        claimed_at REAL,
+                        last_error TEXT
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+                if "conversation_key" not in columns:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN conversation_key TEXT")
+                # Set when jobs are first claimed together; a retry claims exactly
+                # the same jobs so the batch keeps its turn key
+                if "batch_id" not in columns:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN batch_id INTEGER")
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs(status, available_at)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_jobs_conversation ON jobs(conversation_key, status)"
+                )
+                # Replies already produced for a batch, so a retried batch does not
+                # call the LLM or place its order again
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS turns (
+                        turn_key TEXT PRIMARY KEY,
+                        reply TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                turn_columns = {row[1] for row in conn.execute("PRAGMA table_info(turns)")}
+                if "saved" not in turn_columns:
+                    conn.execute("ALTER TABLE turns ADD COLUMN saved INTEGER NOT NULL DEFAULT 0")
+                _schema_ready = True
+    return conn
+
+
+def enqueue(payload: dict, conversation_key: str = None) -> int:
+    """Durably store a job and wake up a worker. Returns the job id.
+
+    Jobs sharing a conversation_key are never processed concurrently, and
+    ones that arrive within WEBHOOK_COALESCE_WINDOW of each other are
+    claimed together as one batch.
+    """
+    now = time.time()
+    conn = _connect()
+    cur = conn.execute(
+        "INSERT INTO jobs (payload, conversation_key, enqueued_at, available_at) VALUES (?, ?, ?, ?)",
+        (json.dumps(payload), conversation_key or f"job:{uuid.uuid4().hex}", now, now),
+    )
+    metrics.incr("queue.enqueued")
+    _wakeup.set()
+    return cur.lastrowid
+
+
+def claim() -> dict:
+    """Atomically claim every ready job of the oldest ready conversation, or return None.
+
+    A conversation is ready when none of its jobs is being processed and it
+    has been quiet for the coalesce window (or its oldest job has waited
+    WEBHOOK_COALESCE_MAX_WAIT, so a chatty customer is not starved).
+
+    A batch that failed (or was requeued after a crash) is claimed again on
+    its own, with exactly its original jobs, and the conversation's newer
+    messages wait until it is done.
+    """
+    now = time.time()
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            """
+            SELECT j.conversation_key FROM jobs j
+            WHERE j.status = 'pending' AND j.available_at <= :now
+              AND NOT EXISTS (
+                  SELECT 1 FROM jobs p
+                  WHERE p.conversation_key = j.conversation_key AND p.status = 'processing'
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM jobs r
+                  WHERE r.conversation_key = j.conversation_key AND r.status = 'pending'
+                    AND r.batch_id IS NOT NULL AND r.available_at > :now
+              )
+              AND (
+                  j.batch_id IS NOT NULL
+                  OR (SELECT MAX(q.enqueued_at) FROM jobs q
+                   WHERE q.conversation_key = j.conversation_key AND q.status = 'pending') <= :quiet_since
+                  OR j.enqueued_at <= :max_wait_since
+              )
+            ORDER BY j.id LIMIT 1
+            """,
+            {
+                "now": now,
+                "quiet_since": now - Config.WEBHOOK_COALESCE_WINDOW,
+                "max_wait_since": now - Config.WEBHOOK_COALESCE_MAX_WAIT,
+            },
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        retry = conn.execute(
+            "SELECT MIN(batch_id) FROM jobs WHERE conversation_key = ? AND status = 'pending' AND batch_id IS NOT NULL",
+            (row[0],),
+        ).fetchone()[0]
+        if retry is not None:
+            rows = conn.execute(
+                """
+                SELECT id, payload, enqueued_at, attempts FROM jobs
+                WHERE conversation_key = ? AND status = 'pending' AND batch_id = ?
+                ORDER BY id
+                """,
+                (row[0], retry),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                """
+                SELECT id, payload, enqueued_at, attempts FROM jobs
+                WHERE conversation_key = ? AND status = 'pending' AND batch_id IS NULL AND available_at <= ?
+                ORDER BY id
+                """,
+                (row[0], now),
+            ).fetchall()
+        ids = [r[0] for r in rows]
+        conn.execute(
+            f"UPDATE jobs SET status = 'processing', claimed_at = ?, attempts = attempts + 1, "
+            f"batch_id = COALESCE(batch_id, ?) WHERE id IN ({_placeholders(ids)})",
+            (now, ids[0], *ids),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    return {
+        "ids": ids,
+        "conversation_key": row[0],
+        "payloads": [json.loads(r[1]) for r in rows],
+        "enqueued_at": [r[2] for r in rows],
+        "attempts": max(r[3] for r in rows) + 1,
+    }
+
+
+def _placeholders(ids: list) -> str:
+    return ",".join("?" * len(ids))
+
+
+def complete(batch: dict):
+    """Remove a successfully processed batch."""
+    ids = batch["ids"]
+    _connect().execute(f"DELETE FROM jobs WHERE id IN ({_placeholders(ids)})", ids)
+
+
+def fail(batch: dict, error: str):
+    """Schedule a failed batch for retry with backoff, or park it as dead."""
+    conn = _connect()
+    ids = batch["ids"]
+    if batch["attempts"] >= Config.WEBHOOK_MAX_ATTEMPTS:
+        conn.execute(
+            f"UPDATE jobs SET status = 'dead', last_error = ? WHERE id IN ({_placeholders(ids)})",
+            (error, *ids),
+        )
+        metrics.incr("queue.dead", len(ids))
+        return
+
+    retry_at = time.time() + 2 ** batch["attempts"]
+    conn.execute(
+        f"UPDATE jobs SET status = 'pending', available_at = ?, last_error = ? WHERE id IN ({_placeholders(ids)})",
+        (retry_at, error, *ids),
+    )
+    metrics.incr("queue.retried", len(ids))
+
+
+def requeue_stale():
+    """Return jobs stuck in 'processing' (e.g. after a crash) to the queue."""
+    cutoff = time.time() - VISIBILITY_TIMEOUT
+    conn = _connect()
+    cur = conn.execute(
+        "UPDATE jobs SET status = 'pending' WHERE status = 'processing' AND claimed_at < ?",
+        (cutoff,),
+    )
+    # Retries back off for at most a few minutes; a day is plenty
+    conn.execute("DELETE FROM turns WHERE created_at < ?", (time.time() - 86400,))
+    return cur.rowcount
+
+
+def recorded_turn(turn_key: str) -> tuple:
+    """(reply, saved to history) recorded for a batch by an earlier attempt, or None."""
+    row = _connect().execute("SELECT reply, saved FROM turns WHERE turn_key = ?", (turn_key,)).fetchone()
+    return (row[0], bool(row[1])) if row else None
+
+
+def record_turn(turn_key: str, reply: str):
+    """Remember a batch's reply before its side effects (orders) run."""
+    _connect().execute(
+        "INSERT OR REPLACE INTO turns (turn_key, reply, created_at) VALUES (?, ?, ?)",
+        (turn_key, reply, time.time()),
+    )
+
+
+def stats() -> dict:
+    """Queue depth by status."""
+    rows = _connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+    counts = {status: count for status, count in rows}
+    metrics.set_gauge("queue.depth", counts.get("pending", 0))
+    return {
+        "pending": counts.get("pending", 0),
+        "processing": counts.get("processing", 0),
+        "dead": counts.get("dead", 0),
+        "workers": len(_workers),
+    }
+
+
+def _worker_loop(handler):
+    last_requeue = 0.0
+    while True:
+        if time.time() - last_requeue > VISIBILITY_TIMEOUT:
+            requeue_stale()
+            last_requeue = time.time()
+
+        try:
+            batch = claim()
+        except sqlite3.Error as e:
+            print(f"[Queue] Claim failed: {e}")
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        if batch is None:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+
+        claimed_at = time.time()
+        for enqueued_at in batch["enqueued_at"]:
+            metrics.observe("queue.wait", claimed_at - enqueued_at)
+        start = time.perf_counter()
+        try:
+            handler(batch["payloads"])
+        except Exception as e:
+            print(f"[Queue] Jobs {batch['ids']} failed (attempt {batch['attempts']}): {e}")
+            fail(batch, str(e))
+        else:
+            complete(batch)
+            metrics.incr("queue.processed", len(batch["ids"]))
+        finally:
+            metrics.observe("queue.process", time.perf_counter() - start)
+
+
+def start_workers(handler, count: int = None):
+    """Start background threads that drain the queue.
+
+    The handler is called with the list of payloads claimed together for one
+    conversation key (a single payload for jobs enqueued without a key).
+    """
+    if _workers:
+        return
+    count = Config.WEBHOOK_WORKERS if count is None else count
+    for i in range(count):
+        t = threading.Thread(target=_worker_loop, args=(handler,), name=f"queue-worker-{i}", daemon=True)
+        t.start()
+        _workers.append(t)
+
+
+def mark_turn_saved(turn_key: str):
+    """Note that a batch's turn is in the conversation history, so a retry only resends it."""
+    _connect().execute("UPDATE turns SET saved = 1 WHERE turn_key = ?", (turn_key,))
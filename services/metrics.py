@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Keep the most recent samples per timer so percentiles reflect current load
+MAX_SAMPLES = 1000
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+
+
+def incr(name: str, amount: int = 1):
+    """Increment a named counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name: str, value):
+    """Record the latest value of a gauge (e.g. queue depth)."""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, seconds: float):
+    """Record a duration sample in seconds."""
+    with _lock:
+        samples = _timings.get(name)
+        if samples is None:
+            samples = _timings[name] = deque(maxlen=MAX_SAMPLES)
+        samples.append(seconds)
+
+
+@contextmanager
+def timer(name: str):
+    """Context manager that records the wall time of its block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def _percentile(sorted_samples: list, pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def snapshot() -> dict:
+    """Return counters, gauges and timing percentiles (in milliseconds)."""
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        timings = {name: sorted(samples) for name, samples in _timings.items()}
+
+    timing_stats = {}
+    for name, samples in timings.items():
+        timing_stats[name] = {
+            "count": len(samples),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 2),
+            "p95_ms": round(_percentile(samples, 95) * 1000, 2),
+            "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+        }
+
+    return {"counters": counters, "gauges": gauges, "timings": timing_stats}
@@ -0,0 +1,206 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from itertools import islice
+from config import Config
+from services import metrics
+
+# Events are written to a table in the webhook queue database, so the stream
+# server (a separate gevent process, see gunicorn.stream.conf.py) sees orders
+# placed by any app worker on the host. Each process serving streams tails
+# the table with one poller thread and fans new rows out to its subscribers.
+# Event ids are the business's event sequence number.
+
+_local = threading.local()
+_channels = {}
+_channels_lock = threading.Lock()
+_subscriber_count = 0
+_poller = []
+
+
+def _connect() -> sqlite3.Connection:
+    """This thread's connection to the event table (in the webhook queue database)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(Config.WEBHOOK_QUEUE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS order_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                business_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_order_events_business_seq ON order_events(business_id, seq)"
+        )
+        _local.conn = conn
+    return conn
+
+
+class _Channel:
+    """Recent events of one business, in order, with a condition to wait for new ones."""
+
+    def __init__(self, business_id: str):
+        self.events = deque(maxlen=Config.ORDER_EVENTS_BUFFER)
+        self.last_seq = 0
+        self.cond = threading.Condition()
+        # Seeded from the table so a reconnecting client can resume here even
+        # if its previous stream was served by another process
+        rows = _connect().execute(
+            "SELECT seq, event_type, data FROM order_events WHERE business_id = ? ORDER BY seq",
+            (business_id,),
+        ).fetchall()
+        for seq, event_type, data in rows:
+            self.append(seq, event_type, json.loads(data))
+
+    def append(self, seq: int, event_type: str, data: dict):
+        with self.cond:
+            # The poller may deliver rows the seed already had
+            if seq <= self.last_seq:
+                return
+            self.last_seq = seq
+            self.events.append((seq, event_type, data))
+            self.cond.notify_all()
+
+    def since(self, seq: int) -> list:
+        """Buffered events after seq (caller holds cond); None if some were already dropped."""
+        if not self.events or seq >= self.last_seq:
+            return []
+        first = self.events[0][0]
+        if seq < first - 1:
+            return None
+        return list(islice(self.events, seq - first + 1, None))
+
+
+def _channel(business_id: str) -> _Channel:
+    channel = _channels.get(business_id)
+    if channel is None:
+        with _channels_lock:
+            channel = _channels.get(business_id)
+            if channel is None:
+                channel = _channels[business_id] = _Channel(business_id)
+    return channel
+
+
+def publish(business_id: str, event_type: str, data: dict):
+    """Record an event for a business; streams in every process pick it up within a poll interval."""
+    business_id = str(business_id)
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM order_events WHERE business_id = ?", (business_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO order_events (business_id, seq, event_type, data) VALUES (?, ?, ?, ?)",
+                (business_id, seq, event_type, json.dumps(data, default=str)),
+            )
+            # Keep the last ORDER_EVENTS_BUFFER events of the business for resuming
+            conn.execute(
+                "DELETE FROM order_events WHERE business_id = ? AND seq <= ?",
+                (business_id, seq - Config.ORDER_EVENTS_BUFFER),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        # The order itself is already saved; a missed event makes clients refetch at worst
+        print(f"[Order Events] Failed to publish {event_type} for {business_id}: {e}")
+        return
+    metrics.incr("order_events.published")
+
+
+def _poll(last_id: int):
+    conn = _connect()
+    while True:
+        time.sleep(Config.ORDER_EVENTS_POLL_INTERVAL)
+        try:
+            rows = conn.execute(
+                "SELECT id, business_id, seq, event_type, data FROM order_events WHERE id > ? ORDER BY id",
+                (last_id,),
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[Order Events] Poll failed: {e}")
+            continue
+        for row_id, business_id, seq, event_type, data in rows:
+            last_id = row_id
+            # Businesses without a channel here are seeded from the table when first subscribed to
+            channel = _channels.get(business_id)
+            if channel is not None:
+                channel.append(seq, event_type, json.loads(data))
+
+
+def _start_poller():
+    if _poller:
+        return
+    with _channels_lock:
+        if _poller:
+            return
+        # Read before any channel is seeded, so no row falls between the two
+        last_id = _connect().execute("SELECT COALESCE(MAX(id), 0) FROM order_events").fetchone()[0]
+        t = threading.Thread(target=_poll, args=(last_id,), name="order-events-poller", daemon=True)
+        t.start()
+        _poller.append(t)
+
+
+def _count_subscriber(delta: int):
+    global _subscriber_count
+    with _channels_lock:
+        _subscriber_count += delta
+        metrics.set_gauge("order_events.subscribers", _subscriber_count)
+
+
+def _parse_event_id(event_id: str):
+    return int(event_id) if (event_id or "").isdigit() else None
+
+
+def subscribe(business_id: str, last_event_id: str = None, heartbeat: float = None):
+    """Yield (event_id, event_type, data) for a business's events as they happen.
+
+    With last_event_id, events published after it are replayed first; if it
+    is unknown or older than the buffer, a ("...", "reset", {}) event tells
+    the client to refetch. Yields None every `heartbeat` seconds without
+    events so the caller can keep the connection alive.
+    """
+    _start_poller()
+    channel = _channel(str(business_id))
+    heartbeat = Config.ORDER_STREAM_HEARTBEAT if heartbeat is None else heartbeat
+
+    with channel.cond:
+        seq = _parse_event_id(last_event_id) if last_event_id else channel.last_seq
+        if seq is None or seq > channel.last_seq or channel.since(seq) is None:
+            seq = channel.last_seq
+            reset = True
+        else:
+            reset = False
+
+    _count_subscriber(1)
+    try:
+        if reset:
+            yield str(seq), "reset", {}
+
+        while True:
+            with channel.cond:
+                pending = channel.since(seq)
+                if pending == []:
+                    channel.cond.wait(heartbeat)
+                    pending = channel.since(seq)
+            if pending is None:
+                # Fell more than a buffer behind while writing to a slow client
+                seq = channel.last_seq
+                yield str(seq), "reset", {}
+            elif pending:
+                for event_seq, event_type, data in pending:
+                    seq = event_seq
+                    yield str(event_seq), event_type, data
+            else:
+                yield None
+    finally:
+        _count_subscriber(-1)
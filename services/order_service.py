@@ -1,14 +1,48 @@
+from datetime import datetime
+from config import Config
 from supabase_client import get_supabase
+from services import dashboard_cache, metrics, order_events, pagination
+from services.inventory_service import record_stock_outcomes, stock_items
 
+ANALYTICS_BUCKETS = {"day": 1, "week": 7, "month": 31}
+# Keeps a single analytics response (and its generate_series) bounded
+ANALYTICS_MAX_BUCKETS = 1000
 
-def get_orders(business_id: str, status: str = None, limit: int = 50) -> list:
-    """Get orders for a business."""
-    sb = get_supabase()
-    query = sb.table("orders").select("*").eq("business_id", business_id)
+
+def _orders_query(business_id: str, status: str = None, start: datetime = None, end: datetime = None):
+    """Orders of a business, optionally by status and within [start, end)."""
+    query = get_supabase().table("orders").select("*").eq("business_id", business_id)
     if status:
         query = query.eq("status", status)
-    result = query.order("created_at", desc=True).limit(limit).execute()
-    return result.data or []
+    if start:
+        query = query.gte("created_at", start.isoformat())
+    if end:
+        query = query.lt("created_at", end.isoformat())
+    return query
+
+
+def get_orders_page(business_id: str, status: str = None, start: datetime = None, end: datetime = None,
+                    limit: int = pagination.DEFAULT_PAGE_SIZE, cursor: str = None) -> dict:
+    """One newest-first page of orders plus the cursor for the next page (None at the end)."""
+    query = _orders_query(business_id, status, start, end)
+    result = pagination.keyset_page(query, limit, cursor).execute()
+    orders, next_cursor = pagination.page_result(result.data or [], limit)
+    return {"orders": orders, "next_cursor": next_cursor}
+
+
+def iter_orders(business_id: str, status: str = None, start: datetime = None, end: datetime = None):
+    """Yield every matching order, newest first, fetching ORDER_EXPORT_PAGE_SIZE rows at a time.
+
+    Only one page is held in memory, however many orders the business has.
+    """
+    cursor = None
+    while True:
+        with metrics.timer("orders.export_page"):
+            page = get_orders_page(business_id, status, start, end, Config.ORDER_EXPORT_PAGE_SIZE, cursor)
+        yield from page["orders"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
 
 
 def get_order(order_id: str) -> dict:
@@ -31,78 +65,97 @@ def create_order(data: dict) -> dict:
         "status": "pending",
         "notes": data.get("notes", ""),
     }
-    result = sb.table("orders").insert(order).execute()
-    return result.data[0] if result.data else None
+    # Inserts the order, counts it in the dashboard rollups and takes its items
+    # out of stock (noting any shortfall on the order) in one transaction
+    with metrics.timer("orders.place"):
+        placed = sb.rpc(
+            "place_order_with_stock", {"p_order": order, "p_items": stock_items(order["items"])}
+        ).execute().data or None
+    created = placed["order"] if placed else None
+    if created:
+        dashboard_cache.invalidate(str(created["business_id"]))
+        record_stock_outcomes(created["business_id"], placed["stock"] or [])
+        order_events.publish(created["business_id"], "order.created", created)
+    return created
 
 
 def update_order_status(order_id: str, status: str) -> dict:
     """Update order status."""
     sb = get_supabase()
-    result = (
-        sb.table("orders")
-        .update({"status": status})
-        .eq("id", order_id)
-        .execute()
-    )
-    return result.data[0] if result.data else None
+    result = sb.rpc("set_order_status", {"p_order_id": order_id, "p_status": status}).execute()
+    order = result.data[0] if result.data else None
+    if order:
+        dashboard_cache.invalidate(str(order["business_id"]))
+        order_events.publish(order["business_id"], "order.updated", order)
+    return order
 
 
 def get_dashboard_stats(business_id: str) -> dict:
-    """Get dashboard analytics for a business."""
+    """Get dashboard analytics for a business, cached briefly per business."""
+    return dashboard_cache.get_stats(str(business_id), _compute_dashboard_stats)
+
+
+def _compute_dashboard_stats(business_id: str) -> dict:
+    """Read the dashboard figures from the rollups with the dashboard_stats RPC."""
     sb = get_supabase()
+    with metrics.timer("dashboard.stats"):
+        stats = sb.rpc("dashboard_stats", {"p_business_id": business_id}).execute().data or {}
+
+    return {
+        "total_orders": stats.get("total_orders", 0),
+        "total_customers": stats.get("total_customers", 0),
+        "total_conversations": stats.get("total_conversations", 0),
+        "total_products": stats.get("total_products", 0),
+        "total_revenue": float(stats.get("total_revenue") or 0),
+        "order_status_breakdown": stats.get("order_status_breakdown") or {},
+        "today_orders": stats.get("today_orders", 0),
+        "today_revenue": float(stats.get("today_revenue") or 0),
+    }
 
-    # Total orders
-    orders_result = sb.table("orders").select("id, status, total, created_at").eq("business_id", business_id).execute()
-    orders = orders_result.data or []
-
-    # Unique customers
-    customers_result = (
-        sb.table("orders")
-        .select("customer_phone")
-        .eq("business_id", business_id)
-        .execute()
-    )
-    unique_phones = set(c["customer_phone"] for c in (customers_result.data or []))
-
-    # Conversations
-    convos_result = (
-        sb.table("conversations")
-        .select("id")
-        .eq("business_id", business_id)
-        .execute()
-    )
-
-    # Products count
-    products_result = (
-        sb.table("products")
-        .select("id")
-        .eq("business_id", business_id)
-        .execute()
-    )
-
-    # Daily stats
-    from datetime import datetime
-    today = datetime.utcnow().date()
-    today_orders = [o for o in orders if datetime.fromisoformat(o["created_at"].replace('Z', '+00:00')).date() == today]
-    today_count = len(today_orders)
-    today_revenue = sum(float(o.get("total") or 0) for o in today_orders)
-    
-    # Calculate total revenue
-    total_revenue = sum(float(o.get("total") or 0) for o in orders)
-
-    # Calculate status breakdown
-    status_counts = {}
-    for o in orders:
-        s = o.get("status", "unknown")
-        status_counts[s] = status_counts.get(s, 0) + 1
+
+def get_sales_analytics(business_id: str, start: datetime, end: datetime, bucket: str = "day", top: int = 5) -> dict:
+    """Revenue, order count and top products per day/week/month in [start, end).
+
+    Aggregated by the sales_analytics RPC, so only one row per bucket leaves
+    the database. Raises ValueError for an unknown bucket or a bad range.
+    """
+    if bucket not in ANALYTICS_BUCKETS:
+        raise ValueError(f"bucket must be one of {sorted(ANALYTICS_BUCKETS)}")
+    if end <= start:
+        raise ValueError("'to' must be after 'from'")
+    if (end - start).days / ANALYTICS_BUCKETS[bucket] > ANALYTICS_MAX_BUCKETS:
+        raise ValueError(f"Range too long for {bucket} buckets (max {ANALYTICS_MAX_BUCKETS})")
+
+    sb = get_supabase()
+    with metrics.timer("orders.analytics"):
+        result = sb.rpc("sales_analytics", {
+            "p_business_id": business_id,
+            "p_from": start.isoformat(),
+            "p_to": end.isoformat(),
+            "p_bucket": bucket,
+            "p_top": max(1, min(top, 50)),
+        }).execute().data or {}
+
+    def products(rows):
+        return [
+            {"product": r["product"], "quantity": float(r["quantity"]), "revenue": float(r["revenue"])}
+            for r in rows or []
+        ]
 
     return {
-        "total_orders": len(orders),
-        "total_customers": len(unique_phones),
-        "total_conversations": len(convos_result.data or []),
-        "total_products": len(products_result.data or []),
-        "total_revenue": total_revenue,
-        "order_status_breakdown": status_counts,
-        "today_orders": today_count,
-        "today_revenue": today_revenue,
+        "bucket": bucket,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total_orders": result.get("orders", 0),
+        "total_revenue": float(result.get("revenue") or 0),
+        "series": [
+            {
+                "period": row["period"],
+                "orders": row["orders"],
+                "revenue": float(row["revenue"] or 0),
+                "top_products": products(row.get("top_products")),
+            }
+            for row in result.get("series") or []
+        ],
+        "top_products": products(result.get("top_products")),
     }
@@ -0,0 +1,59 @@
+import base64
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: str, row_id) -> str:
+    """Opaque cursor pointing just past a row in (created_at DESC, id DESC) order."""
+    raw = f"{created_at}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(created_at, id) from a cursor; raises ValueError if it was not made by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|", 1)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not created_at or not row_id:
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def parse_limit(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Page size from a query-string value, clamped to 1..MAX_PAGE_SIZE."""
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, limit: int, cursor: str = None, time_column: str = "created_at"):
+    """Apply newest-first keyset pagination to a PostgREST query builder.
+
+    Orders by (time_column DESC, id DESC) and, after a cursor, keeps only rows
+    strictly older than it, so each page is an index range scan no matter how
+    deep it is. One extra row is fetched to tell whether another page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Quoted: timestamps contain reserved characters (':', '.', '+')
+        query = query.or_(
+            f'{time_column}.lt."{created_at}",'
+            f'and({time_column}.eq."{created_at}",id.lt."{row_id}")'
+        )
+    return query.order(time_column, desc=True).order("id", desc=True).limit(limit + 1)
+
+
+def page_result(rows: list, limit: int, time_column: str = "created_at") -> tuple:
+    """(rows of this page, next cursor or None) from a keyset_page() result."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[time_column], last["id"])
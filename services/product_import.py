@@ -0,0 +1,236 @@
+import csv
+import io
+import json
+import math
+from config import Config
+from supabase_client import get_supabase
+from services import metrics, search_index, vector_index
+from services.inventory_service import PG_INT_MAX
+
+# Columns an import row may set, besides the category name
+IMPORT_COLUMNS = ["name", "description", "price", "image_urls", "in_stock", "stock_quantity"]
+TRUE_VALUES = {"true", "yes", "y", "1"}
+FALSE_VALUES = {"false", "no", "n", "0"}
+# Category of new products imported without one
+DEFAULT_CATEGORY = "General"
+# products.price is NUMERIC(10, 2)
+MAX_PRICE = 10 ** 8 - 0.01
+
+
+def iter_rows(stream, fmt: str):
+    """Yield (row_number, dict) from a binary CSV or JSONL stream without reading it all.
+
+    Rows that cannot be parsed are yielded as (row_number, ValueError).
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, {(k or "").strip().lower(): v for k, v in row.items() if k}
+            return
+
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e.msg}")
+                continue
+            if not isinstance(row, dict):
+                yield row_number, ValueError("Each line must be a JSON object")
+                continue
+            yield row_number, {str(k).strip().lower(): v for k, v in row.items()}
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_product_row(row: dict) -> tuple:
+    """(category name or None, product columns) from an import row; raises ValueError if invalid.
+
+    Only columns present in the row are returned, so an upsert leaves the
+    others untouched on existing products.
+    """
+    name = row.get("name")
+    if _blank(name):
+        raise ValueError("name is required")
+    product = {"name": str(name).strip()}
+
+    if "description" in row:
+        product["description"] = "" if _blank(row["description"]) else str(row["description"]).strip()
+    if "price" in row:
+        if _blank(row["price"]):
+            product["price"] = None
+        else:
+            try:
+                price = round(float(str(row["price"]).replace(",", "").replace("₹", "")), 2)
+            except ValueError:
+                raise ValueError(f"price is not a number: {row['price']!r}")
+            # Checked per row: a value Postgres rejects would fail every row upserted with it
+            if not math.isfinite(price) or not 0 <= price <= MAX_PRICE:
+                raise ValueError(f"price must be between 0 and {MAX_PRICE:,.2f}: {row['price']!r}")
+            product["price"] = price
+    if "stock_quantity" in row and not _blank(row["stock_quantity"]):
+        try:
+            stock = int(float(row["stock_quantity"]))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"stock_quantity is not a number: {row['stock_quantity']!r}")
+        if not 0 <= stock <= PG_INT_MAX:
+            raise ValueError(f"stock_quantity must be between 0 and {PG_INT_MAX}: {row['stock_quantity']!r}")
+        product["stock_quantity"] = stock
+    if "in_stock" in row and not _blank(row["in_stock"]):
+        value = row["in_stock"]
+        if isinstance(value, bool):
+            product["in_stock"] = value
+        elif str(value).strip().lower() in TRUE_VALUES:
+            product["in_stock"] = True
+        elif str(value).strip().lower() in FALSE_VALUES:
+            product["in_stock"] = False
+        else:
+            raise ValueError(f"in_stock must be true/false: {value!r}")
+    if "image_urls" in row:
+        urls = row["image_urls"]
+        if isinstance(urls, str):
+            urls = [u.strip() for u in urls.split("|")]
+        elif not isinstance(urls, list):
+            raise ValueError("image_urls must be a list or '|'-separated string")
+        product["image_urls"] = [u for u in urls if u]
+
+    # None leaves an existing product's category alone (see _flush)
+    category = row.get("category")
+    category = None if _blank(category) else str(category).strip()
+    return category, product
+
+
+def _ensure_categories(sb, business_id: str, names: set, categories: dict) -> list:
+    """Create the categories in names that don't exist yet, in one insert. Returns created names."""
+    missing = {}
+    for name in names:
+        if name.lower() not in categories:
+            missing.setdefault(name.lower(), name)
+    if not missing:
+        return []
+    result = sb.table("categories").insert(
+        [{"business_id": business_id, "name": name} for name in missing.values()]
+    ).execute()
+    for category in result.data or []:
+        categories[category["name"].lower()] = category["id"]
+    return list(missing.values())
+
+
+def _flush(sb, business_id: str, batch: list, categories: dict, report: dict):
+    """Upsert one batch of (row_number, category, product) on (business_id, name)."""
+    # Rows without a category keep an existing product's category; only new
+    # products are filed under DEFAULT_CATEGORY
+    uncategorized = {product["name"] for _, category, product in batch if category is None}
+    try:
+        existing = set()
+        if uncategorized:
+            result = (
+                sb.table("products").select("name")
+                .eq("business_id", business_id).in_("name", list(uncategorized))
+                .execute()
+            )
+            existing = {p["name"] for p in result.data or []}
+        names = {category for _, category, _ in batch if category is not None}
+        if uncategorized - existing:
+            names.add(DEFAULT_CATEGORY)
+        report["categories_created"].extend(_ensure_categories(sb, business_id, names, categories))
+    except Exception as e:
+        for row_number, _, _ in batch:
+            _add_error(report, row_number, f"Category creation failed: {e}")
+        return
+
+    # Later rows win when a batch names the same product twice (Postgres
+    # rejects an upsert that touches one row twice)
+    latest = {}
+    superseded = []
+    for row_number, category, product in batch:
+        product = dict(product, business_id=business_id)
+        if category is None and product["name"] not in existing:
+            category = DEFAULT_CATEGORY
+        if category is not None:
+            product["category_id"] = categories[category.lower()]
+        if product["name"] in latest:
+            superseded.append((latest[product["name"]][0], row_number))
+        latest[product["name"]] = (row_number, product)
+    for row_number, by_row in superseded:
+        report["superseded"] += 1
+        if len(report["errors"]) < Config.IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row_number, "error": f"superseded by row {by_row}"})
+
+    # Rows with the same columns go in one request; omitted columns keep their
+    # current value on existing products and the default on new ones
+    groups = {}
+    for row_number, product in latest.values():
+        groups.setdefault(tuple(sorted(product)), []).append((row_number, product))
+
+    for rows in groups.values():
+        try:
+            with metrics.timer("import.upsert"):
+                sb.table("products").upsert(
+                    [product for _, product in rows],
+                    on_conflict="business_id,name",
+                    returning="minimal",
+                ).execute()
+            report["imported"] += len(rows)
+        except Exception as e:
+            for row_number, _ in rows:
+                _add_error(report, row_number, f"Upsert failed: {e}")
+
+
+def _add_error(report: dict, row_number: int, error: str):
+    report["failed"] += 1
+    if len(report["errors"]) < Config.IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": row_number, "error": error})
+
+
+def import_products(business_id: str, stream, fmt: str = "csv", batch_size: int = None) -> dict:
+    """Stream-import products from CSV or JSONL, upserting by name in batches.
+
+    Columns: name (required), category ("General" for new products; existing
+    ones keep theirs when blank or absent), description,
+    price, stock_quantity, in_stock, image_urls ('|'-separated in CSV).
+    Missing categories are created on the fly. Returns counts plus per-row
+    errors; a row naming the same product as a later row in its batch is
+    counted as superseded rather than imported.
+    """
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError("format must be csv or jsonl")
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+
+    sb = get_supabase()
+    existing = sb.table("categories").select("id, name").eq("business_id", business_id).execute()
+    categories = {c["name"].lower(): c["id"] for c in existing.data or []}
+
+    report = {"rows": 0, "imported": 0, "failed": 0, "superseded": 0, "categories_created": [], "errors": []}
+    batch = []
+    with metrics.timer("import.total"):
+        for row_number, row in iter_rows(stream, fmt):
+            report["rows"] += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                category, product = parse_product_row(row)
+            except ValueError as e:
+                _add_error(report, row_number, str(e))
+                continue
+            batch.append((row_number, category, product))
+            if len(batch) >= batch_size:
+                _flush(sb, business_id, batch, categories, report)
+                batch = []
+        if batch:
+            _flush(sb, business_id, batch, categories, report)
+
+    # Rebuilt from the database on next use
+    search_index.forget(business_id)
+    vector_index.forget(business_id)
+    metrics.incr("import.rows", report["rows"])
+    print(f"[Import] {business_id}: {report['imported']}/{report['rows']} rows imported, {report['failed']} failed, {report['superseded']} superseded")
+    return report
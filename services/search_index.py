@@ -0,0 +1,320 @@
+import threading
+import time
+from config import Config
+from services import metrics
+from services.index_registry import IndexRegistry, RebuildableIndex, journaled
+from services.language_service import char_trigrams, normalize_search_text, search_synonyms
+
+# A product word counts as a fuzzy match for a query word at this trigram similarity
+FUZZY_MIN_SIMILARITY = 0.5
+# ...and a product is a fuzzy hit when its average best match over query words reaches this
+FUZZY_MIN_SCORE = 0.5
+
+
+def searchable_fields(product: dict) -> tuple:
+    """Lowercased (name, description, searchable) strings used for scoring."""
+    name_lower = (product.get("name") or "").lower()
+    desc_lower = (product.get("description") or "").lower()
+    cat_name = ""
+    if product.get("categories"):
+        cat_name = (product["categories"].get("name") or "").lower()
+    return name_lower, desc_lower, f"{name_lower} {desc_lower} {cat_name}"
+
+
+def fuzzy_forms(product: dict) -> set:
+    """Normalized (transliterated, phonetically folded) words of a product's name and category."""
+    cat_name = (product.get("categories") or {}).get("name") or ""
+    return set(normalize_search_text(f"{product.get('name') or ''} {cat_name}"))
+
+
+def score_product(query_lower: str, query_words: list, name_lower: str, desc_lower: str, searchable: str) -> int:
+    """Relevance score of one product for a query (0 = no match).
+
+    This is the reference scoring rule; ProductIndex.search reproduces it from postings.
+    """
+    score = 0
+
+    # Exact match in name
+    if query_lower in name_lower:
+        score += 10
+    # Exact match in description
+    if query_lower in desc_lower:
+        score += 5
+    # Word matches
+    for word in query_words:
+        if word in searchable:
+            score += 3
+        # Partial match (at least 3 chars)
+        elif len(word) >= 3:
+            for s_word in searchable.split():
+                if word in s_word or s_word in word:
+                    score += 1
+    return score
+
+
+def _trigrams(token: str) -> set:
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class ProductIndex(RebuildableIndex):
+    """In-memory token index over one business's catalog.
+
+    Postings map each whitespace token of a product's searchable text to the
+    products containing it (with occurrence counts), and a trigram index over
+    the token vocabulary finds the tokens containing a query word. Scores are
+    accumulated from postings with the same rules as score_product, so the
+    results match a full scan without touching non-matching products.
+
+    A second, fuzzy index holds the normalized forms of each product's name
+    and category words (see language_service.normalize_search_text) with a
+    character-trigram index over them, so "थाली", "thaali" and "plate" all
+    reach a product called "Steel Thali". Fuzzy-only hits are appended after
+    the keyword results.
+    """
+
+    def __init__(self, products: list = None):
+        self._lock = threading.RLock()
+        self._products = {}
+        self._fields = {}
+        self._position = {}
+        self._next_position = 0
+        self._postings = {}
+        self._vocab_trigrams = {}
+        self._fuzzy_forms = {}
+        self._fuzzy_postings = {}
+        self._fuzzy_trigrams = {}
+        self._form_trigrams = {}
+        self.loaded_at = time.monotonic()
+        for product in products or []:
+            self.add(product)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __contains__(self, product_id) -> bool:
+        return product_id in self._products
+
+    @journaled
+    def add(self, product: dict):
+        with self._lock:
+            product_id = product["id"]
+            if product_id in self._products:
+                self._remove_postings(product_id)
+            else:
+                self._position[product_id] = self._next_position
+                self._next_position += 1
+
+            name_lower, desc_lower, searchable = searchable_fields(product)
+            tokens = searchable.split()
+            self._products[product_id] = product
+            self._fields[product_id] = (name_lower, desc_lower, searchable, tokens)
+
+            for token in tokens:
+                counts = self._postings.get(token)
+                if counts is None:
+                    counts = self._postings[token] = {}
+                    for gram in _trigrams(token):
+                        self._vocab_trigrams.setdefault(gram, set()).add(token)
+                counts[product_id] = counts.get(product_id, 0) + 1
+
+            forms = fuzzy_forms(product)
+            self._fuzzy_forms[product_id] = forms
+            for form in forms:
+                holders = self._fuzzy_postings.get(form)
+                if holders is None:
+                    holders = self._fuzzy_postings[form] = set()
+                    grams = self._form_trigrams[form] = char_trigrams(form)
+                    for gram in grams:
+                        self._fuzzy_trigrams.setdefault(gram, set()).add(form)
+                holders.add(product_id)
+
+    @journaled
+    def patch(self, product_id, fields: dict):
+        """Update non-searchable fields (price, stock...) of an indexed product in place."""
+        with self._lock:
+            if product_id in self._products:
+                self._products[product_id] = {**self._products[product_id], **fields}
+
+    @journaled
+    def remove(self, product_id):
+        with self._lock:
+            if product_id not in self._products:
+                return
+            self._remove_postings(product_id)
+            del self._products[product_id]
+            del self._fields[product_id]
+            del self._fuzzy_forms[product_id]
+            del self._position[product_id]
+
+    def remove_where(self, predicate):
+        with self._lock:
+            for product_id in [pid for pid, p in self._products.items() if predicate(p)]:
+                self.remove(product_id)
+
+    def _remove_postings(self, product_id):
+        for token in set(self._fields[product_id][3]):
+            counts = self._postings.get(token)
+            if counts is None:
+                continue
+            counts.pop(product_id, None)
+            if not counts:
+                del self._postings[token]
+                for gram in _trigrams(token):
+                    tokens = self._vocab_trigrams.get(gram)
+                    if tokens is not None:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._vocab_trigrams[gram]
+
+        for form in self._fuzzy_forms[product_id]:
+            holders = self._fuzzy_postings.get(form)
+            if holders is None:
+                continue
+            holders.discard(product_id)
+            if not holders:
+                del self._fuzzy_postings[form]
+                for gram in self._form_trigrams.pop(form):
+                    forms = self._fuzzy_trigrams.get(gram)
+                    if forms is not None:
+                        forms.discard(form)
+                        if not forms:
+                            del self._fuzzy_trigrams[gram]
+
+    def all_products(self) -> list:
+        with self._lock:
+            return sorted(self._products.values(), key=lambda p: self._position[p["id"]])
+
+    def _tokens_containing(self, word: str):
+        if len(word) < 3:
+            return [t for t in self._postings if word in t]
+        grams = sorted((self._vocab_trigrams.get(g, ()) for g in _trigrams(word)), key=len)
+        if not grams[0]:
+            return []
+        candidates = set(grams[0]).intersection(*grams[1:])
+        return [t for t in candidates if word in t]
+
+    def _tokens_inside(self, word: str):
+        found = set()
+        for start in range(len(word)):
+            for end in range(start + 1, len(word) + 1):
+                if word[start:end] in self._postings:
+                    found.add(word[start:end])
+        return found
+
+    def search(self, query: str) -> list:
+        """Keyword matches ranked by score, followed by fuzzy-only matches by similarity."""
+        if not query:
+            return self.all_products()
+
+        results = self.keyword_search(query)
+        seen = {p["id"] for p in results}
+        with metrics.timer("search.fuzzy"):
+            results.extend(p for p in self.fuzzy_search(query) if p["id"] not in seen)
+        return results
+
+    def keyword_search(self, query: str) -> list:
+        """Products scored exactly like score_product, best first."""
+        query_lower = query.lower().strip()
+        query_words = query_lower.split()
+
+        with self._lock:
+            scores = {}
+            # Products where every word occurs; only these can contain the whole query
+            in_all = None
+            for word in query_words:
+                containing = self._tokens_containing(word)
+                hit = set()
+                for token in containing:
+                    hit.update(self._postings[token])
+                for product_id in hit:
+                    scores[product_id] = scores.get(product_id, 0) + 3
+                in_all = hit if in_all is None else in_all & hit
+
+                # Partial match: tokens that are substrings of the word, counted
+                # per occurrence, for products where the word itself did not occur
+                if len(word) >= 3:
+                    for token in self._tokens_inside(word):
+                        for product_id, count in self._postings[token].items():
+                            if product_id not in hit:
+                                scores[product_id] = scores.get(product_id, 0) + count
+
+            for product_id in in_all or ():
+                name_lower, desc_lower = self._fields[product_id][:2]
+                if query_lower in name_lower:
+                    scores[product_id] += 10
+                if query_lower in desc_lower:
+                    scores[product_id] += 5
+
+            position = self._position
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], position[item[0]]))
+            return [self._products[product_id] for product_id, _ in ranked]
+
+    def _similar_forms(self, word: str) -> dict:
+        """Indexed forms within FUZZY_MIN_SIMILARITY of a normalized word, with their similarity."""
+        grams = char_trigrams(word)
+        shared = {}
+        for gram in grams:
+            for form in self._fuzzy_trigrams.get(gram, ()):
+                shared[form] = shared.get(form, 0) + 1
+        similar = {}
+        for form, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(self._form_trigrams[form]))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                similar[form] = similarity
+        return similar
+
+    def fuzzy_search(self, query: str) -> list:
+        """Products whose normalized name/category words resemble the query's, best first.
+
+        Each query word scores a product by its closest form (trigram
+        similarity, across the word's synonyms); the product's score is the
+        mean over query words.
+        """
+        words = normalize_search_text(query)
+        if not words:
+            return []
+
+        with self._lock:
+            totals = {}
+            for word in words:
+                best = {}
+                for variant in search_synonyms(word):
+                    for form, similarity in self._similar_forms(variant).items():
+                        for product_id in self._fuzzy_postings[form]:
+                            if similarity > best.get(product_id, 0):
+                                best[product_id] = similarity
+                for product_id, similarity in best.items():
+                    totals[product_id] = totals.get(product_id, 0) + similarity
+
+            position = self._position
+            ranked = sorted(
+                ((product_id, total / len(words)) for product_id, total in totals.items()),
+                key=lambda item: (-item[1], position[item[0]]),
+            )
+            return [self._products[product_id] for product_id, score in ranked if score >= FUZZY_MIN_SCORE]
+
+
+_indexes = IndexRegistry("search_index", ProductIndex, Config.SEARCH_INDEX_MAX_BUSINESSES)
+
+
+def get_index(business_id: str, loader) -> ProductIndex:
+    """The business's index, built with loader() when missing and rebuilt in the background once older than the TTL.
+
+    Writes made in this process update the index in place; the TTL bounds how
+    long writes from other worker processes take to show up.
+    """
+    return _indexes.get(business_id, loader)
+
+
+def loaded_index(business_id: str) -> ProductIndex:
+    """The business's index if this process has one, without loading it."""
+    return _indexes.loaded(business_id)
+
+
+def loaded_indexes() -> list:
+    return _indexes.all()
+
+
+def forget(business_id: str):
+    """Drop the business's index so the next search reloads it (e.g. after a bulk import)."""
+    _indexes.forget(business_id)
@@ -0,0 +1,180 @@
+import fcntl
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+import requests
+from config import Config
+from supabase_client import get_supabase
+from services import image_service, metrics
+
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+COPY_BLOCK = 64 * 1024
+_TOO_LARGE = f"File too large (max {Config.UPLOAD_MAX_BYTES} bytes)"
+
+
+# ---- Direct-to-storage uploads ----
+
+def create_signed_upload(business_id: str, filename: str) -> dict:
+    """Issue a signed URL the client PUTs the original file to, bypassing Flask.
+
+    The object lands under {business_id}/incoming/; complete_signed_upload
+    turns it into product image variants.
+    """
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "jpg"
+    path = f"{business_id}/incoming/{uuid.uuid4().hex}.{re.sub(r'[^a-z0-9]', '', ext)[:5] or 'jpg'}"
+    signed = get_supabase().storage.from_(image_service.BUCKET).create_signed_upload_url(path)
+    metrics.incr("uploads.signed")
+    return {"path": path, "signed_url": signed["signed_url"], "token": signed["token"]}
+
+
+def _download_to_file(path: str) -> str:
+    """Stream a stored object to a temp file (never whole in memory) and return its path."""
+    storage = get_supabase().storage.from_(image_service.BUCKET)
+    signed = storage.create_signed_url(path, 60)
+    url = signed.get("signedURL") or signed.get("signedUrl")
+    fd, local_path = tempfile.mkstemp(prefix="upload-", dir=_spool_dir())
+    try:
+        with requests.get(url, stream=True, timeout=30) as response, os.fdopen(fd, "wb") as out:
+            response.raise_for_status()
+            # The signed URL cannot limit what the client PUT, so check before reading it all
+            if int(response.headers.get("Content-Length") or 0) > Config.UPLOAD_MAX_BYTES:
+                raise ValueError(_TOO_LARGE)
+            _copy_limited(response.iter_content(COPY_BLOCK), out)
+    except Exception:
+        os.remove(local_path)
+        raise
+    return local_path
+
+
+def _copy_limited(blocks, out):
+    """Write blocks to out, raising ValueError once more than UPLOAD_MAX_BYTES arrive."""
+    for block in blocks:
+        out.write(block)
+        if out.tell() > Config.UPLOAD_MAX_BYTES:
+            metrics.incr("uploads.too_large")
+            raise ValueError(_TOO_LARGE)
+
+
+def complete_signed_upload(business_id: str, path: str) -> dict:
+    """Completion callback for a direct upload: build the variants and drop the original."""
+    if not path.startswith(f"{business_id}/incoming/") or ".." in path:
+        raise ValueError("Unknown upload path")
+    try:
+        # Rejected or not, the original is not kept
+        local_path = _download_to_file(path)
+        result = image_service.store_image(business_id, local_path, delete_after=True)
+    finally:
+        try:
+            get_supabase().storage.from_(image_service.BUCKET).remove([path])
+        except Exception as e:
+            print(f"[Uploads] Failed to remove incoming object {path}: {e}")
+    metrics.incr("uploads.completed")
+    return result
+
+
+# ---- Chunked / resumable uploads spooled to disk ----
+
+def _spool_dir() -> str:
+    os.makedirs(Config.UPLOAD_SPOOL_DIR, exist_ok=True)
+    return Config.UPLOAD_SPOOL_DIR
+
+
+def _paths(upload_id: str) -> tuple:
+    if not UPLOAD_ID_RE.match(upload_id or ""):
+        raise KeyError(upload_id)
+    base = os.path.join(_spool_dir(), upload_id)
+    return f"{base}.part", f"{base}.json"
+
+
+def _purge_stale():
+    cutoff = time.time() - Config.UPLOAD_SPOOL_TTL
+    for name in os.listdir(_spool_dir()):
+        path = os.path.join(_spool_dir(), name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def start_chunked_upload(business_id: str, total_size: int) -> dict:
+    """Open a resumable upload of total_size bytes; returns its id."""
+    if total_size <= 0 or total_size > Config.UPLOAD_MAX_BYTES:
+        raise ValueError(f"size must be between 1 and {Config.UPLOAD_MAX_BYTES} bytes")
+    _purge_stale()
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _paths(upload_id)
+    with open(meta_path, "w") as f:
+        json.dump({"business_id": business_id, "total": total_size}, f)
+    open(part_path, "wb").close()
+    return {"upload_id": upload_id, "offset": 0, "total": total_size}
+
+
+def chunked_upload_status(upload_id: str) -> dict:
+    """Bytes received so far, so an interrupted client knows where to resume. Raises KeyError."""
+    part_path, meta_path = _paths(upload_id)
+    if not os.path.exists(meta_path):
+        raise KeyError(upload_id)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return {"upload_id": upload_id, "offset": os.path.getsize(part_path), "total": meta["total"]}
+
+
+def write_chunk(upload_id: str, offset: int, stream, length: int) -> dict:
+    """Append one chunk (read from stream in small blocks) at offset.
+
+    The offset must equal the bytes already received; otherwise the current
+    status is returned with conflict=True so the client can resume from it.
+    Once the last byte arrives the file is turned into image variants and
+    the result is returned under "image".
+    """
+    status = chunked_upload_status(upload_id)
+    part_path, meta_path = _paths(upload_id)
+    if length <= 0 or offset + length > status["total"]:
+        raise ValueError("Chunk exceeds the declared upload size")
+
+    with open(part_path, "r+b") as f:
+        # Serialize writers to the same upload, across worker processes too
+        fcntl.flock(f, fcntl.LOCK_EX)
+        size = os.fstat(f.fileno()).st_size
+        if offset != size:
+            return {**status, "offset": size, "conflict": True}
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            block = stream.read(min(COPY_BLOCK, remaining))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+        f.flush()
+        received = f.tell()
+        if remaining:
+            # Client went away mid-chunk: keep what arrived, it can resume from here
+            return {**status, "offset": received, "conflict": False}
+
+    metrics.incr("uploads.chunks")
+    if received < status["total"]:
+        return {**status, "offset": received, "conflict": False}
+
+    with open(meta_path) as f:
+        business_id = json.load(f)["business_id"]
+    os.remove(meta_path)
+    image = image_service.store_image(business_id, part_path, delete_after=True)
+    metrics.incr("uploads.completed")
+    return {**status, "offset": received, "conflict": False, "image": image}
+
+
+def store_uploaded_file(business_id: str, file) -> dict:
+    """Classic multipart upload: spool the werkzeug file to disk and process it from there."""
+    fd, local_path = tempfile.mkstemp(prefix="upload-", dir=_spool_dir())
+    try:
+        with os.fdopen(fd, "wb") as out:
+            _copy_limited(iter(lambda: file.stream.read(COPY_BLOCK), b""), out)
+    except Exception:
+        os.remove(local_path)
+        raise
+    return image_service.store_image(business_id, local_path, delete_after=True)
@@ -0,0 +1,138 @@
+import threading
+import time
+import numpy as np
+from config import Config
+from services import embeddings
+from services.index_registry import IndexRegistry, RebuildableIndex, journaled
+
+
+def product_text(product: dict) -> str:
+    """The text a product is embedded from: name, category and description."""
+    cat_name = (product.get("categories") or {}).get("name") or ""
+    return " ".join(filter(None, [product.get("name"), cat_name, product.get("description")]))
+
+
+class VectorIndex(RebuildableIndex):
+    """Product embeddings of one business in a contiguous float32 matrix.
+
+    Rows are unit length, so a query is one matrix-vector product followed by
+    argpartition for the top k. Removing a product moves the last row into its
+    slot, keeping rows 0..n-1 dense; capacity grows by doubling.
+    """
+
+    def __init__(self, products: list = None, dim: int = None):
+        self._lock = threading.RLock()
+        self.dim = dim or Config.EMBEDDING_DIM
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._ids = []
+        self._rows = {}
+        self._products = {}
+        self.loaded_at = time.monotonic()
+        if products:
+            self._add_many(products)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, product_id) -> bool:
+        return product_id in self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the embedding matrix (including spare capacity)."""
+        return self._matrix.nbytes
+
+    def _reserve(self, rows: int):
+        if rows <= self._matrix.shape[0]:
+            return
+        capacity = max(rows, 2 * self._matrix.shape[0], 64)
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:len(self._ids)] = self._matrix[:len(self._ids)]
+        self._matrix = grown
+
+    def _add_many(self, products: list):
+        vectors = embeddings.embed_documents([product_text(p) for p in products])
+        with self._lock:
+            self._reserve(len(self._ids) + len(products))
+            for product, vector in zip(products, vectors):
+                row = self._rows.get(product["id"])
+                if row is None:
+                    row = self._rows[product["id"]] = len(self._ids)
+                    self._ids.append(product["id"])
+                self._matrix[row] = vector
+                self._products[product["id"]] = product
+
+    @journaled
+    def add(self, product: dict):
+        """Insert or re-embed one product."""
+        self._add_many([product])
+
+    @journaled
+    def patch(self, product_id, fields: dict):
+        """Update fields that are not embedded (price, stock...) without re-embedding."""
+        with self._lock:
+            if product_id in self._products:
+                self._products[product_id] = {**self._products[product_id], **fields}
+
+    @journaled
+    def remove(self, product_id):
+        with self._lock:
+            row = self._rows.pop(product_id, None)
+            if row is None:
+                return
+            del self._products[product_id]
+            last = len(self._ids) - 1
+            if row != last:
+                moved = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+
+    def remove_where(self, predicate):
+        with self._lock:
+            for product_id in [pid for pid, p in self._products.items() if predicate(p)]:
+                self.remove(product_id)
+
+    def search(self, query_vector: np.ndarray, k: int = 10, min_score: float = 0.0) -> list:
+        """Top-k (product, cosine similarity) pairs, best first."""
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or k <= 0:
+                return []
+            scores = self._matrix[:n] @ query_vector
+            if k < n:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(n)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                (self._products[self._ids[row]], float(scores[row]))
+                for row in top
+                if scores[row] >= min_score
+            ]
+
+
+_indexes = IndexRegistry("vector_index", VectorIndex, Config.SEARCH_INDEX_MAX_BUSINESSES)
+
+
+def get_index(business_id: str, loader) -> VectorIndex:
+    """The business's vector index, built with loader() when missing and rebuilt in the background once older than SEARCH_INDEX_TTL.
+
+    Rebuilds only embed products whose text changed, thanks to the embedding cache.
+    """
+    return _indexes.get(business_id, loader)
+
+
+def loaded_index(business_id: str) -> VectorIndex:
+    """The business's vector index if this process has one, without loading it."""
+    return _indexes.loaded(business_id)
+
+
+def loaded_indexes() -> list:
+    return _indexes.all()
+
+
+def forget(business_id: str):
+    """Drop the business's vector index so the next search reloads it (e.g. after a bulk import)."""
+    _indexes.forget(business_id)
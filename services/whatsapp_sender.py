@@ -0,0 +1,399 @@
+import heapq
+import itertools
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from services import business_cache, metrics
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0
+# Outbox rows whose owner has not refreshed its claim for this long belong to
+# a process that died before sending them
+OUTBOX_CLAIM_TIMEOUT = 300
+# This process's claim on the outbox rows it holds in memory
+_owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+# One keep-alive pool to graph.facebook.com shared by every sender thread
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=Config.WHATSAPP_SEND_POOL_SIZE))
+_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=Config.WHATSAPP_SEND_POOL_SIZE))
+
+# Outbox: one FIFO per (sender number, recipient) so replies arrive in order,
+# and a heap of when each FIFO's head may next be tried. A throttled or
+# failing number is rescheduled rather than slept on, so it never holds a
+# sender thread while other numbers' replies wait.
+_lock = threading.Lock()
+_work = threading.Condition(_lock)
+_room = threading.Condition(_lock)
+_conversations = {}
+_ready = []
+_seq = itertools.count()
+_size = 0
+_senders = []
+_senders_lock = threading.Lock()
+_last_recovery = [0.0]
+_last_heartbeat = [0.0]
+
+_local = threading.local()
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Token bucket: `rate` sends per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take the next token, possibly one not yet refilled; returns how long until it is usable."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            metrics.incr("whatsapp_send.throttled")
+            time.sleep(wait)
+
+
+def _bucket_for(phone_number_id: str) -> TokenBucket:
+    with _buckets_lock:
+        bucket = _buckets.get(phone_number_id)
+        if bucket is None:
+            bucket = _buckets[phone_number_id] = TokenBucket(
+                Config.WHATSAPP_SEND_RATE, Config.WHATSAPP_SEND_BURST
+            )
+        return bucket
+
+
+def _backoff(attempt: int, retry_after: str = None) -> float:
+    if retry_after:
+        try:
+            return min(MAX_BACKOFF, float(retry_after))
+        except ValueError:
+            pass
+    # Full jitter so many senders retrying together don't stampede
+    return random.uniform(0, min(MAX_BACKOFF, 0.5 * 2 ** attempt))
+
+
+def _post(to: str, body: str, phone_number_id: str, access_token: str):
+    url = f"{Config.META_GRAPH_URL}/{phone_number_id}/messages"
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "messaging_product": "whatsapp",
+        "to": to,
+        "type": "text",
+        "text": {"body": body},
+    }
+    with metrics.timer("whatsapp_send.request"):
+        return _session.post(url, json=payload, headers=headers, timeout=10)
+
+
+def send_message(to: str, body: str, phone_number_id: str, access_token: str) -> dict:
+    """Send a text message now, rate limited per sender number and retried on transient errors.
+
+    Blocks the caller through throttling and backoff; the reply path uses
+    enqueue_message instead.
+    """
+    bucket = _bucket_for(phone_number_id)
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            response = _post(to, body, phone_number_id, access_token)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= Config.WHATSAPP_SEND_RETRIES:
+                metrics.incr("whatsapp_send.failed")
+                raise
+            print(f"[Meta API] {e.__class__.__name__} sending to {to}, retrying")
+            time.sleep(_backoff(attempt))
+            attempt += 1
+            metrics.incr("whatsapp_send.retried")
+            continue
+
+        if response.status_code in RETRYABLE_STATUS and attempt < Config.WHATSAPP_SEND_RETRIES:
+            time.sleep(_backoff(attempt, response.headers.get("Retry-After")))
+            attempt += 1
+            metrics.incr("whatsapp_send.retried")
+            continue
+
+        if not response.ok:
+            metrics.incr("whatsapp_send.failed")
+        response.raise_for_status()
+        metrics.incr("whatsapp_send.sent")
+        return response.json()
+
+
+def _send_once(message: dict):
+    """One delivery attempt for an outbox message.
+
+    Returns the delay before it should be tried again, or None once it was
+    sent or given up on.
+    """
+    # A throttled message holds its reserved token and comes back when it is due
+    if not message.pop("reserved", False):
+        wait = _bucket_for(message["phone_number_id"]).reserve()
+        if wait:
+            message["reserved"] = True
+            metrics.incr("whatsapp_send.throttled")
+            return wait
+
+    # Recovered rows carry no token (it is never written to disk)
+    access_token = message.get("access_token")
+    if access_token is None:
+        business = business_cache.get_business_by_phone_number_id(message["phone_number_id"])
+        access_token = (business or {}).get("meta_access_token")
+        if not access_token:
+            metrics.incr("whatsapp_send.failed")
+            print(f"[Meta API Error] No access token for {message['phone_number_id']}, dropping message to {message['to']}")
+            return None
+        message["access_token"] = access_token
+
+    attempt = message.get("attempt", 0)
+    try:
+        response = _post(message["to"], message["body"], message["phone_number_id"], access_token)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if attempt >= Config.WHATSAPP_SEND_RETRIES:
+            metrics.incr("whatsapp_send.failed")
+            print(f"[Meta API Error] Failed to send message to {message['to']}: {e}")
+            return None
+        print(f"[Meta API] {e.__class__.__name__} sending to {message['to']}, retrying")
+        message["attempt"] = attempt + 1
+        metrics.incr("whatsapp_send.retried")
+        return _backoff(attempt)
+
+    if response.status_code in RETRYABLE_STATUS and attempt < Config.WHATSAPP_SEND_RETRIES:
+        message["attempt"] = attempt + 1
+        metrics.incr("whatsapp_send.retried")
+        return _backoff(attempt, response.headers.get("Retry-After"))
+
+    if not response.ok:
+        metrics.incr("whatsapp_send.failed")
+        print(f"[Meta API Error] Failed to send message to {message['to']}: {response.status_code} {response.text[:200]}")
+        return None
+    metrics.incr("whatsapp_send.sent")
+    return None
+
+
+def _connect() -> sqlite3.Connection:
+    """This thread's connection to the durable outbox (in the webhook queue database)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(Config.WEBHOOK_QUEUE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # One writer at a time, so concurrent threads or processes add the column once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    payload TEXT NOT NULL,
+                    claimed_at REAL NOT NULL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+            if "claimed_by" not in columns:
+                conn.execute("ALTER TABLE outbox ADD COLUMN claimed_by TEXT")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _local.conn = conn
+    return conn
+
+
+def _schedule(message: dict):
+    """Add a message to its conversation's FIFO (caller holds _lock)."""
+    global _size
+    key = (message["phone_number_id"], message["to"])
+    pending = _conversations.get(key)
+    if pending is None:
+        pending = _conversations[key] = deque()
+        heapq.heappush(_ready, (time.monotonic(), next(_seq), key))
+        _work.notify()
+    pending.append(message)
+    _size += 1
+    metrics.set_gauge("whatsapp_send.outbox_depth", _size)
+
+
+def _heartbeat():
+    """Refresh this process's claim on the rows it still holds, however long they wait."""
+    now = time.time()
+    _last_heartbeat[0] = now
+    _connect().execute("UPDATE outbox SET claimed_at = ? WHERE claimed_by = ?", (now, _owner))
+
+
+def _recover():
+    """Re-queue outbox rows left unsent by a process that died.
+
+    Live processes refresh their claims every OUTBOX_CLAIM_TIMEOUT / 3
+    seconds, so only rows of a dead (or pre-upgrade) owner go stale.
+    """
+    now = time.time()
+    _last_recovery[0] = now
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            "SELECT id, payload FROM outbox WHERE claimed_at < ? AND claimed_by IS NOT ? ORDER BY id",
+            (now - OUTBOX_CLAIM_TIMEOUT, _owner),
+        ).fetchall()
+        if rows:
+            conn.execute(
+                f"UPDATE outbox SET claimed_at = ?, claimed_by = ? WHERE id IN ({','.join('?' * len(rows))})",
+                (now, _owner, *[r[0] for r in rows]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if rows:
+        print(f"[Meta API] Recovered {len(rows)} unsent message(s) from the outbox")
+        metrics.incr("whatsapp_send.recovered", len(rows))
+        with _lock:
+            for row_id, payload in rows:
+                _schedule({**json.loads(payload), "outbox_id": row_id})
+
+
+def _finish(message: dict):
+    try:
+        _connect().execute("DELETE FROM outbox WHERE id = ?", (message["outbox_id"],))
+    except sqlite3.Error as e:
+        print(f"[Meta API] Failed to clear outbox row {message['outbox_id']}: {e}")
+
+
+def _next_ready():
+    """Block until some conversation's head message is due; return its key (caller holds _lock)."""
+    while True:
+        now = time.monotonic()
+        if _ready and _ready[0][0] <= now:
+            return heapq.heappop(_ready)[2]
+        timeout = _ready[0][0] - now if _ready else OUTBOX_CLAIM_TIMEOUT
+        _work.wait(timeout)
+
+
+def _sender_loop():
+    global _size
+    while True:
+        if time.time() - _last_heartbeat[0] > OUTBOX_CLAIM_TIMEOUT / 3:
+            try:
+                _heartbeat()
+            except sqlite3.Error as e:
+                print(f"[Meta API] Outbox heartbeat failed: {e}")
+        if time.time() - _last_recovery[0] > OUTBOX_CLAIM_TIMEOUT:
+            try:
+                _recover()
+            except sqlite3.Error as e:
+                print(f"[Meta API] Outbox recovery failed: {e}")
+
+        with _lock:
+            key = _next_ready()
+            message = _conversations[key][0]
+
+        try:
+            delay = _send_once(message)
+        except Exception as e:
+            print(f"[Meta API Error] Failed to send message: {e}")
+            delay = None
+        if delay is None:
+            _finish(message)
+
+        with _lock:
+            if delay is not None:
+                heapq.heappush(_ready, (time.monotonic() + delay, next(_seq), key))
+                _work.notify()
+                continue
+            pending = _conversations[key]
+            pending.popleft()
+            _size -= 1
+            metrics.set_gauge("whatsapp_send.outbox_depth", _size)
+            if pending:
+                heapq.heappush(_ready, (time.monotonic(), next(_seq), key))
+                _work.notify()
+            else:
+                del _conversations[key]
+            _room.notify_all()
+
+
+def start_senders():
+    """Start the sender threads once per process.
+
+    They also re-send outbox rows left behind by a crashed process, on start
+    and every OUTBOX_CLAIM_TIMEOUT seconds.
+    """
+    if _senders:
+        return
+    with _senders_lock:
+        if _senders:
+            return
+        for i in range(Config.WHATSAPP_SENDER_THREADS):
+            t = threading.Thread(target=_sender_loop, name=f"whatsapp-sender-{i}", daemon=True)
+            t.start()
+            _senders.append(t)
+
+
+def enqueue_message(to: str, body: str, phone_number_id: str, access_token: str):
+    """Durably hand a message to the outbox; blocks briefly when it is full rather than dropping it.
+
+    The message is written to SQLite before this returns and deleted once
+    sent or given up on, so a crash in between does not lose it. The access
+    token is kept in memory only; a recovered message looks it up again.
+    Raises queue.Full if the outbox stays full for WHATSAPP_OUTBOX_TIMEOUT seconds.
+    """
+    start_senders()
+    message = {
+        "to": to,
+        "body": body,
+        "phone_number_id": phone_number_id,
+        "access_token": access_token,
+    }
+    deadline = time.monotonic() + Config.WHATSAPP_OUTBOX_TIMEOUT
+    with _lock:
+        while _size >= Config.WHATSAPP_OUTBOX_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise queue.Full
+            _room.wait(remaining)
+
+    stored = {k: v for k, v in message.items() if k != "access_token"}
+    cur = _connect().execute(
+        "INSERT INTO outbox (payload, claimed_at, claimed_by) VALUES (?, ?, ?)",
+        (json.dumps(stored), time.time(), _owner),
+    )
+    with _lock:
+        _schedule({**message, "outbox_id": cur.lastrowid})
+
+
+def join(timeout: float = None) -> bool:
+    """Wait until the outbox is empty. Returns False on timeout."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _lock:
+        while _size:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _room.wait(remaining)
+    return True
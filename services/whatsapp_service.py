@@ -1,65 +1,78 @@
 import json
 import re
-import requests
-import google.generativeai as genai
+import time
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
 from supabase_client import get_supabase
 from services.language_service import detect_language, get_language_instruction
-from services.inventory_service import search_products
+from services.inventory_service import (
+    search_products,
+    retrieve_relevant_products,
+    summarize_categories,
+    format_product_line,
+)
 from services.order_service import create_order
+from services import business_cache, message_queue, metrics, whatsapp_sender
+from services.gemini_models import get_model, estimate_tokens
+from services.history_service import build_history, history_tokens, schedule_summary_refresh
+from services.fast_path import try_fast_reply
 
-genai.configure(api_key=Config.GEMINI_API_KEY)
-
-META_GRAPH_URL = "https://graph.facebook.com/v19.0"
+# Shared pool for fanning out the independent reads a message needs
+_context_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="message-context")
 
 
 def send_whatsapp_message(to: str, body: str, phone_number_id: str, access_token: str) -> dict:
     """Send a WhatsApp message via Meta Cloud API."""
-    url = f"{META_GRAPH_URL}/{phone_number_id}/messages"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": to,
-        "type": "text",
-        "text": {"body": body},
-    }
-    response = requests.post(url, json=payload, headers=headers, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    return whatsapp_sender.send_message(to, body, phone_number_id, access_token)
+
+
+# Upper bound on messages loaded per turn; the token budget trims further
+HISTORY_WINDOW = Config.HISTORY_FETCH_LIMIT
+
+CONVERSATION_COLUMNS = (
+    "id, business_id, customer_phone, language, last_message_at, created_at, "
+    "summary, summary_message_id"
+)
 
 
 def get_or_create_conversation(business_id: str, customer_phone: str) -> dict:
-    """Get existing conversation or create a new one."""
+    """Get existing conversation (with its last HISTORY_WINDOW messages) or create a new one."""
     sb = get_supabase()
     result = (
         sb.table("conversations")
-        .select("*")
+        .select(f"{CONVERSATION_COLUMNS}, conversation_messages(role, content, id)")
         .eq("business_id", business_id)
         .eq("customer_phone", customer_phone)
+        .order("id", desc=True, foreign_table="conversation_messages")
+        .limit(HISTORY_WINDOW, foreign_table="conversation_messages")
         .execute()
     )
 
     if result.data:
-        return result.data[0]
+        convo = result.data[0]
+        recent = convo.pop("conversation_messages", None) or []
+        convo["messages"] = list(reversed(recent))
+        return convo
 
     new_convo = {
         "business_id": business_id,
         "customer_phone": customer_phone,
-        "messages": [],
         "language": "English",
     }
     result = sb.table("conversations").insert(new_convo).execute()
-    return result.data[0] if result.data else new_convo
+    convo = result.data[0] if result.data else new_convo
+    convo["messages"] = []
+    return convo
 
 
-def update_conversation(convo_id: str, messages: list, language: str):
-    """Update conversation messages."""
+def append_conversation_messages(convo_id: str, new_messages: list, language: str):
+    """Append a turn's messages to the conversation log (insert-only)."""
     sb = get_supabase()
+    sb.table("conversation_messages").insert([
+        {"conversation_id": convo_id, "role": m["role"], "content": m["content"]}
+        for m in new_messages
+    ]).execute()
     sb.table("conversations").update({
-        "messages": messages,
         "language": language,
         "last_message_at": "now()",
     }).eq("id", convo_id).execute()
@@ -67,43 +80,29 @@ def update_conversation(convo_id: str, messages: list, language: str):
 
 def get_business_for_whatsapp(phone_number_id: str) -> dict:
     """Get the business associated with a Meta phone_number_id."""
-    if not phone_number_id:
-        return None
-    sb = get_supabase()
-    result = (
-        sb.table("businesses")
-        .select("*")
-        .eq("whatsapp_phone_number_id", phone_number_id)
-        .execute()
-    )
-    return result.data[0] if result.data else None
+    return business_cache.get_business_by_phone_number_id(phone_number_id)
 
 
 def build_bot_system_prompt(business: dict, inventory: list, language: str) -> str:
-    """Build a dynamic fallback system prompt (used when no stored prompt exists)."""
-    lang_instruction = get_language_instruction(language)
+    """Build a dynamic fallback system prompt (used when no stored prompt exists).
 
-    inventory_text = ""
-    if inventory:
-        items = []
-        for p in inventory[:50]:
-            cat = p.get("categories", {}).get("name", "General") if p.get("categories") else "General"
-            price_str = f"₹{p['price']}" if p.get("price") else "Price not set"
-            qty = p.get("stock_quantity", 0)
-            stock_str = f"qty:{qty}" if qty else ("In stock" if p.get("in_stock", True) else "Out of stock")
-            img_str = p.get("image_urls", [])[0] if p.get("image_urls") else ""
-            items.append(f"- {p['name']} [{cat}] — {price_str} ({stock_str}) [Image: {img_str}]: {p.get('description', '')}")
-        inventory_text = "\n".join(items)
-    else:
-        inventory_text = "No products in inventory yet."
+    Only a per-category summary goes in here; the products relevant to each
+    message are attached to that message by build_catalog_context.
+    """
+    lang_instruction = get_language_instruction(language)
+    category_text = summarize_categories(inventory or [])
 
     return f"""You are a helpful WhatsApp assistant for "{business['name']}", a {business['type']} located in {business.get('location', 'India')}.
 {business.get('description', '')}
 
 {lang_instruction}
 
-AVAILABLE INVENTORY:
-{inventory_text}
+CATALOG OVERVIEW:
+{category_text}
+
+Each customer message is followed by a "CATALOG MATCHES" block listing the products
+most relevant to it, with current prices and stock. Only quote products and prices
+from those blocks. If nothing suitable is listed, say so and suggest a category above.
 
 YOUR CAPABILITIES:
 1. Answer product availability questions
@@ -121,53 +120,143 @@ RULES:
 - Be warm, friendly, and conversational — NOT robotic
 - Keep messages SHORT (under 200 words)
 - Use emojis naturally 🙏
-- Never make up products that aren't in the inventory
+- Never make up products that aren't in the catalog matches
 - Detect the customer's language and always reply in the same language
 """
 
 
-def process_incoming_message(business_id: str, customer_phone: str, message_text: str, language: str = None) -> tuple:
-    """Process an incoming WhatsApp message and return (reply_text, media_url)."""
+def build_catalog_context(products: list) -> str:
+    """The per-turn block of retrieved products appended to the customer message."""
+    if products:
+        lines = "\n".join(format_product_line(p) for p in products)
+    else:
+        lines = "(no matching products found)"
+    return f"\n\n---\nCATALOG MATCHES (added by the shop system, not written by the customer):\n{lines}"
+
+
+def load_message_context(business: dict, customer_phone: str, message_text: str = "") -> dict:
+    """Fetch everything a reply needs for an already-resolved business in one pass.
+
+    The conversation, the products relevant to the message and (when there is
+    no stored prompt) the inventory are independent reads, so they run
+    concurrently instead of back to back.
+    """
+    with metrics.timer("message.load_context"):
+        convo_future = _context_pool.submit(get_or_create_conversation, business["id"], customer_phone)
+        products_future = _context_pool.submit(
+            retrieve_relevant_products, business["id"], message_text, None, Config.CATALOG_TOP_K
+        )
+        inventory_future = None
+        if not business.get("system_prompt"):
+            inventory_future = _context_pool.submit(search_products, business["id"], "")
+
+        convo = convo_future.result()
+        products = products_future.result()
+
+        # Follow-ups like "aur woh kitne ka hai" only make sense with the previous question
+        if len(products) < Config.CATALOG_TOP_K:
+            recent_user_texts = [
+                m["content"] for m in reversed(convo.get("messages") or []) if m["role"] == "user"
+            ][:2]
+            if recent_user_texts:
+                seen = {p["id"] for p in products}
+                for p in retrieve_relevant_products(business["id"], "", recent_user_texts, Config.CATALOG_TOP_K):
+                    if p["id"] not in seen and len(products) < Config.CATALOG_TOP_K:
+                        products.append(p)
+
+        return {
+            "business": business,
+            "conversation": convo,
+            "products": products,
+            "inventory": inventory_future.result() if inventory_future else None,
+        }
+
+
+def process_incoming_message(business_id: str, customer_phone: str, message_text: str, language: str = None,
+                             business: dict = None, turn_key: str = None) -> tuple:
+    """Process an incoming WhatsApp message and return (reply_text, media_url).
+
+    Pass ``business`` when the caller has already resolved it (the webhook
+    path) to skip the lookup by id. With ``turn_key`` (the queued batch's
+    message ids) the reply is recorded before any order is placed, and a
+    retry of the same batch reuses it instead of calling Gemini again.
+    """
+    start = time.perf_counter()
+    reply, media_url, path = _process_message(business_id, customer_phone, message_text, language, business, turn_key)
+    # Fast-path and LLM turns have very different latency profiles, so track them apart
+    metrics.observe(f"message.total.{path}", time.perf_counter() - start)
+    return reply, media_url
+
+
+def _process_message(business_id: str, customer_phone: str, message_text: str, language: str, business: dict,
+                     turn_key: str = None) -> tuple:
     if not language:
         language = detect_language(message_text)
 
-    convo = get_or_create_conversation(business_id, customer_phone)
+    # An earlier attempt got as far as the reply (and any order); only save and send it
+    recorded = message_queue.recorded_turn(turn_key) if turn_key else None
+    if recorded is not None:
+        reply, saved = recorded
+        metrics.incr("message.retry_reused")
+        if not saved:
+            convo = get_or_create_conversation(business_id, customer_phone)
+            _save_turn(convo["id"], message_text, reply, language, turn_key)
+        return reply, None, "retry"
+
+    if business is None:
+        with metrics.timer("message.business_lookup"):
+            business = business_cache.get_business_by_id(business_id) or {"id": business_id}
+
+    context = load_message_context(business, customer_phone, message_text)
+    convo = context["conversation"]
     messages = convo.get("messages", []) or []
 
-    sb = get_supabase()
-    business_result = sb.table("businesses").select("*").eq("id", business_id).execute()
-    business = business_result.data[0] if business_result.data else {}
+    # Plain price/availability questions are answered from the catalog without Gemini
+    fast_reply = try_fast_reply(business["id"], message_text, language)
+    if fast_reply:
+        if turn_key:
+            message_queue.record_turn(turn_key, fast_reply)
+        _save_turn(convo["id"], message_text, fast_reply, language, turn_key)
+        return fast_reply, None, "fast_path"
 
     # Use stored system prompt if available, else build dynamically
     if business.get("system_prompt"):
         system_prompt = business["system_prompt"]
     else:
-        inventory = search_products(business_id, "")
-        system_prompt = build_bot_system_prompt(business, inventory, language)
-
-    # Build Gemini conversation history (last 20 messages)
-    recent_messages = messages[-20:] if len(messages) > 20 else messages
-    history = []
-    for msg in recent_messages:
-        role = "user" if msg["role"] == "user" else "model"
-        history.append({"role": role, "parts": [msg["content"]]})
-
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        system_instruction=system_prompt,
+        system_prompt = build_bot_system_prompt(business, context["inventory"], language)
+
+    # Newest messages that fit the token budget; older ones live in the rolling summary
+    history, oldest_kept = build_history(messages, convo.get("summary"))
+    if oldest_kept > 0 or len(messages) >= HISTORY_WINDOW:
+        kept_id = messages[oldest_kept]["id"] if oldest_kept < len(messages) else None
+        schedule_summary_refresh(convo, kept_id)
+
+    system_tokens = estimate_tokens(system_prompt)
+    hist_tokens = history_tokens(history)
+    model_message = message_text + build_catalog_context(context["products"])
+    prompt_tokens = system_tokens + hist_tokens + estimate_tokens(model_message)
+    metrics.incr("llm.calls")
+    metrics.incr("llm.prompt_tokens_estimated", prompt_tokens)
+    print(
+        f"[Gemini] business={business_id} prompt~{prompt_tokens} tokens "
+        f"(system~{system_tokens}, history~{hist_tokens} over {len(messages) - oldest_kept} msgs)"
     )
+
+    model = get_model(system_prompt)
     chat = model.start_chat(history=history)
-    response = chat.send_message(message_text)
+    with metrics.timer("message.llm"):
+        response = chat.send_message(model_message)
     reply = response.text
 
     # Parse order creation action
     media_url = None
+    order = None
     json_match = re.search(r'```json\s*(\{.*?\})\s*```', reply, re.DOTALL)
     if json_match:
         try:
             action_data = json.loads(json_match.group(1))
             if action_data.get("action") == "create_order":
-                create_order({
+                order = {
                     "business_id": business_id,
                     "customer_name": action_data.get("customer_name", ""),
                     "customer_phone": customer_phone,
@@ -177,16 +266,72 @@ def process_incoming_message(business_id: str, customer_phone: str, message_text
                         (i.get("price", 0) or 0) * (i.get("quantity", 1) or 1)
                         for i in action_data.get("items", [])
                     ),
-                })
+                }
                 reply = re.sub(r'```json\s*\{.*?\}\s*```', '', reply, flags=re.DOTALL).strip()
                 if not reply:
                     reply = "✅ Your order has been placed! We'll prepare it shortly. Thank you! 🙏"
         except (json.JSONDecodeError, Exception):
-            pass
+            order = None
 
-    # Update conversation history
-    messages.append({"role": "user", "content": message_text})
-    messages.append({"role": "assistant", "content": reply})
-    update_conversation(convo["id"], messages, language)
+    # Recorded before the order so a retry after a later failure cannot place it twice
+    if turn_key:
+        message_queue.record_turn(turn_key, reply)
+    if order:
+        try:
+            create_order(order)
+        except Exception as e:
+            print(f"[Orders] Failed to create order for {customer_phone}: {e}")
 
-    return reply, media_url
+    _save_turn(convo["id"], message_text, reply, language, turn_key)
+    return reply, media_url, "llm"
+
+
+def _save_turn(convo_id: str, message_text: str, reply: str, language: str, turn_key: str = None):
+    """Append this turn to the conversation history."""
+    with metrics.timer("message.save"):
+        append_conversation_messages(convo_id, [
+            {"role": "user", "content": message_text},
+            {"role": "assistant", "content": reply},
+        ], language)
+    if turn_key:
+        message_queue.mark_turn_saved(turn_key)
+
+
+def handle_queued_messages(jobs: list):
+    """Queue worker entry point: resolve the business, run the bot and send the reply.
+
+    All jobs in a batch come from the same customer to the same business
+    number; messages sent in quick succession are answered as a single turn.
+    """
+    phone_number_id = jobs[0].get("phone_number_id", "")
+    from_number = jobs[0]["from"]
+    message_text = "\n".join(job["text"] for job in jobs)
+
+    if len(jobs) > 1:
+        metrics.incr("coalesce.batches")
+        metrics.incr("coalesce.llm_calls_saved", len(jobs) - 1)
+
+    with metrics.timer("message.business_lookup"):
+        business = get_business_for_whatsapp(phone_number_id)
+    if not business:
+        print(f"[Webhook] No business found for phone_number_id: {phone_number_id}")
+        return
+
+    message_ids = [job.get("message_id") for job in jobs]
+    reply, _ = process_incoming_message(
+        business_id=business["id"],
+        customer_phone=from_number,
+        message_text=message_text,
+        business=business,
+        turn_key="|".join(message_ids) if all(message_ids) else None,
+    )
+
+    # The outbox stores the reply durably, smooths bursts and retries transient
+    # Graph API errors. If it cannot take the reply the job fails and is
+    # retried, reusing the recorded turn.
+    whatsapp_sender.enqueue_message(
+        to=from_number,
+        body=reply,
+        phone_number_id=phone_number_id,
+        access_token=business.get("meta_access_token", ""),
+    )
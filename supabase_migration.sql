@@ -18,3 +18,590 @@ ALTER TABLE products
 
 -- Index for fast lookup by phone_number_id (used on every incoming message)
 CREATE INDEX IF NOT EXISTS idx_businesses_phone_number_id ON businesses(whatsapp_phone_number_id);
+
+-- ------------------------------------------------------------
+-- Append-only conversation messages
+-- Each turn inserts two rows instead of rewriting conversations.messages,
+-- and the bot reads only the last N rows via idx_conversation_messages_convo.
+-- ------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    id BIGSERIAL PRIMARY KEY,
+    conversation_id UUID REFERENCES conversations(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversation_messages_convo
+    ON conversation_messages(conversation_id, id DESC);
+
+ALTER TABLE conversation_messages ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Allow all on conversation_messages" ON conversation_messages;
+CREATE POLICY "Allow all on conversation_messages" ON conversation_messages FOR ALL USING (true) WITH CHECK (true);
+
+-- Backfill existing JSONB histories, preserving order. Conversations that
+-- already have rows are skipped, so this is safe to re-run.
+INSERT INTO conversation_messages (conversation_id, role, content, created_at)
+SELECT
+    c.id,
+    m.value->>'role',
+    COALESCE(m.value->>'content', ''),
+    c.created_at + (m.ordinality * INTERVAL '1 millisecond')
+FROM conversations c
+CROSS JOIN LATERAL jsonb_array_elements(c.messages) WITH ORDINALITY AS m(value, ordinality)
+WHERE jsonb_typeof(c.messages) = 'array'
+  AND NOT EXISTS (
+      SELECT 1 FROM conversation_messages cm WHERE cm.conversation_id = c.id
+  )
+ORDER BY c.id, m.ordinality;
+
+-- Once the backfill is verified, the legacy column can be emptied:
+-- UPDATE conversations SET messages = '[]'::JSONB;
+
+-- ------------------------------------------------------------
+-- Rolling conversation summaries
+-- Messages that no longer fit the history token budget are folded into
+-- summary; summary_message_id is the last conversation_messages.id covered.
+-- ------------------------------------------------------------
+ALTER TABLE conversations
+    ADD COLUMN IF NOT EXISTS summary TEXT,
+    ADD COLUMN IF NOT EXISTS summary_message_id BIGINT;
+
+-- ------------------------------------------------------------
+-- Keyset pagination of product listings
+-- Pages are ordered by (created_at DESC, id DESC) within a business.
+-- ------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_products_business_created
+    ON products(business_id, created_at DESC, id DESC);
+
+-- ------------------------------------------------------------
+-- Bulk product import upserts on (business_id, name)
+-- Creating the index fails if a business already has two products with the
+-- same name; list them with:
+--   SELECT business_id, name, COUNT(*) FROM products
+--   GROUP BY business_id, name HAVING COUNT(*) > 1;
+-- ------------------------------------------------------------
+CREATE UNIQUE INDEX IF NOT EXISTS idx_products_business_name
+    ON products(business_id, name);
+
+-- ------------------------------------------------------------
+-- Bulk product updates and atomic stock decrements
+-- ------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_products_business_lower_name
+    ON products(business_id, lower(name));
+
+-- Apply many product patches in one statement. Each element of p_updates is
+-- {"id": ..., <column>: value, ...}; only the keys present are changed.
+-- "stock_delta" adjusts stock_quantity relative to its current value, and
+-- either stock key also sets in_stock unless the patch gives it.
+CREATE OR REPLACE FUNCTION bulk_update_products(p_business_id UUID, p_updates JSONB)
+RETURNS SETOF products
+LANGUAGE sql
+AS $$
+    UPDATE products p SET
+        name = CASE WHEN u.patch ? 'name' THEN u.patch->>'name' ELSE p.name END,
+        description = CASE WHEN u.patch ? 'description' THEN u.patch->>'description' ELSE p.description END,
+        price = CASE WHEN u.patch ? 'price' THEN (u.patch->>'price')::NUMERIC ELSE p.price END,
+        image_urls = CASE WHEN u.patch ? 'image_urls'
+            THEN ARRAY(SELECT jsonb_array_elements_text(u.patch->'image_urls')) ELSE p.image_urls END,
+        -- Without an explicit in_stock, a stock change sets it like decrement_stock does
+        in_stock = CASE
+            WHEN u.patch ? 'in_stock' THEN (u.patch->>'in_stock')::BOOLEAN
+            WHEN u.patch ? 'stock_quantity' THEN (u.patch->>'stock_quantity')::INTEGER > 0
+            WHEN u.patch ? 'stock_delta' THEN p.stock_quantity + (u.patch->>'stock_delta')::INTEGER > 0
+            ELSE p.in_stock END,
+        stock_quantity = CASE
+            WHEN u.patch ? 'stock_quantity' THEN (u.patch->>'stock_quantity')::INTEGER
+            WHEN u.patch ? 'stock_delta' THEN GREATEST(p.stock_quantity + (u.patch->>'stock_delta')::INTEGER, 0)
+            ELSE p.stock_quantity END,
+        category_id = CASE WHEN u.patch ? 'category_id' THEN (u.patch->>'category_id')::UUID ELSE p.category_id END,
+        updated_at = now()
+    FROM jsonb_array_elements(p_updates) AS u(patch)
+    WHERE p.id = (u.patch->>'id')::UUID AND p.business_id = p_business_id
+    RETURNING p.*;
+$$;
+
+-- Take ordered quantities out of stock. Each item ({"product": name,
+-- "quantity": n}) is matched case-insensitively by name and decremented with
+-- a single conditional UPDATE, so concurrent orders can never oversell: the
+-- row lock makes a competing UPDATE re-check stock_quantity >= n. All the
+-- order's rows are locked up front in id order, so two orders naming the
+-- same products in opposite order cannot deadlock.
+-- stock_quantity = 0 with in_stock = true means stock is not tracked.
+-- Returns one {"id", "product", "quantity", "status", "remaining"} per item, with
+-- status 'decremented', 'insufficient', 'untracked' or 'not_found'.
+CREATE OR REPLACE FUNCTION decrement_stock(p_business_id UUID, p_items JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    item JSONB;
+    v_name TEXT;
+    v_qty INTEGER;
+    v_id UUID;
+    v_stock INTEGER;
+    v_in_stock BOOLEAN;
+    v_status TEXT;
+    results JSONB := '[]'::JSONB;
+BEGIN
+    PERFORM 1 FROM products
+    WHERE id IN (
+        SELECT (
+            SELECT p.id FROM products p
+            WHERE p.business_id = p_business_id AND lower(p.name) = lower(i.value->>'product')
+            ORDER BY p.created_at
+            LIMIT 1
+        )
+        FROM jsonb_array_elements(p_items) AS i
+    )
+    ORDER BY id
+    FOR UPDATE;
+
+    FOR item IN SELECT value FROM jsonb_array_elements(p_items) LOOP
+        v_name := item->>'product';
+        v_qty := GREATEST(COALESCE((item->>'quantity')::NUMERIC::INTEGER, 1), 1);
+
+        SELECT id INTO v_id FROM products
+        WHERE business_id = p_business_id AND lower(name) = lower(v_name)
+        ORDER BY created_at
+        LIMIT 1;
+
+        IF v_id IS NULL THEN
+            v_status := 'not_found';
+            v_stock := NULL;
+        ELSE
+            UPDATE products SET
+                stock_quantity = stock_quantity - v_qty,
+                in_stock = stock_quantity - v_qty > 0,
+                updated_at = now()
+            WHERE id = v_id AND stock_quantity >= v_qty AND stock_quantity > 0
+            RETURNING stock_quantity INTO v_stock;
+
+            IF FOUND THEN
+                v_status := 'decremented';
+            ELSE
+                SELECT stock_quantity, in_stock INTO v_stock, v_in_stock FROM products WHERE id = v_id;
+                v_status := CASE WHEN v_stock = 0 AND v_in_stock THEN 'untracked' ELSE 'insufficient' END;
+            END IF;
+        END IF;
+
+        results := results || jsonb_build_object(
+            'id', v_id, 'product', v_name, 'quantity', v_qty, 'status', v_status, 'remaining', v_stock
+        );
+    END LOOP;
+    RETURN results;
+END;
+$$;
+
+-- ------------------------------------------------------------
+-- Dashboard statistics aggregated in the database
+-- Same shape as the old Python aggregation in get_dashboard_stats;
+-- "today" is the current UTC day.
+-- ------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_orders_business_created
+    ON orders(business_id, created_at DESC);
+
+CREATE OR REPLACE FUNCTION dashboard_stats(p_business_id UUID)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH bounds AS (
+        SELECT date_trunc('day', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS today_start
+    ),
+    totals AS (
+        SELECT
+            COUNT(*) AS total_orders,
+            COUNT(DISTINCT customer_phone) AS total_customers,
+            COALESCE(SUM(total), 0) AS total_revenue,
+            COUNT(*) FILTER (WHERE created_at >= bounds.today_start) AS today_orders,
+            COALESCE(SUM(total) FILTER (WHERE created_at >= bounds.today_start), 0) AS today_revenue
+        FROM orders, bounds
+        WHERE business_id = p_business_id
+    ),
+    statuses AS (
+        SELECT COALESCE(jsonb_object_agg(status, n), '{}'::JSONB) AS breakdown
+        FROM (
+            SELECT COALESCE(status, 'unknown') AS status, COUNT(*) AS n
+            FROM orders
+            WHERE business_id = p_business_id
+            GROUP BY 1
+        ) s
+    )
+    SELECT jsonb_build_object(
+        'total_orders', totals.total_orders,
+        'total_customers', totals.total_customers,
+        'total_conversations', (SELECT COUNT(*) FROM conversations WHERE business_id = p_business_id),
+        'total_products', (SELECT COUNT(*) FROM products WHERE business_id = p_business_id),
+        'total_revenue', totals.total_revenue,
+        'order_status_breakdown', statuses.breakdown,
+        'today_orders', totals.today_orders,
+        'today_revenue', totals.today_revenue
+    )
+    FROM totals, statuses;
+$$;
+
+-- ------------------------------------------------------------
+-- Incrementally maintained dashboard rollups
+-- Orders are written through place_order / set_order_status, which update
+-- the rollups in the same transaction. rebuild_business_stats recomputes
+-- them from raw orders to reconcile drift (e.g. after direct inserts).
+-- ------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS business_stats (
+    business_id UUID PRIMARY KEY REFERENCES businesses(id) ON DELETE CASCADE,
+    total_orders INTEGER NOT NULL DEFAULT 0,
+    total_revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    total_customers INTEGER NOT NULL DEFAULT 0,
+    status_counts JSONB NOT NULL DEFAULT '{}'::JSONB,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS business_daily_stats (
+    business_id UUID REFERENCES businesses(id) ON DELETE CASCADE,
+    day DATE NOT NULL,                               -- UTC day the orders were created
+    orders INTEGER NOT NULL DEFAULT 0,
+    revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    new_customers INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (business_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS business_customers (
+    business_id UUID REFERENCES businesses(id) ON DELETE CASCADE,
+    customer_phone TEXT NOT NULL,
+    first_order_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (business_id, customer_phone)
+);
+
+ALTER TABLE business_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE business_daily_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE business_customers ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Allow all on business_stats" ON business_stats;
+DROP POLICY IF EXISTS "Allow all on business_daily_stats" ON business_daily_stats;
+DROP POLICY IF EXISTS "Allow all on business_customers" ON business_customers;
+CREATE POLICY "Allow all on business_stats" ON business_stats FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow all on business_daily_stats" ON business_daily_stats FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow all on business_customers" ON business_customers FOR ALL USING (true) WITH CHECK (true);
+
+-- Insert an order and count it in the rollups. p_order has the orders
+-- columns (business_id, customer_phone, items, total, ...).
+CREATE OR REPLACE FUNCTION place_order(p_order JSONB)
+RETURNS orders
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_order orders;
+    v_new_customer INTEGER := 0;
+BEGIN
+    INSERT INTO orders (business_id, customer_name, customer_phone, customer_address, items, total, status, notes)
+    VALUES (
+        (p_order->>'business_id')::UUID,
+        p_order->>'customer_name',
+        p_order->>'customer_phone',
+        p_order->>'customer_address',
+        COALESCE(p_order->'items', '[]'::JSONB),
+        COALESCE((p_order->>'total')::NUMERIC, 0),
+        COALESCE(p_order->>'status', 'pending'),
+        p_order->>'notes'
+    )
+    RETURNING * INTO v_order;
+
+    INSERT INTO business_customers (business_id, customer_phone, first_order_at)
+    VALUES (v_order.business_id, v_order.customer_phone, v_order.created_at)
+    ON CONFLICT DO NOTHING;
+    IF FOUND THEN
+        v_new_customer := 1;
+    END IF;
+
+    INSERT INTO business_daily_stats AS d (business_id, day, orders, revenue, new_customers)
+    VALUES (v_order.business_id, (v_order.created_at AT TIME ZONE 'UTC')::DATE, 1, COALESCE(v_order.total, 0), v_new_customer)
+    ON CONFLICT (business_id, day) DO UPDATE SET
+        orders = d.orders + 1,
+        revenue = d.revenue + EXCLUDED.revenue,
+        new_customers = d.new_customers + EXCLUDED.new_customers;
+
+    INSERT INTO business_stats AS s (business_id, total_orders, total_revenue, total_customers, status_counts)
+    VALUES (v_order.business_id, 1, COALESCE(v_order.total, 0), v_new_customer, jsonb_build_object(v_order.status, 1))
+    ON CONFLICT (business_id) DO UPDATE SET
+        total_orders = s.total_orders + 1,
+        total_revenue = s.total_revenue + EXCLUDED.total_revenue,
+        total_customers = s.total_customers + EXCLUDED.total_customers,
+        status_counts = s.status_counts || jsonb_build_object(
+            v_order.status, COALESCE((s.status_counts->>v_order.status)::INTEGER, 0) + 1
+        ),
+        updated_at = now();
+
+    RETURN v_order;
+END;
+$$;
+
+-- Place an order and take its items out of stock in one transaction, so an
+-- order and its stock change cannot diverge. p_items are decrement_stock
+-- items; shortages are noted on the order. Returns {"order": <orders row>,
+-- "stock": <decrement_stock outcomes>}.
+CREATE OR REPLACE FUNCTION place_order_with_stock(p_order JSONB, p_items JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_order orders;
+    v_stock JSONB;
+    v_short TEXT;
+BEGIN
+    v_order := place_order(p_order);
+    v_stock := decrement_stock(v_order.business_id, COALESCE(p_items, '[]'::JSONB));
+
+    SELECT string_agg(
+        CASE WHEN s.outcome->>'status' = 'insufficient'
+            THEN format('%s x%s (%s left)', s.outcome->>'product', s.outcome->>'quantity',
+                        COALESCE(s.outcome->>'remaining', '0'))
+            ELSE format('%s not in catalog', s.outcome->>'product') END,
+        '; ' ORDER BY s.n)
+    INTO v_short
+    FROM jsonb_array_elements(v_stock) WITH ORDINALITY AS s(outcome, n)
+    WHERE s.outcome->>'status' IN ('insufficient', 'not_found');
+
+    IF v_short IS NOT NULL THEN
+        UPDATE orders SET notes = concat_ws(E'\n', NULLIF(notes, ''), 'Stock short: ' || v_short)
+        WHERE id = v_order.id
+        RETURNING * INTO v_order;
+    END IF;
+
+    RETURN jsonb_build_object('order', to_jsonb(v_order), 'stock', v_stock);
+END;
+$$;
+
+-- Change an order's status and move it between status counts.
+-- Returns no row if the order does not exist.
+CREATE OR REPLACE FUNCTION set_order_status(p_order_id UUID, p_status TEXT)
+RETURNS SETOF orders
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_old TEXT;
+    v_order orders;
+BEGIN
+    SELECT status INTO v_old FROM orders WHERE id = p_order_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    UPDATE orders SET status = p_status, updated_at = now()
+    WHERE id = p_order_id
+    RETURNING * INTO v_order;
+
+    IF v_old IS DISTINCT FROM p_status THEN
+        UPDATE business_stats SET
+            status_counts = status_counts || jsonb_build_object(
+                COALESCE(v_old, 'unknown'), GREATEST(COALESCE((status_counts->>COALESCE(v_old, 'unknown'))::INTEGER, 0) - 1, 0),
+                p_status, COALESCE((status_counts->>p_status)::INTEGER, 0) + 1
+            ),
+            updated_at = now()
+        WHERE business_id = v_order.business_id;
+    END IF;
+
+    RETURN NEXT v_order;
+END;
+$$;
+
+-- Recompute the rollups of one business (or all, when NULL) from raw orders.
+CREATE OR REPLACE FUNCTION rebuild_business_stats(p_business_id UUID DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    -- Writers in flight finish first; later ones wait and count on top of the rebuilt rows
+    LOCK TABLE business_customers, business_daily_stats, business_stats IN EXCLUSIVE MODE;
+
+    DELETE FROM business_customers WHERE p_business_id IS NULL OR business_id = p_business_id;
+    INSERT INTO business_customers (business_id, customer_phone, first_order_at)
+    SELECT business_id, customer_phone, MIN(created_at)
+    FROM orders
+    WHERE p_business_id IS NULL OR business_id = p_business_id
+    GROUP BY business_id, customer_phone;
+
+    DELETE FROM business_daily_stats WHERE p_business_id IS NULL OR business_id = p_business_id;
+    INSERT INTO business_daily_stats (business_id, day, orders, revenue, new_customers)
+    SELECT o.business_id, o.day, o.orders, o.revenue, COALESCE(c.new_customers, 0)
+    FROM (
+        SELECT business_id, (created_at AT TIME ZONE 'UTC')::DATE AS day, COUNT(*) AS orders, COALESCE(SUM(total), 0) AS revenue
+        FROM orders
+        WHERE p_business_id IS NULL OR business_id = p_business_id
+        GROUP BY 1, 2
+    ) o
+    LEFT JOIN (
+        SELECT business_id, (first_order_at AT TIME ZONE 'UTC')::DATE AS day, COUNT(*) AS new_customers
+        FROM business_customers
+        WHERE p_business_id IS NULL OR business_id = p_business_id
+        GROUP BY 1, 2
+    ) c ON c.business_id = o.business_id AND c.day = o.day;
+
+    DELETE FROM business_stats WHERE p_business_id IS NULL OR business_id = p_business_id;
+    INSERT INTO business_stats (business_id, total_orders, total_revenue, total_customers, status_counts)
+    SELECT t.business_id, t.total_orders, t.total_revenue, t.total_customers, COALESCE(s.status_counts, '{}'::JSONB)
+    FROM (
+        SELECT business_id, COUNT(*) AS total_orders, COALESCE(SUM(total), 0) AS total_revenue,
+               COUNT(DISTINCT customer_phone) AS total_customers
+        FROM orders
+        WHERE p_business_id IS NULL OR business_id = p_business_id
+        GROUP BY business_id
+    ) t
+    LEFT JOIN (
+        SELECT business_id, jsonb_object_agg(status, n) AS status_counts
+        FROM (
+            SELECT business_id, COALESCE(status, 'unknown') AS status, COUNT(*) AS n
+            FROM orders
+            WHERE p_business_id IS NULL OR business_id = p_business_id
+            GROUP BY 1, 2
+        ) x
+        GROUP BY business_id
+    ) s ON s.business_id = t.business_id;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+-- Dashboard figures from the rollups: a fixed number of primary-key reads
+-- however many orders the business has.
+CREATE OR REPLACE FUNCTION dashboard_stats(p_business_id UUID)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'total_orders', COALESCE(s.total_orders, 0),
+        'total_customers', COALESCE(s.total_customers, 0),
+        'total_conversations', (SELECT COUNT(*) FROM conversations WHERE business_id = p_business_id),
+        'total_products', (SELECT COUNT(*) FROM products WHERE business_id = p_business_id),
+        'total_revenue', COALESCE(s.total_revenue, 0),
+        'order_status_breakdown', COALESCE(
+            (SELECT jsonb_object_agg(key, value) FROM jsonb_each(s.status_counts) WHERE value::INTEGER > 0),
+            '{}'::JSONB
+        ),
+        'today_orders', COALESCE(d.orders, 0),
+        'today_revenue', COALESCE(d.revenue, 0)
+    )
+    FROM (SELECT p_business_id AS business_id) b
+    LEFT JOIN business_stats s ON s.business_id = b.business_id
+    LEFT JOIN business_daily_stats d
+        ON d.business_id = b.business_id AND d.day = (now() AT TIME ZONE 'UTC')::DATE;
+$$;
+
+-- Populate the rollups for existing orders
+SELECT rebuild_business_stats();
+
+-- ------------------------------------------------------------
+-- Sales analytics: revenue, order counts and top products per
+-- day/week/month (UTC) over [p_from, p_to), aggregated in one query.
+-- Buckets without orders are included with zeros. Item lines are
+-- {"product", "quantity", "price"}; missing or non-numeric quantity
+-- counts as 1 and price as 0. Products are grouped case-insensitively.
+-- ------------------------------------------------------------
+CREATE OR REPLACE FUNCTION sales_analytics(
+    p_business_id UUID,
+    p_from TIMESTAMPTZ,
+    p_to TIMESTAMPTZ,
+    p_bucket TEXT DEFAULT 'day',
+    p_top INTEGER DEFAULT 5
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH scoped AS (
+        SELECT total, items, date_trunc(p_bucket, created_at AT TIME ZONE 'UTC') AS period
+        FROM orders
+        WHERE business_id = p_business_id AND created_at >= p_from AND created_at < p_to
+    ),
+    periods AS (
+        SELECT g.period, COUNT(s.period) AS orders, COALESCE(SUM(s.total), 0) AS revenue
+        FROM generate_series(
+            date_trunc(p_bucket, p_from AT TIME ZONE 'UTC'),
+            (p_to AT TIME ZONE 'UTC') - INTERVAL '1 microsecond',
+            ('1 ' || p_bucket)::INTERVAL
+        ) AS g(period)
+        LEFT JOIN scoped s ON s.period = g.period
+        GROUP BY g.period
+    ),
+    lines AS (
+        SELECT
+            s.period,
+            btrim(i.value->>'product') AS product,
+            CASE WHEN i.value->>'quantity' ~ '^\s*[0-9]+(\.[0-9]+)?\s*$'
+                 THEN (i.value->>'quantity')::NUMERIC ELSE 1 END AS quantity,
+            CASE WHEN i.value->>'price' ~ '^\s*[0-9]+(\.[0-9]+)?\s*$'
+                 THEN (i.value->>'price')::NUMERIC ELSE 0 END AS price
+        FROM scoped s
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(s.items) = 'array' THEN s.items ELSE '[]'::JSONB END
+        ) AS i
+        WHERE COALESCE(btrim(i.value->>'product'), '') <> ''
+    ),
+    product_periods AS (
+        SELECT
+            period,
+            MIN(product) AS product,
+            SUM(quantity) AS quantity,
+            SUM(quantity * price) AS revenue,
+            row_number() OVER (
+                PARTITION BY period
+                ORDER BY SUM(quantity * price) DESC, SUM(quantity) DESC, lower(product)
+            ) AS rank
+        FROM lines
+        GROUP BY period, lower(product)
+    ),
+    product_totals AS (
+        SELECT
+            MIN(product) AS product,
+            SUM(quantity) AS quantity,
+            SUM(quantity * price) AS revenue,
+            row_number() OVER (
+                ORDER BY SUM(quantity * price) DESC, SUM(quantity) DESC, lower(product)
+            ) AS rank
+        FROM lines
+        GROUP BY lower(product)
+    ),
+    period_tops AS (
+        SELECT period, jsonb_agg(
+            jsonb_build_object('product', product, 'quantity', quantity, 'revenue', revenue)
+            ORDER BY rank
+        ) AS products
+        FROM product_periods
+        WHERE rank <= p_top
+        GROUP BY period
+    )
+    SELECT jsonb_build_object(
+        'orders', (SELECT COALESCE(SUM(orders), 0) FROM periods),
+        'revenue', (SELECT COALESCE(SUM(revenue), 0) FROM periods),
+        'series', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'period', p.period::DATE,
+                'orders', p.orders,
+                'revenue', p.revenue,
+                'top_products', COALESCE(t.products, '[]'::JSONB)
+            ) ORDER BY p.period)
+            FROM periods p
+            LEFT JOIN period_tops t ON t.period = p.period
+        ), '[]'::JSONB),
+        'top_products', COALESCE((
+            SELECT jsonb_agg(
+                jsonb_build_object('product', product, 'quantity', quantity, 'revenue', revenue)
+                ORDER BY rank
+            )
+            FROM product_totals
+            WHERE rank <= p_top
+        ), '[]'::JSONB)
+    );
+$$;
+
+-- ------------------------------------------------------------
+-- Keyset pagination of orders: (created_at DESC, id DESC) per business,
+-- optionally within one status. Supersedes idx_orders_business_created.
+-- ------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_orders_business_created_id
+    ON orders(business_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_business_status_created
+    ON orders(business_id, status, created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_orders_business_created;
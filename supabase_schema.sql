@@ -63,10 +63,21 @@ CREATE TABLE IF NOT EXISTS conversations (
     customer_phone TEXT NOT NULL,
     messages JSONB NOT NULL DEFAULT '[]'::JSONB,
     language TEXT DEFAULT 'English',
+    summary TEXT,                                    -- rolling summary of older turns
+    summary_message_id BIGINT,                       -- last conversation_messages.id in summary
     last_message_at TIMESTAMPTZ DEFAULT now(),
     created_at TIMESTAMPTZ DEFAULT now()
 );
 
+-- 5b. Conversation messages (append-only log; conversations.messages is legacy)
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    id BIGSERIAL PRIMARY KEY,
+    conversation_id UUID REFERENCES conversations(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
 -- 6. User Chats (onboarding chat persistence)
 CREATE TABLE IF NOT EXISTS user_chats (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
@@ -98,10 +109,15 @@ CREATE INDEX IF NOT EXISTS idx_businesses_user ON businesses(user_id);
 CREATE INDEX IF NOT EXISTS idx_categories_business ON categories(business_id);
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
 CREATE INDEX IF NOT EXISTS idx_products_business ON products(business_id);
+CREATE INDEX IF NOT EXISTS idx_products_business_created ON products(business_id, created_at DESC, id DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_products_business_name ON products(business_id, name);
 CREATE INDEX IF NOT EXISTS idx_orders_business ON orders(business_id);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+CREATE INDEX IF NOT EXISTS idx_orders_business_created_id ON orders(business_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_business_status_created ON orders(business_id, status, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_conversations_business ON conversations(business_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_phone ON conversations(customer_phone);
+CREATE INDEX IF NOT EXISTS idx_conversation_messages_convo ON conversation_messages(conversation_id, id DESC);
 CREATE INDEX IF NOT EXISTS idx_user_chats_user ON user_chats(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_preferences_user ON user_preferences(user_id);
 
@@ -111,6 +127,7 @@ ALTER TABLE categories ENABLE ROW LEVEL SECURITY;
 ALTER TABLE products ENABLE ROW LEVEL SECURITY;
 ALTER TABLE orders ENABLE ROW LEVEL SECURITY;
 ALTER TABLE conversations ENABLE ROW LEVEL SECURITY;
+ALTER TABLE conversation_messages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE user_chats ENABLE ROW LEVEL SECURITY;
 ALTER TABLE user_preferences ENABLE ROW LEVEL SECURITY;
 
@@ -120,6 +137,7 @@ CREATE POLICY "Allow all on categories" ON categories FOR ALL USING (true) WITH
 CREATE POLICY "Allow all on products" ON products FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow all on orders" ON orders FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow all on conversations" ON conversations FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow all on conversation_messages" ON conversation_messages FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow all on user_chats" ON user_chats FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow all on user_preferences" ON user_preferences FOR ALL USING (true) WITH CHECK (true);
 